@@ -0,0 +1,133 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, TypeVar
+
+from feetech_tuna import FeetechTuna
+
+T = TypeVar('T')
+
+
+class BusManager:
+    """
+    Routes servo IDs to serial buses, one FeetechTuna per port.
+
+    Work for several buses runs concurrently, one worker thread per bus, and
+    the per-bus results are merged back into a single dict keyed by servo ID.
+    Serial I/O releases the GIL, so a frame over N buses takes about as long
+    as the slowest bus instead of the sum of all of them. With a single bus
+    everything runs in the calling thread, exactly as before.
+    """
+
+    def __init__(self):
+        self.buses: Dict[str, FeetechTuna] = {}
+        self.routes: Dict[int, FeetechTuna] = {}
+        self._workers: Dict[FeetechTuna, ThreadPoolExecutor] = {}
+        self._local = threading.local()
+
+    def add_bus(self, port: str, servo_ids: Iterable[int], baudrate: int = 1000000,
+                pipelining: bool = False, tuna: Optional[FeetechTuna] = None) -> bool:
+        """
+        Open a serial port and route servo IDs to it.
+
+        Args:
+            port: Serial port (or transport URL) of the bus
+            servo_ids: IDs of the servos on this bus
+            baudrate: Bus baud rate
+            pipelining: Send batched requests in a single write
+            tuna: FeetechTuna to open the port with (a new one by default)
+
+        Returns:
+            True if the port was opened
+        """
+        if tuna is None:
+            tuna = FeetechTuna()
+        tuna.setPipelining(pipelining)
+        if not tuna.openSerialPort(port=port, baudrate=baudrate):
+            return False
+        self.buses[port] = tuna
+        for servo_id in servo_ids:
+            self.routes[servo_id] = tuna
+        self._workers[tuna] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"bus-{port}")
+        return True
+
+    def close(self) -> None:
+        """Close every port and stop the bus workers."""
+        for worker in self._workers.values():
+            worker.shutdown()
+        for tuna in self.buses.values():
+            tuna.closeSerialPort()
+        self.buses.clear()
+        self.routes.clear()
+        self._workers.clear()
+
+    def tuna_for(self, servo_id: int) -> Optional[FeetechTuna]:
+        """Get the bus a servo is routed to (the only bus if there is just one)."""
+        tuna = self.routes.get(servo_id)
+        if tuna is None and len(self.buses) == 1:
+            tuna = next(iter(self.buses.values()))
+        return tuna
+
+    def split(self, servo_ids: Iterable[int]) -> Dict[FeetechTuna, List[int]]:
+        """Group servo IDs by bus, keeping their order. Unrouted IDs are dropped."""
+        groups: Dict[FeetechTuna, List[int]] = {}
+        for servo_id in servo_ids:
+            tuna = self.tuna_for(servo_id)
+            if tuna is not None:
+                groups.setdefault(tuna, []).append(servo_id)
+        return groups
+
+    def split_values(self, values: Mapping[int, T]) -> Dict[FeetechTuna, Dict[int, T]]:
+        """Group a servo ID -> value mapping by bus. Unrouted IDs are dropped."""
+        groups: Dict[FeetechTuna, Dict[int, T]] = {}
+        for servo_id, value in values.items():
+            tuna = self.tuna_for(servo_id)
+            if tuna is not None:
+                groups.setdefault(tuna, {})[servo_id] = value
+        return groups
+
+    def bus_ids(self, tuna: FeetechTuna) -> List[int]:
+        """Get every servo ID routed to a bus."""
+        return [servo_id for servo_id, routed in self.routes.items() if routed is tuna]
+
+    @contextmanager
+    def priority(self, priority: int):
+        """Run the bus transactions started in the block at the given scheduler priority."""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def run(self, groups: Mapping[FeetechTuna, Any], fn: Callable[[FeetechTuna, Any], Any]) -> Dict[FeetechTuna, Any]:
+        """
+        Run fn(tuna, group) for every bus group, concurrently when there are several.
+
+        Args:
+            groups: Per-bus argument, as returned by split or split_values
+            fn: Work to do on one bus
+
+        Returns:
+            Dict of bus to the result of fn. Exceptions are re-raised.
+        """
+        priority = getattr(self._local, 'priority', None)
+
+        def call(tuna: FeetechTuna, group: Any) -> Any:
+            if priority is None:
+                return fn(tuna, group)
+            with tuna.scheduler.priority(priority):
+                return fn(tuna, group)
+
+        if len(groups) <= 1:
+            return {tuna: call(tuna, group) for tuna, group in groups.items()}
+
+        futures = {tuna: self._workers[tuna].submit(call, tuna, group) for tuna, group in groups.items()}
+        return {tuna: future.result() for tuna, future in futures.items()}
+
+    def merge(self, groups: Mapping[FeetechTuna, Any], fn: Callable[[FeetechTuna, Any], Dict[int, T]]) -> Dict[int, T]:
+        """Run fn on every bus group and merge the per-servo dicts it returns."""
+        merged: Dict[int, T] = {}
+        for result in self.run(groups, fn).values():
+            merged.update(result)
+        return merged
@@ -0,0 +1,91 @@
+# CPU cost of the per-transaction instrumentation.
+#
+# Runs single reads, writes and a 16 servo sync read against an in-memory
+# virtual bus, with the PortHandler's metrics off and on, and reports the
+# CPU time per transaction (best of --rounds, alternating off and on, as the
+# virtual bus sleeps for the simulated wire time). Off, the only cost left
+# is a None check per port call. Waiting for the simulated wire time makes
+# the bus rows noisy, so the cost of the hooks themselves (begin, received
+# and end of one transaction, without the bus) is timed on its own as well.
+#
+# Usage: python bench_bus_metrics.py [--count 2000] [--rounds 5]
+
+import argparse
+import os
+import sys
+import time
+import timeit
+
+cd = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna'))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna', 'SCServo_Python'))
+
+from scservo_sdk import *
+from virtual_bus import VirtualBus, registerVirtualBus
+
+SERVO_IDS = list(range(1, 17))
+
+
+def run(packetHandler, syncRead, count):
+    operations = (
+        ("read", lambda: packetHandler.read2ByteTxRx(1, SMS_STS_PRESENT_POSITION_L)),
+        ("write", lambda: packetHandler.write2ByteTxRx(1, SMS_STS_GOAL_POSITION_L, 2048)),
+        ("sync read x16", syncRead.txRxPacket),
+    )
+    timings = {}
+    for name, operation in operations:
+        cpu_start = time.process_time()
+        for _ in range(count):
+            operation()
+        timings[name] = (time.process_time() - cpu_start) / count
+    return timings
+
+
+def timeHooks(count):
+    # CPU time of the BusMetrics calls one read transaction makes
+    metrics = BusMetrics()
+    packet = bytes((0xFF, 0xFF, 1, 4, INST_READ, SMS_STS_PRESENT_POSITION_L, 2, 0))
+
+    def transaction():
+        metrics.begin(packet, 0.0)
+        metrics.received(8)
+        metrics.end(COMM_SUCCESS, 0.2, 0.01)
+    return timeit.timeit(transaction, number=count) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transaction instrumentation overhead benchmark')
+    parser.add_argument('--count', type=int, default=2000, help='Transactions per operation, setting and round')
+    parser.add_argument('--rounds', type=int, default=5, help='Rounds per setting; the fastest one counts')
+    args = parser.parse_args()
+
+    bus = VirtualBus(SERVO_IDS)
+    portHandler = PortHandler(registerVirtualBus("metrics", bus))
+    portHandler.openPort()
+    packetHandler = sms_sts(portHandler)
+    syncRead = GroupSyncRead(packetHandler, SMS_STS_PRESENT_POSITION_L, 2)
+    for servoId in SERVO_IDS:
+        syncRead.addParam(servoId)
+
+    results = {}
+    for _ in range(args.rounds):
+        for label, metrics in (("off", None), ("on", BusMetrics())):
+            portHandler.setMetrics(metrics)
+            timings = run(packetHandler, syncRead, args.count)
+            best = results.setdefault(label, timings)
+            for name, timing in timings.items():
+                best[name] = min(best[name], timing)
+
+    hooks = min(timeHooks(args.count * 10) for _ in range(args.rounds))
+
+    print("%-16s %12s %12s %10s" % ("operation", "off (us)", "on (us)", "overhead"))
+    for name in results["off"]:
+        off, on = results["off"][name], results["on"][name]
+        print("%-16s %12.1f %12.1f %9.1f%%" % (name, off * 1e6, on * 1e6, (on - off) / off * 100.0))
+    print("%-16s %12s %12.1f %9.1f%%" % ("hooks only", "-", hooks * 1e6, hooks / results["off"]["read"] * 100.0))
+
+    portHandler.closePort()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Per-packet encode/decode cost of the list-based packet building that the SDK
+# used to do versus PacketCodec (one bytearray per packet, cached packets,
+# struct decoding).
+#
+# "list" reproduces the old code path: a fresh list per packet, a Python loop
+# for the checksum and the bytes conversion the port did on write. Replies are
+# copied into a data list and combined with scs_makeword.
+#
+# Usage: python bench_packet_codec.py [--count 200000]
+
+import argparse
+import os
+import sys
+import timeit
+
+cd = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna', 'SCServo_Python'))
+
+from scservo_sdk import *
+
+SERVO_ID = 1
+SYNC_IDS = [20, 21, 22, 23, 24, 25, 26, 27]
+
+
+def listPacket(scs_id, instruction, params):
+    txpacket = [0] * (len(params) + 6)
+    txpacket[PKT_ID] = scs_id
+    txpacket[PKT_LENGTH] = len(params) + 2
+    txpacket[PKT_INSTRUCTION] = instruction
+    txpacket[PKT_PARAMETER0: PKT_PARAMETER0 + len(params)] = params
+
+    checksum = 0
+    total_packet_length = txpacket[PKT_LENGTH] + 4
+    txpacket[PKT_HEADER0] = 0xFF
+    txpacket[PKT_HEADER1] = 0xFF
+    for idx in range(2, total_packet_length - 1):
+        checksum += txpacket[idx]
+    txpacket[total_packet_length - 1] = ~checksum & 0xFF
+    return bytes(txpacket)
+
+
+def listDecode(packetHandler, rxpacket):
+    data = []
+    data.extend(rxpacket[PKT_PARAMETER0: PKT_PARAMETER0 + 2])
+    return packetHandler.scs_makeword(data[0], data[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Packet encode/decode microbenchmark')
+    parser.add_argument('--count', type=int, default=200000, help='Packets per case')
+    args = parser.parse_args()
+
+    packetHandler = sms_sts(PortHandler('loop://'))
+    codec = packetHandler.codec
+
+    goals = []
+    for scs_id in SYNC_IDS:
+        goals.extend([scs_id, 0x00, 0x08])
+    reply = codec.encode(SERVO_ID, 0, (), [0x00, 0x08])  # status packet: ERROR DATA0 DATA1
+    reply = bytes(reply)
+
+    cases = [
+        ("read request", lambda: listPacket(SERVO_ID, INST_READ, [56, 2]),
+         lambda: codec.encode(SERVO_ID, INST_READ, (56, 2))),
+        ("read request (cached)", lambda: listPacket(SERVO_ID, INST_READ, [56, 2]),
+         lambda: codec.encodeCached(SERVO_ID, INST_READ, (56, 2))),
+        ("write 2 bytes", lambda: listPacket(SERVO_ID, INST_WRITE, [42, 0x00, 0x08]),
+         lambda: codec.encode(SERVO_ID, INST_WRITE, (42,), codec.word.pack(0x800))),
+        ("sync read x8 (cached)", lambda: listPacket(BROADCAST_ID, INST_SYNC_READ, [56, 2] + SYNC_IDS),
+         lambda: codec.encodeCached(BROADCAST_ID, INST_SYNC_READ, (56, 2), SYNC_IDS)),
+        ("sync write x8", lambda: listPacket(BROADCAST_ID, INST_SYNC_WRITE, [42, 2] + goals),
+         lambda: codec.encode(BROADCAST_ID, INST_SYNC_WRITE, (42, 2), goals)),
+        ("decode word", lambda: listDecode(packetHandler, reply),
+         lambda: codec.decodeWord(reply)),
+    ]
+
+    print("%-24s %12s %12s %9s" % ("packet", "list (ns)", "codec (ns)", "speedup"))
+    for name, before, after in cases:
+        before_ns = min(timeit.repeat(before, number=args.count, repeat=3)) / args.count * 1e9
+        after_ns = min(timeit.repeat(after, number=args.count, repeat=3)) / args.count * 1e9
+        print("%-24s %12.0f %12.0f %8.1fx" % (name, before_ns, after_ns, before_ns / after_ns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Compares busy-polling reads with event-driven (select/serial timeout) reads.
+#
+# A virtual servo bus runs in a child process behind a pty, with an adapter
+# latency standing in for the USB round trip. The client measures its own CPU
+# time and the round trip latency of readTxRx transactions in both read modes,
+# alternating the modes for --rounds rounds and keeping each mode's median
+# round (by p50), as the stand-in servo shares the machine with the client.
+#
+# Usage: python bench_read_wait.py [--count 2000] [--delay-ms 1.0] [--rounds 5]
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+cd = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna'))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna', 'SCServo_Python'))
+
+from scservo_sdk import *
+from virtual_bus import VirtualBus
+
+SERVO_ID = 1
+
+
+def serveBus(latency, pathQueue):
+    bus = VirtualBus([SERVO_ID], latency=latency)
+    pathQueue.put(bus.servePty())
+    while True:
+        time.sleep(1)
+
+
+def run(packetHandler, count):
+    latencies = []
+    failures = 0
+    cpu_start = time.process_time()
+    for _ in range(count):
+        start = time.perf_counter()
+        _, result, _ = packetHandler.readTxRx(SERVO_ID, SMS_STS_PRESENT_POSITION_L, 2)
+        latencies.append(time.perf_counter() - start)
+        if result != COMM_SUCCESS:
+            failures += 1
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    return cpu / count, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Busy-poll vs event-driven serial read benchmark')
+    parser.add_argument('--count', type=int, default=2000, help='Transactions per mode')
+    parser.add_argument('--delay-ms', type=float, default=1.0, help='Adapter latency of the virtual bus')
+    parser.add_argument('--rounds', type=int, default=5, help='Rounds per mode; the median one is reported')
+    args = parser.parse_args()
+
+    pathQueue = multiprocessing.Queue()
+    servo = multiprocessing.Process(target=serveBus, args=(args.delay_ms / 1000.0, pathQueue), daemon=True)
+    servo.start()
+
+    portHandler = PortHandler(pathQueue.get())
+    portHandler.openPort()
+    portHandler.setAdaptiveTimeout(False)  # isolate the read mode from learned timeouts
+    packetHandler = sms_sts(portHandler)
+
+    modes = (("busy-poll", False), ("event-driven", True))
+    rounds = {mode: [] for mode, _ in modes}
+    for _ in range(args.rounds):
+        for mode, blocking in modes:
+            portHandler.setBlockingRead(blocking)
+            rounds[mode].append(run(packetHandler, args.count))
+
+    print("%-14s %14s %12s %12s %9s" % ("mode", "cpu/txn (us)", "p50 (us)", "p99 (us)", "failures"))
+    for mode, _ in modes:
+        cpu, p50, p99, failures = sorted(rounds[mode], key=lambda result: result[1])[len(rounds[mode]) // 2]
+        print("%-14s %14.1f %12.1f %12.1f %9d" % (mode, cpu * 1e6, p50 * 1e6, p99 * 1e6, failures))
+
+    portHandler.closePort()
+    servo.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Per-call register overhead of readReg/writeReg: the linear scan over
+# servoRegs plus scs_makeword/scs_tohost decoding the tuna used to do, versus
+# the compiled RegisterMap (dict lookup, precompiled struct per register and
+# per span).
+#
+# Usage: python bench_register_map.py [--count 200000]
+
+import argparse
+import os
+import sys
+import timeit
+
+cd = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna'))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna', 'SCServo_Python'))
+
+from scservo_sdk import *
+from feetech_tuna import servoRegs
+from register_map import RegisterMap
+
+# Present Position is near the end of the list, like most teleop registers
+REG_ADDR = SMS_STS_PRESENT_POSITION_L
+STATE = bytes([0x00, 0x08, 0x05, 0x80, 0x10, 0x00])  # position, speed, load
+
+
+def listLookup(regAddr):
+    reg = None
+    for r in servoRegs:
+        if r["addr"] == regAddr:
+            reg = r
+            break
+    return reg
+
+
+def listDecode(packetHandler, data, size):
+    if size == 2:
+        return packetHandler.scs_tohost(packetHandler.scs_makeword(data[0], data[1]), 15)
+    return data[0]
+
+
+def listEncode(packetHandler, value, size):
+    if size == 2:
+        return [packetHandler.scs_lobyte(value), packetHandler.scs_hibyte(value)]
+    return [value]
+
+
+def listState(packetHandler, data):
+    return {
+        reg: listDecode(packetHandler, data[reg - REG_ADDR:], 2)
+        for reg in (REG_ADDR, REG_ADDR + 2, REG_ADDR + 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Register schema lookup/codec microbenchmark')
+    parser.add_argument('--count', type=int, default=200000, help='Calls per case')
+    args = parser.parse_args()
+
+    packetHandler = sms_sts(PortHandler('loop://'))
+    regMap = RegisterMap(servoRegs)
+
+    cases = [
+        ("lookup", lambda: listLookup(REG_ADDR), lambda: regMap.get(REG_ADDR)),
+        ("lookup + decode", lambda: listDecode(packetHandler, STATE, listLookup(REG_ADDR)["size"]),
+         lambda: regMap.get(REG_ADDR).decode(STATE)),
+        ("lookup + encode", lambda: listEncode(packetHandler, 2048, listLookup(SMS_STS_GOAL_POSITION_L)["size"]),
+         lambda: regMap.get(SMS_STS_GOAL_POSITION_L).encode(2048)),
+        ("decode 3-register span", lambda: listState(packetHandler, STATE),
+         lambda: regMap.decodeSpan(REG_ADDR, STATE)),
+    ]
+
+    print("%-24s %12s %12s %9s" % ("operation", "list (ns)", "map (ns)", "speedup"))
+    for name, before, after in cases:
+        before_ns = min(timeit.repeat(before, number=args.count, repeat=3)) / args.count * 1e9
+        after_ns = min(timeit.repeat(after, number=args.count, repeat=3)) / args.count * 1e9
+        print("%-24s %12.0f %12.0f %8.1fx" % (name, before_ns, after_ns, before_ns / after_ns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Fault injection against the status packet parser.
+#
+# Runs readTxRx transactions against an in-memory virtual bus that injects
+# line noise, corrupted and truncated replies, once with the previous
+# list-based rxPacket (per-byte header scan, del rxpacket[0] to resync) and
+# once with the incremental RxPacketParser. Reports how many transactions
+# succeeded, how many returned a wrong value, and the wall/CPU time spent per
+# transaction (best of --rounds, alternating the parsers).
+#
+# Then checks that a corrupt status packet does not take the packets received
+# after it down with it: pipelined batches whose first reply fails its
+# checksum, and batches under random corruption, where every reply that was
+# left intact must come back (nothing is dropped, so losing one is a bug).
+#
+# Usage: python bench_rx_resync.py [--count 500] [--seed 1] [--rounds 3]
+
+import argparse
+import os
+import sys
+import time
+
+cd = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna'))
+sys.path.append(os.path.join(cd, '..', 'feetech_tuna', 'SCServo_Python'))
+
+from scservo_sdk import *
+from virtual_bus import VirtualBus, registerVirtualBus
+
+SERVO_ID = 1
+POSITION = 0x0A0B
+
+SCENARIOS = [
+    ("clean", {}),
+    ("noise 50%", {"noise": 0.5}),
+    ("noise 100% x64", {"noise": 1.0, "noiseLength": 64}),
+    ("0xFF burst x200", {"noise": 1.0, "noiseLength": 200, "noiseByte": 0xFF}),
+    ("corrupt 20%", {"corrupt": 0.2}),
+    ("truncate 10%", {"truncate": 0.1}),
+]
+
+
+class list_sms_sts(sms_sts):
+    # The rxPacket this SDK shipped with, kept for comparison
+    def rxPacket(self):
+        rxpacket = []
+
+        result = COMM_TX_FAIL
+        checksum = 0
+        rx_length = 0
+        wait_length = 6
+
+        while True:
+            rxpacket.extend(self.portHandler.readPortWait(wait_length - rx_length))
+            rx_length = len(rxpacket)
+            if rx_length >= wait_length:
+                for idx in range(0, (rx_length - 1)):
+                    if (rxpacket[idx] == 0xFF) and (rxpacket[idx + 1] == 0xFF):
+                        break
+
+                if idx == 0:
+                    if (rxpacket[PKT_ID] > 0xFD) or (rxpacket[PKT_LENGTH] > RXPACKET_MAX_LEN) or (
+                            rxpacket[PKT_ERROR] > 0x7F):
+                        del rxpacket[0]
+                        rx_length -= 1
+                        continue
+
+                    if wait_length != (rxpacket[PKT_LENGTH] + PKT_LENGTH + 1):
+                        wait_length = rxpacket[PKT_LENGTH] + PKT_LENGTH + 1
+                        continue
+
+                    if rx_length < wait_length:
+                        if self.portHandler.isPacketTimeout():
+                            if rx_length == 0:
+                                result = COMM_RX_TIMEOUT
+                            else:
+                                result = COMM_RX_CORRUPT
+                            break
+                        else:
+                            continue
+
+                    for i in range(2, wait_length - 1):
+                        checksum += rxpacket[i]
+                    checksum = ~checksum & 0xFF
+
+                    if rxpacket[wait_length - 1] == checksum:
+                        result = COMM_SUCCESS
+                    else:
+                        result = COMM_RX_CORRUPT
+                    break
+
+                else:
+                    del rxpacket[0: idx]
+                    rx_length -= idx
+
+            else:
+                if self.portHandler.isPacketTimeout():
+                    if rx_length == 0:
+                        result = COMM_RX_TIMEOUT
+                    else:
+                        result = COMM_RX_CORRUPT
+                    break
+
+        self.portHandler.is_using = False
+        return bytearray(rxpacket), result  # readNByteTxRx decode from a buffer
+
+
+def run(packetHandler, bus, faults, count, seed):
+    bus.setFaults(seed=seed, **faults)
+    packetHandler.portHandler.transport.resetInput()
+    ok = wrong = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(count):
+        position, result, _ = packetHandler.read2ByteTxRx(SERVO_ID, SMS_STS_PRESENT_POSITION_L)
+        if result == COMM_SUCCESS:
+            if position == POSITION:
+                ok += 1
+            else:
+                wrong += 1
+        packetHandler.portHandler.transport.resetInput()  # drop leftovers of a failed transaction
+    wall = (time.perf_counter() - wall_start) / count
+    cpu = (time.process_time() - cpu_start) / count
+    return ok, wrong, wall, cpu
+
+
+def corruptFirstReply(bus):
+    # Flips the checksum of the next status packet only
+    injectFaults = bus.injectFaults
+
+    def inject(reply):
+        bus.injectFaults = injectFaults
+        reply = bytearray(reply)
+        reply[-1] ^= 0xFF
+        return bytes(reply)
+
+    bus.injectFaults = inject
+
+
+def checkBatches(portHandler, bus, count, seed):
+    # Returns True when every check passed
+    portHandler.transport.resetInput()
+    bus.setFaults()
+    packetHandler = sms_sts(portHandler)
+    packetHandler.setPipelining(True)
+    servoIds = bus.servoIds()
+    requests = [(servoId, INST_READ, (SMS_STS_PRESENT_POSITION_L, 2)) for servoId in servoIds]
+    passed = True
+
+    corruptFirstReply(bus)
+    results = [result for _, result, _ in packetHandler.txRxBatch(requests)]
+    expected = [COMM_RX_CORRUPT] + [COMM_SUCCESS] * (len(requests) - 1)
+    ok = results == expected
+    passed = passed and ok
+    print("%-40s %s %s" % ("batch, first reply corrupt", "ok  " if ok else "FAIL", results))
+
+    bus.setFaults(corrupt=0.15, seed=seed)
+    injectFaults = bus.injectFaults
+    intact = []  # per reply of the current batch, in bus order
+
+    def inject(reply):
+        faulty = injectFaults(reply)
+        intact.append(faulty == reply)
+        return faulty
+
+    bus.injectFaults = inject
+    lost = 0
+    for _ in range(count):
+        portHandler.transport.resetInput()
+        intact.clear()
+        replies = packetHandler.txRxBatch(requests)
+        lost += sum(1 for (_, result, _), good in zip(replies, intact) if good and result != COMM_SUCCESS)
+    bus.injectFaults = injectFaults
+    ok = lost == 0
+    passed = passed and ok
+    print("%-40s %s %d intact replies lost, %d corrupt replies" % (
+        "batches, corrupt 15%", "ok  " if ok else "FAIL", lost, bus.faultCounts["corrupt"]))
+    bus.setFaults()
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Status packet parser fault injection benchmark')
+    parser.add_argument('--count', type=int, default=500, help='Transactions per scenario and parser')
+    parser.add_argument('--seed', type=int, default=1, help='Fault injection seed')
+    parser.add_argument('--rounds', type=int, default=3, help='Rounds per scenario and parser; the fastest one counts')
+    args = parser.parse_args()
+
+    bus = VirtualBus([SERVO_ID, SERVO_ID + 1, SERVO_ID + 2])
+    bus.getServo(SERVO_ID).setPosition(POSITION)
+    portHandler = PortHandler(registerVirtualBus("resync", bus))
+    portHandler.openPort()
+    portHandler.setAdaptiveTimeout(False)  # every failure costs the same fixed timeout
+
+    print("%-16s %-12s %6s %6s %12s %12s" % ("scenario", "parser", "ok", "wrong", "wall (us)", "cpu (us)"))
+    for name, faults in SCENARIOS:
+        best = {}
+        for _ in range(args.rounds):
+            for label, handler in (("list", list_sms_sts(portHandler)), ("incremental", sms_sts(portHandler))):
+                ok, wrong, wall, cpu = run(handler, bus, faults, args.count, args.seed)
+                previous = best.get(label)
+                best[label] = (ok, wrong, min(wall, previous[2]) if previous else wall,
+                               min(cpu, previous[3]) if previous else cpu)
+        for label, (ok, wrong, wall, cpu) in best.items():
+            print("%-16s %-12s %6d %6d %12.1f %12.1f" % (name, label, ok, wrong, wall * 1e6, cpu * 1e6))
+
+    print()
+    passed = checkBatches(portHandler, bus, args.count, args.seed)
+
+    portHandler.closePort()
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
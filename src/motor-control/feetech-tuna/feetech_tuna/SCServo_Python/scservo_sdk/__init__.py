@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
+from .transport import *
 from .port_handler import *
+from .bus_metrics import *
 from .protocol_packet_handler import *
 from .group_sync_write import *
 from .group_sync_read import *
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+import bisect
+import threading
+import time
+from collections import deque
+
+from .scservo_def import *
+
+# Packet layout (see protocol_packet_handler), repeated here to keep this
+# module free of the packet handler
+PKT_ID_INDEX = 2
+PKT_LENGTH_INDEX = 3
+PKT_INSTRUCTION_INDEX = 4
+
+# Upper bounds (ms) of the transaction latency histogram buckets; slower
+# transactions land in one more overflow bucket
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+# Transactions kept for snapshot()["recent"]
+RECENT_SIZE = 64
+
+INSTRUCTION_NAMES = {
+    INST_PING: "ping",
+    INST_READ: "read",
+    INST_WRITE: "write",
+    INST_REG_WRITE: "reg_write",
+    INST_ACTION: "action",
+    INST_SYNC_READ: "sync_read",
+    INST_SYNC_WRITE: "sync_write",
+    None: "batch",
+}
+
+RESULT_NAMES = {
+    COMM_SUCCESS: "success",
+    COMM_PORT_BUSY: "port_busy",
+    COMM_TX_FAIL: "tx_fail",
+    COMM_RX_FAIL: "rx_fail",
+    COMM_TX_ERROR: "tx_error",
+    COMM_RX_WAITING: "rx_waiting",
+    COMM_RX_TIMEOUT: "rx_timeout",
+    COMM_RX_CORRUPT: "rx_corrupt",
+    COMM_NOT_AVAILABLE: "not_available",
+}
+
+
+class ServoMetrics(object):
+    # Aggregated transactions addressed to one ID (BROADCAST_ID for sync
+    # reads and writes, None for pipelined batches)
+    def __init__(self):
+        self.transactions = 0
+        self.failures = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, elapsed, retry, result):
+        self.transactions += 1
+        if result != COMM_SUCCESS:
+            self.failures += 1
+        if retry:
+            self.retries += 1
+        self.total_ms += elapsed
+        if elapsed > self.max_ms:
+            self.max_ms = elapsed
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def snapshot(self):
+        labels = ["<=" + str(bound) for bound in LATENCY_BUCKETS] + [">" + str(LATENCY_BUCKETS[-1])]
+        return {
+            "transactions": self.transactions,
+            "failures": self.failures,
+            "retries": self.retries,
+            "mean_ms": self.total_ms / self.transactions if self.transactions else 0.0,
+            "max_ms": self.max_ms,
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class BusMetrics(object):
+    # Per-transaction instrumentation of one port. The PortHandler calls
+    # begin() when a packet is written, received() for every read and end()
+    # once the transaction has a result; each transaction is split into wire
+    # time (its bytes at the port's baud rate, 10 bits per byte) and wait
+    # time (everything else: adapter latency, return delay, timeouts).
+    #
+    # A PortHandler without metrics pays one None check per call.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic_ns() / 1000000.0
+            self.current = None  # [start, instruction, id, tx bytes, rx bytes, retry]
+            self.next_retry = False
+            self.transactions = 0
+            self.retries = 0
+            self.tx_bytes = 0
+            self.rx_bytes = 0
+            self.wire_ms = 0.0
+            self.wait_ms = 0.0
+            self.results = {}
+            self.instructions = {}
+            self.servos = {}
+            self.recent = deque(maxlen=RECENT_SIZE)
+
+    def retrying(self):
+        # Marks the next transaction as a retry of a failed one
+        self.next_retry = True
+
+    def begin(self, packet, now):
+        if len(packet) > packet[PKT_LENGTH_INDEX] + 4:
+            instruction, scs_id = None, None  # several packets in one write
+        else:
+            instruction, scs_id = packet[PKT_INSTRUCTION_INDEX], packet[PKT_ID_INDEX]
+        self.current = [now, instruction, scs_id, len(packet), 0, self.next_retry]
+        self.next_retry = False
+
+    def received(self, length):
+        if self.current is not None:
+            self.current[4] += length
+
+    def end(self, result, now, ms_per_byte):
+        current = self.current
+        if current is None:
+            return
+        self.current = None
+
+        start, instruction, scs_id, tx_bytes, rx_bytes, retry = current
+        elapsed = now - start
+        wire = (tx_bytes + rx_bytes) * ms_per_byte
+        wait = elapsed - wire if elapsed > wire else 0.0
+        # deque appends are atomic, so the ring needs no lock (snapshot()
+        # copies it in one step)
+        self.recent.append((start, instruction, scs_id, tx_bytes, rx_bytes, wire, wait, retry, result))
+
+        with self.lock:
+            self.transactions += 1
+            if retry:
+                self.retries += 1
+            self.tx_bytes += tx_bytes
+            self.rx_bytes += rx_bytes
+            self.wire_ms += wire
+            self.wait_ms += wait
+            self.results[result] = self.results.get(result, 0) + 1
+            self.instructions[instruction] = self.instructions.get(instruction, 0) + 1
+            servo = self.servos.get(scs_id)
+            if servo is None:
+                servo = self.servos[scs_id] = ServoMetrics()
+            servo.add(elapsed, retry, result)
+
+    def snapshot(self):
+        # Everything recorded since the last reset. utilization_pct is the
+        # share of the elapsed time the line carried bytes.
+        with self.lock:
+            elapsed = time.monotonic_ns() / 1000000.0 - self.started
+            return {
+                "elapsed_ms": elapsed,
+                "transactions": self.transactions,
+                "retries": self.retries,
+                "tx_bytes": self.tx_bytes,
+                "rx_bytes": self.rx_bytes,
+                "wire_ms": self.wire_ms,
+                "wait_ms": self.wait_ms,
+                "utilization_pct": 100.0 * self.wire_ms / elapsed if elapsed > 0 else 0.0,
+                "results": {RESULT_NAMES.get(result, str(result)): count for result, count in self.results.items()},
+                "instructions": {INSTRUCTION_NAMES.get(instruction, str(instruction)): count
+                                 for instruction, count in self.instructions.items()},
+                "servos": {self.servoKey(scs_id): servo.snapshot() for scs_id, servo in self.servos.items()},
+                "recent": [{
+                    "start_ms": start - self.started,
+                    "instruction": INSTRUCTION_NAMES.get(instruction, str(instruction)),
+                    "id": scs_id,
+                    "tx_bytes": tx_bytes,
+                    "rx_bytes": rx_bytes,
+                    "wire_ms": wire,
+                    "wait_ms": wait,
+                    "retry": retry,
+                    "result": RESULT_NAMES.get(result, str(result)),
+                } for start, instruction, scs_id, tx_bytes, rx_bytes, wire, wait, retry, result in list(self.recent)],
+            }
+
+    def servoKey(self, scs_id):
+        if scs_id is None:
+            return "batch"
+        if scs_id == BROADCAST_ID:
+            return "broadcast"
+        return scs_id
@@ -3,11 +3,16 @@
 from .scservo_def import *
 
 class GroupSyncRead:
-    def __init__(self, ph, start_address, data_length):
+    def __init__(self, ph, start_address, data_length, streaming=False):
         self.ph = ph
         self.start_address = start_address
         self.data_length = data_length
 
+        # streaming: parse status packets as they arrive and stop as soon as
+        # every servo has answered (see protocol_packet_handler.syncReadRxStream)
+        self.streaming = streaming
+        self.result_dict = {}
+
         self.last_result = False
         self.is_param_changed = False
         self.param = []
@@ -24,11 +29,14 @@ class GroupSyncRead:
         for scs_id in self.data_dict:
             self.param.append(scs_id)
 
+        self.is_param_changed = False
+
     def addParam(self, scs_id):
         if scs_id in self.data_dict:  # scs_id already exist
             return False
 
         self.data_dict[scs_id] = []  # [0] * self.data_length
+        self.result_dict[scs_id] = COMM_RX_FAIL
 
         self.is_param_changed = True
         return True
@@ -38,11 +46,13 @@ class GroupSyncRead:
             return
 
         del self.data_dict[scs_id]
+        del self.result_dict[scs_id]
 
         self.is_param_changed = True
 
     def clearParam(self):
         self.data_dict.clear()
+        self.result_dict.clear()
 
     def txPacket(self):
         if len(self.data_dict.keys()) == 0:
@@ -55,23 +65,24 @@ class GroupSyncRead:
         return self.ph.syncReadTx(self.start_address, self.data_length, self.param, len(self.data_dict.keys()))
 
     def rxPacket(self):
-        self.last_result = True
-
-        result = COMM_RX_FAIL
-
         if len(self.data_dict.keys()) == 0:
             return COMM_NOT_AVAILABLE
 
-        result, rxpacket = self.ph.syncReadRx(self.data_length, len(self.data_dict.keys()))
-        # print(rxpacket)
-        if len(rxpacket) >= (self.data_length+6):
-            for scs_id in self.data_dict:
-                self.data_dict[scs_id], result = self.readRx(rxpacket, scs_id, self.data_length)
-                if result != COMM_SUCCESS:
-                    self.last_result = False
-                # print(scs_id)
+        if self.streaming:
+            result, rx_dict = self.ph.syncReadRxStream(self.data_length, list(self.data_dict.keys()))
         else:
-            self.last_result = False
+            result, rxpacket = self.ph.syncReadRx(self.data_length, len(self.data_dict.keys()))
+            # print(rxpacket)
+
+            # demultiplex every status packet in one pass over the reply
+            pending = set(self.data_dict.keys())
+            rx_dict = {}
+            self.ph.syncReadParse(rxpacket, 0, self.data_length, pending, rx_dict)
+            result = self.ph.syncReadResult(rx_dict, pending)
+
+        for scs_id in self.data_dict:
+            self.data_dict[scs_id], self.result_dict[scs_id] = rx_dict[scs_id]
+        self.last_result = result == COMM_SUCCESS
         # print(self.last_result)
         return result
 
@@ -82,46 +93,8 @@ class GroupSyncRead:
 
         return self.rxPacket()
 
-    def readRx(self, rxpacket, scs_id, data_length):
-        # print(scs_id)
-        # print(rxpacket)
-        data = []
-        rx_length = len(rxpacket)
-        # print(rx_length)
-        rx_index = 0;
-        while (rx_index+6+data_length) <= rx_length:
-            headpacket = [0x00, 0x00, 0x00]
-            while rx_index < rx_length:
-                headpacket[2] = headpacket[1];
-                headpacket[1] = headpacket[0];
-                headpacket[0] = rxpacket[rx_index];
-                rx_index += 1
-                if (headpacket[2] == 0xFF) and (headpacket[1] == 0xFF) and headpacket[0] == scs_id:
-                    # print(rx_index)
-                    break
-            # print(rx_index+3+data_length)
-            if (rx_index+3+data_length) > rx_length:
-                break;
-            if rxpacket[rx_index] != (data_length+2):
-                rx_index += 1
-                # print(rx_index)
-                continue
-            rx_index += 1
-            Error = rxpacket[rx_index]
-            rx_index += 1
-            calSum = scs_id + (data_length+2) + Error
-            data = [Error]
-            data.extend(rxpacket[rx_index : rx_index+data_length])
-            for i in range(0, data_length):
-                calSum += rxpacket[rx_index]
-                rx_index += 1
-            calSum = ~calSum & 0xFF
-            # print(calSum)
-            if calSum != rxpacket[rx_index]:
-                return None, COMM_RX_CORRUPT
-            return data, COMM_SUCCESS 
-        # print(rx_index)
-        return None, COMM_RX_CORRUPT
+    def getResult(self, scs_id):
+        return self.result_dict.get(scs_id, COMM_NOT_AVAILABLE)
 
     def isAvailable(self, scs_id, address, data_length):
         #if self.last_result is False or scs_id not in self.data_dict:
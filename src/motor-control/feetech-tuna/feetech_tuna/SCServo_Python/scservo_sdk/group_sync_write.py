@@ -27,6 +27,8 @@ class GroupSyncWrite:
             self.param.append(scs_id)
             self.param.extend(self.data_dict[scs_id])
 
+        self.is_param_changed = False
+
     def addParam(self, scs_id, data):
         if scs_id in self.data_dict:  # scs_id already exist
             return False
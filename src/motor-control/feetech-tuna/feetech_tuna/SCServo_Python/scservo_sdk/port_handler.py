@@ -1,34 +1,101 @@
 #!/usr/bin/env python
 
+import os
 import time
-import serial
 import sys
-import platform
+
+from .transport import openTransport
 
 DEFAULT_BAUDRATE = 1000000
 LATENCY_TIMER = 50 
 
+# Adaptive packet timeout defaults (ms). The wait allowed on top of the wire
+# time is the learned latency percentile * ADAPTIVE_FACTOR + ADAPTIVE_MARGIN,
+# bounded by [ADAPTIVE_FLOOR, LATENCY_TIMER].
+ADAPTIVE_PERCENTILE = 99
+ADAPTIVE_FACTOR = 1.5
+ADAPTIVE_MARGIN = 1.0
+ADAPTIVE_FLOOR = 2.0
+
+# How much earlier than the expected reply a blocking read stops sleeping and
+# starts polling (ms); covers the scheduler's wake-up latency
+WAKE_MARGIN = 0.3
+
+# Gives the CPU to other runnable threads while polling (sched_yield is POSIX only)
+yieldCpu = getattr(os, "sched_yield", lambda: time.sleep(0))
+
+
+class RoundTripStats(object):
+    # Sliding window of reply latencies (ms beyond the expected wire time) for
+    # one servo or one adapter
+    def __init__(self, size=64, min_samples=16):
+        self.samples = [0.0] * size
+        self.size = size
+        self.min_samples = min_samples
+        self.count = 0
+        self.index = 0
+        self.misses = 0
+        self.sorted = None
+
+    def add(self, latency):
+        self.samples[self.index] = latency
+        self.index = (self.index + 1) % self.size
+        self.count += 1
+        self.misses = 0
+        # re-sort lazily, at most every 8 samples
+        if self.count % 8 == 0 or self.count == self.min_samples:
+            self.sorted = None
+
+    def miss(self):
+        self.misses += 1
+
+    def isReady(self):
+        return self.count >= self.min_samples
+
+    def percentile(self, p):
+        if self.sorted is None:
+            self.sorted = sorted(self.samples[:min(self.count, self.size)])
+        return self.sorted[min(len(self.sorted) - 1, int(len(self.sorted) * p / 100.0))]
+
+
 class PortHandler(object):
     def __init__(self, port_name):
         self.is_open = False
         self.baudrate = DEFAULT_BAUDRATE
         self.packet_start_time = 0.0
         self.packet_timeout = 0.0
+        self.packet_wire_time = 0.0
         self.tx_time_per_byte = 0.0
 
+        # Packet timeouts learned from measured reply latencies, per servo ID
+        # and for the adapter as a whole (used for IDs without enough samples)
+        self.adaptive_timeout = True
+        self.timeout_percentile = ADAPTIVE_PERCENTILE
+        self.timeout_floor = ADAPTIVE_FLOOR
+        self.timeout_ceiling = LATENCY_TIMER
+        self.servo_stats = {}
+        self.adapter_stats = RoundTripStats()
+
         self.is_using = False
         self.port_name = port_name
-        self.ser = None
+        self.transport = None
+        self.ser = None  # underlying serial.Serial, for serial transports only
+
+        # Sleep in the transport until replies arrive instead of busy polling
+        self.blocking_read = True
+
+        # Per-transaction instrumentation (a BusMetrics), off by default
+        self.metrics = None
 
     def openPort(self):
         return self.setBaudRate(self.baudrate)
 
     def closePort(self):
-        self.ser.close()
+        self.transport.close()
         self.is_open = False
 
     def clearPort(self):
-        self.ser.flush()
+        self.transport.flush()
 
     def setPortName(self, port_name):
         self.port_name = port_name
@@ -51,25 +118,137 @@ class PortHandler(object):
         return self.baudrate
 
     def getBytesAvailable(self):
-        return self.ser.in_waiting
+        return self.transport.inWaiting()
 
     def readPort(self, length):
         if (sys.version_info > (3, 0)):
-            return self.ser.read(length)
+            data = self.transport.read(length)
         else:
-            return [ord(ch) for ch in self.ser.read(length)]
+            data = [ord(ch) for ch in self.transport.read(length)]
+        if self.metrics is not None:
+            self.metrics.received(len(data))
+        return data
+
+    def readPortInto(self, buffer):
+        # Zero-copy read into a bytearray/memoryview; returns the byte count
+        count = self.transport.readinto(buffer)
+        if self.metrics is not None:
+            self.metrics.received(count)
+        return count
+
+    def readPortWait(self, length):
+        # Like readPort, but when nothing is available yet it waits until bytes
+        # arrive or the packet deadline passes (see waitRead)
+        data = self.readPort(length)
+        if data or length <= 0 or not self.blocking_read:
+            return data
+        return self.waitRead(self.readPort, length)
+
+    def readPortWaitInto(self, buffer):
+        # readPortWait into a caller-owned buffer; returns the byte count
+        count = self.readPortInto(buffer)
+        if count or len(buffer) == 0 or not self.blocking_read:
+            return count
+        return self.waitRead(self.readPortInto, buffer)
+
+    def waitRead(self, read, arg):
+        # Waits for reply bytes until the packet deadline and returns
+        # read(arg). Waking up from a sleep takes longer than a byte takes on
+        # the wire, so around when the reply is due (the fastest reply seen so
+        # far, or right away while there are too few samples) it polls without
+        # sleeping for about one wire time, yielding between polls so a busy
+        # machine still runs whatever produces the reply; anything later is
+        # slept for.
+        wire_time = self.packet_wire_time
+        spin_start = self.getTimeSinceStart()
+        if self.adapter_stats.isReady():
+            due = wire_time + self.adapter_stats.percentile(0)
+            spin_start = max(spin_start, due - wire_time - WAKE_MARGIN)
+        spin_end = min(spin_start + wire_time + WAKE_MARGIN, self.packet_timeout)
+
+        early = spin_start - self.getTimeSinceStart()
+        if early > 0 and self.transport.waitReadable(early / 1000.0):
+            return read(arg)
+        while self.getTimeSinceStart() < spin_end:
+            result = read(arg)
+            if result:
+                return result
+            yieldCpu()
+
+        remaining = self.packet_timeout - self.getTimeSinceStart()
+        if remaining > 0:
+            self.transport.waitReadable(remaining / 1000.0)
+        return read(arg)
+
+    def setBlockingRead(self, enable):
+        self.blocking_read = enable
 
     def writePort(self, packet):
-        return self.ser.write(packet)
+        if self.metrics is not None:
+            self.metrics.begin(packet, self.getCurrentTime())
+        return self.transport.write(packet)
+
+    def endTransaction(self, result):
+        # Releases the port once a transaction has its result
+        self.is_using = False
+        if self.metrics is not None:
+            self.metrics.end(result, self.getCurrentTime(), self.tx_time_per_byte)
+
+    def setMetrics(self, metrics):
+        # Records every transaction into metrics (a BusMetrics); None turns
+        # the instrumentation off
+        self.metrics = metrics
 
-    def setPacketTimeout(self, packet_length):
+    def setPacketTimeout(self, packet_length, scs_id=None):
         self.packet_start_time = self.getCurrentTime()
-        self.packet_timeout = (self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0) + LATENCY_TIMER
+        self.packet_wire_time = (self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0)
+        self.packet_timeout = self.packet_wire_time + self.getLatencyBudget(scs_id)
 
     def setPacketTimeoutMillis(self, msec):
         self.packet_start_time = self.getCurrentTime()
+        self.packet_wire_time = 0.0
         self.packet_timeout = msec
 
+    def setAdaptiveTimeout(self, enable, floor=ADAPTIVE_FLOOR, ceiling=LATENCY_TIMER, percentile=ADAPTIVE_PERCENTILE):
+        self.adaptive_timeout = enable
+        self.timeout_floor = floor
+        self.timeout_ceiling = ceiling
+        self.timeout_percentile = percentile
+
+    def getLatencyBudget(self, scs_id=None):
+        # Time allowed on top of the wire time for the reply to show up
+        if not self.adaptive_timeout:
+            return LATENCY_TIMER
+
+        stats = self.servo_stats.get(scs_id)
+        if stats is None or not stats.isReady():
+            stats = self.adapter_stats
+        if not stats.isReady():
+            return self.timeout_ceiling
+
+        budget = stats.percentile(self.timeout_percentile) * ADAPTIVE_FACTOR + ADAPTIVE_MARGIN
+        # back off after consecutive timeouts so a slower adapter can re-learn
+        budget *= 2 ** min(stats.misses, 5)
+        return min(max(budget, self.timeout_floor), self.timeout_ceiling)
+
+    def recordPacketTime(self, scs_id=None):
+        # Called once a complete reply arrived for the transaction started by setPacketTimeout
+        latency = max(self.getTimeSinceStart() - self.packet_wire_time, 0.0)
+        self.adapter_stats.add(latency)
+        if scs_id is not None:
+            stats = self.servo_stats.get(scs_id)
+            if stats is None:
+                stats = self.servo_stats[scs_id] = RoundTripStats()
+            stats.add(latency)
+
+    def recordPacketTimeout(self, scs_id=None):
+        # Counts the miss on the stats the timeout came from (see
+        # getLatencyBudget), so the budget that was too short backs off
+        stats = self.servo_stats.get(scs_id)
+        if stats is None or not stats.isReady():
+            stats = self.adapter_stats
+        stats.miss()
+
     def isPacketTimeout(self):
         if self.getTimeSinceStart() > self.packet_timeout:
             self.packet_timeout = 0
@@ -78,7 +257,7 @@ class PortHandler(object):
         return False
 
     def getCurrentTime(self):
-        return round(time.time() * 1000000000) / 1000000.0
+        return time.monotonic_ns() / 1000000.0
 
     def getTimeSinceStart(self):
         time_since = self.getCurrentTime() - self.packet_start_time
@@ -89,20 +268,16 @@ class PortHandler(object):
 
     def setupPort(self, cflag_baud):
         if self.is_open:
-            self.closePort()
-
-        self.ser = serial.Serial(
-            port=self.port_name,
-            baudrate=self.baudrate,
-            # parity = serial.PARITY_ODD,
-            # stopbits = serial.STOPBITS_TWO,
-            bytesize=serial.EIGHTBITS,
-            timeout=0
-        )
+            # change the rate in place instead of reconnecting (a TCP or
+            # virtual transport would lose its session)
+            self.transport.setBaudRate(self.baudrate)
+        else:
+            self.transport = openTransport(self.port_name, self.baudrate)
+            self.ser = getattr(self.transport, "ser", None)
 
-        self.is_open = True
+            self.is_open = True
 
-        self.ser.reset_input_buffer()
+        self.transport.resetInput()
 
         self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
 
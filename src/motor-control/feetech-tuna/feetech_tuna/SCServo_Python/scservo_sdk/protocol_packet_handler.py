@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import struct
+
 from .scservo_def import *
 
 TXPACKET_MAX_LEN = 250
@@ -21,18 +23,185 @@ ERRBIT_OVERHEAT = 4
 ERRBIT_OVERELE = 8
 ERRBIT_OVERLOAD = 32
 
+# Finished packets kept by PacketCodec.encodeCached
+PACKET_CACHE_SIZE = 512
+
+
+class PacketCodec(object):
+    # Builds instruction packets and decodes status packets in place.
+    # encode() builds each packet with a single bytearray and C-level
+    # extend/sum calls; packets that repeat verbatim (pings, reads, sync read
+    # requests) are built once by encodeCached() and kept as bytes with
+    # header and checksum in place.
+    def __init__(self, protocol_end=0):
+        self.cache = {}
+        self.setEnd(protocol_end)
+
+    def setEnd(self, protocol_end):
+        order = '<' if protocol_end == 0 else '>'
+        self.word = struct.Struct(order + 'H')
+        self.words = struct.Struct(order + 'HH')  # low word first
+
+    def finish(self, txpacket):
+        # Fills in header and checksum of a packet whose ID, LENGTH and
+        # parameters are set; returns the total packet length
+        total_packet_length = txpacket[PKT_LENGTH] + 4  # 4: HEADER0 HEADER1 ID LENGTH
+        txpacket[PKT_HEADER0] = 0xFF
+        txpacket[PKT_HEADER1] = 0xFF
+        txpacket[total_packet_length - 1] = ~sum(txpacket[PKT_ID: total_packet_length - 1]) & 0xFF
+        return total_packet_length
+
+    def encode(self, scs_id, instruction, head=(), data=(), data_length=None):
+        # head holds the leading parameters (address, length, ...), data the
+        # payload, of which the first data_length bytes are sent
+        if data_length is not None and data_length < len(data):
+            data = data[0: data_length]
+        txpacket = bytearray((0xFF, 0xFF, scs_id, len(head) + len(data) + 2, instruction, *head))
+        txpacket.extend(data)
+        if len(txpacket) >= TXPACKET_MAX_LEN:  # no room for CHKSUM
+            return None
+        txpacket.append(~(sum(txpacket) - 0x1FE) & 0xFF)  # 0x1FE: the two header bytes
+        return txpacket
+
+    def encodeCached(self, scs_id, instruction, head=(), data=()):
+        key = (scs_id, instruction, head, tuple(data))
+        packet = self.cache.get(key)
+        if packet is None:
+            txpacket = self.encode(scs_id, instruction, head, data)
+            if txpacket is None:
+                return None
+            if len(self.cache) >= PACKET_CACHE_SIZE:
+                self.cache.clear()
+            packet = self.cache[key] = bytes(txpacket)
+        return packet
+
+    def decodeWord(self, rxpacket, offset=PKT_PARAMETER0):
+        return self.word.unpack_from(rxpacket, offset)[0]
+
+    def decodeDword(self, rxpacket, offset=PKT_PARAMETER0):
+        low, high = self.words.unpack_from(rxpacket, offset)
+        return low | (high << 16)
+
+
+class RxPacketParser(object):
+    # Incremental status packet parser over a preallocated receive buffer.
+    # fill() reads whatever has arrived, and parse() resumes where the
+    # previous call stopped: headers are found with bytearray.find,
+    # ID/LENGTH/ERROR and the checksum are checked once, and garbage is
+    # skipped by moving an index instead of shifting the buffer. Bytes
+    # received past a complete packet are kept for the next one.
+    def __init__(self):
+        # room for the longest LENGTH field plus HEADER0 HEADER1 ID LENGTH
+        self.rxpacket = bytearray(RXPACKET_MAX_LEN + PKT_LENGTH + 1)
+        self.rxview = memoryview(self.rxpacket)
+        self.skipped = 0  # garbage bytes dropped, over the parser's lifetime
+        self.start = 0  # candidate packet start
+        self.end = 0  # end of the received bytes
+        self.complete = False
+        self.corrupt = False
+        self.begin()
+
+    def begin(self):
+        # Starts on the next packet. The previous one is consumed if it was
+        # complete. A packet that failed its checksum is stepped over (as a
+        # whole when a header or the end of the received bytes follows it,
+        # otherwise its LENGTH may be wrong and only its first byte is
+        # skipped), so packets received after it are kept. Anything else,
+        # e.g. a packet cut short by a timeout, is dropped.
+        if self.complete:
+            self.start += self.wait_length
+        elif self.corrupt:
+            after = self.start + self.wait_length
+            if after == self.end or self.rxpacket.startswith(b'\xff\xff', after, self.end):
+                self.skipped += self.wait_length
+                self.start = after
+            else:
+                self.skipped += 1
+                self.start += 1
+        else:
+            self.start = self.end
+        if self.start == self.end:
+            self.start = self.end = 0
+        self.scan = self.start  # no header starts before this index
+        self.received = self.end - self.start
+        self.wait_length = 6  # minimum length (HEADER0 HEADER1 ID LENGTH ERROR CHKSUM)
+        self.complete = False
+        self.corrupt = False
+
+    def fill(self, portHandler):
+        if self.end == len(self.rxpacket) or self.start + self.wait_length > len(self.rxpacket):
+            # move the candidate packet to the front
+            length = self.end - self.start
+            self.rxpacket[0: length] = self.rxpacket[self.start: self.end]
+            self.scan -= self.start
+            self.start = 0
+            self.end = length
+
+        count = portHandler.readPortWaitInto(self.rxview[self.end:])
+        self.end += count
+        self.received += count
+        return count
+
+    def skip(self, index):
+        self.skipped += index - self.start
+        self.start = index
+        self.wait_length = 6
+
+    def parse(self):
+        # Returns COMM_SUCCESS or COMM_RX_CORRUPT (checksum mismatch) once a
+        # packet is complete, COMM_RX_WAITING while more bytes are needed
+        rxpacket = self.rxpacket
+        while True:
+            head = rxpacket.find(b'\xff\xff', self.scan, self.end)
+            if head < 0:
+                # keep a trailing 0xFF, it may be the first half of a header
+                self.scan = max(self.end - 1, self.start)
+                self.skip(self.scan)
+                return COMM_RX_WAITING
+            if head != self.start:
+                self.skip(head)
+            self.scan = head
+
+            if self.end - head < 6:
+                return COMM_RX_WAITING
+
+            if (rxpacket[head + PKT_ID] > 0xFD) or (rxpacket[head + PKT_LENGTH] > RXPACKET_MAX_LEN) or (
+                    rxpacket[head + PKT_ERROR] > 0x7F) or (rxpacket[head + PKT_LENGTH] < 2):
+                # unavailable ID, Length or Error: resync after the first byte
+                self.scan = head + 1
+                continue
+
+            self.wait_length = rxpacket[head + PKT_LENGTH] + PKT_LENGTH + 1
+            if self.end - head < self.wait_length:
+                return COMM_RX_WAITING
+
+            tail = head + self.wait_length - 1
+            if rxpacket[tail] == ~sum(self.rxview[head + PKT_ID: tail]) & 0xFF:  # except header, checksum
+                self.complete = True
+                return COMM_SUCCESS
+            self.corrupt = True
+            return COMM_RX_CORRUPT
+
+    def packet(self):
+        # The packet (or what was received of it); valid until the next begin
+        return self.rxview[self.start: min(self.start + self.wait_length, self.end)]
+
 
 class protocol_packet_handler(object):
     def __init__(self, portHandler, protocol_end):
         #self.scs_setend(protocol_end)# SCServo bit end(STS/SMS=0, SCS=1)
         self.portHandler = portHandler
         self.scs_end = protocol_end
+        self.codec = PacketCodec(protocol_end)
+        self.parser = RxPacketParser()
+        self.pipelining = False
 
     def scs_getend(self):
         return self.scs_end
 
     def scs_setend(self, e):
         self.scs_end = e
+        self.codec.setEnd(e)
 
     def scs_tohost(self, a, b):
         if (a & (1<<b)):
@@ -117,7 +286,9 @@ class protocol_packet_handler(object):
         return ""
 
     def txPacket(self, txpacket):
-        checksum = 0
+        if txpacket is None:  # too long for the codec
+            return COMM_TX_ERROR
+
         total_packet_length = txpacket[PKT_LENGTH] + 4  # 4: HEADER0 HEADER1 ID LENGTH
 
         if self.portHandler.is_using:
@@ -126,18 +297,13 @@ class protocol_packet_handler(object):
 
         # check max packet length
         if total_packet_length > TXPACKET_MAX_LEN:
-            self.portHandler.is_using = False
+            self.portHandler.endTransaction(COMM_TX_ERROR)
             return COMM_TX_ERROR
 
-        # make packet header
-        txpacket[PKT_HEADER0] = 0xFF
-        txpacket[PKT_HEADER1] = 0xFF
-
-        # add a checksum to the packet
-        for idx in range(2, total_packet_length - 1):  # except header, checksum
-            checksum += txpacket[idx]
-
-        txpacket[total_packet_length - 1] = ~checksum & 0xFF
+        # packets from the codec are finished already, a list built by the
+        # caller still needs its header and checksum
+        if isinstance(txpacket, list):
+            self.codec.finish(txpacket)
 
         #print "[TxPacket] %r" % txpacket
 
@@ -145,81 +311,35 @@ class protocol_packet_handler(object):
         self.portHandler.clearPort()
         written_packet_length = self.portHandler.writePort(txpacket)
         if total_packet_length != written_packet_length:
-            self.portHandler.is_using = False
+            self.portHandler.endTransaction(COMM_TX_FAIL)
             return COMM_TX_FAIL
 
         return COMM_SUCCESS
 
     def rxPacket(self):
-        rxpacket = []
-
-        result = COMM_TX_FAIL
-        checksum = 0
-        rx_length = 0
-        wait_length = 6  # minimum length (HEADER0 HEADER1 ID LENGTH ERROR CHKSUM)
-
-        while True:
-            rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
-            rx_length = len(rxpacket)
-            if rx_length >= wait_length:
-                # find packet header
-                for idx in range(0, (rx_length - 1)):
-                    if (rxpacket[idx] == 0xFF) and (rxpacket[idx + 1] == 0xFF):
-                        break
-
-                if idx == 0:  # found at the beginning of the packet
-                    if (rxpacket[PKT_ID] > 0xFD) or (rxpacket[PKT_LENGTH] > RXPACKET_MAX_LEN) or (
-                            rxpacket[PKT_ERROR] > 0x7F):
-                        # unavailable ID or unavailable Length or unavailable Error
-                        # remove the first byte in the packet
-                        del rxpacket[0]
-                        rx_length -= 1
-                        continue
-
-                    # re-calculate the exact length of the rx packet
-                    if wait_length != (rxpacket[PKT_LENGTH] + PKT_LENGTH + 1):
-                        wait_length = rxpacket[PKT_LENGTH] + PKT_LENGTH + 1
-                        continue
-
-                    if rx_length < wait_length:
-                        # check timeout
-                        if self.portHandler.isPacketTimeout():
-                            if rx_length == 0:
-                                result = COMM_RX_TIMEOUT
-                            else:
-                                result = COMM_RX_CORRUPT
-                            break
-                        else:
-                            continue
-
-                    # calculate checksum
-                    for i in range(2, wait_length - 1):  # except header, checksum
-                        checksum += rxpacket[i]
-                    checksum = ~checksum & 0xFF
-
-                    # verify checksum
-                    if rxpacket[wait_length - 1] == checksum:
-                        result = COMM_SUCCESS
-                    else:
-                        result = COMM_RX_CORRUPT
+        # Receives into the parser's preallocated buffer; the returned
+        # memoryview is valid until the next rxPacket
+        parser = self.parser
+        parser.begin()
+
+        # a packet may already be buffered (received with the previous one)
+        result = parser.parse() if parser.received else COMM_RX_WAITING
+        while result == COMM_RX_WAITING:
+            if parser.fill(self.portHandler):
+                result = parser.parse()
+                if result != COMM_RX_WAITING:
                     break
 
+            # check timeout
+            if self.portHandler.isPacketTimeout():
+                if parser.received == 0:
+                    result = COMM_RX_TIMEOUT
                 else:
-                    # remove unnecessary packets
-                    del rxpacket[0: idx]
-                    rx_length -= idx
-
-            else:
-                # check timeout
-                if self.portHandler.isPacketTimeout():
-                    if rx_length == 0:
-                        result = COMM_RX_TIMEOUT
-                    else:
-                        result = COMM_RX_CORRUPT
-                    break
+                    result = COMM_RX_CORRUPT
+                break
 
         self.portHandler.is_using = False
-        return rxpacket, result
+        return parser.packet(), result
 
     def txRxPacket(self, txpacket):
         rxpacket = None
@@ -232,77 +352,150 @@ class protocol_packet_handler(object):
 
         # (ID == Broadcast ID) == no need to wait for status packet or not available
         if (txpacket[PKT_ID] == BROADCAST_ID):
-            self.portHandler.is_using = False
+            self.portHandler.endTransaction(result)
             return rxpacket, result, error
 
         # set packet timeout
         if txpacket[PKT_INSTRUCTION] == INST_READ:
-            self.portHandler.setPacketTimeout(txpacket[PKT_PARAMETER0 + 1] + 6)
+            self.portHandler.setPacketTimeout(txpacket[PKT_PARAMETER0 + 1] + 6, txpacket[PKT_ID])
         else:
-            self.portHandler.setPacketTimeout(6)  # HEADER0 HEADER1 ID LENGTH ERROR CHECKSUM
+            self.portHandler.setPacketTimeout(6, txpacket[PKT_ID])  # HEADER0 HEADER1 ID LENGTH ERROR CHECKSUM
 
         # rx packet
         while True:
             rxpacket, result = self.rxPacket()
             if result != COMM_SUCCESS or txpacket[PKT_ID] == rxpacket[PKT_ID]:
                 break
+        self.portHandler.endTransaction(result)
+
+        if result == COMM_SUCCESS:
+            self.portHandler.recordPacketTime(txpacket[PKT_ID])
+        elif result == COMM_RX_TIMEOUT:
+            self.portHandler.recordPacketTimeout(txpacket[PKT_ID])
 
         if result == COMM_SUCCESS and txpacket[PKT_ID] == rxpacket[PKT_ID]:
             error = rxpacket[PKT_ERROR]
 
         return rxpacket, result, error
 
-    def ping(self, scs_id):
+    def setPipelining(self, enable):
+        # Lets txRxBatch send all of its packets in one write. Only safe when
+        # the servos' Return Delay keeps their replies off the (half-duplex)
+        # line until the whole batch has been sent.
+        self.pipelining = enable
+
+    def txRxBatch(self, requests):
+        # Runs a list of (scs_id, instruction, params) requests and returns one
+        # (data, result, error) per request, data being the reply parameters.
+        # With pipelining the packets go out in a single write and the status
+        # packets are matched to the requests by ID, in order, under one shared
+        # deadline; otherwise each request is its own transaction.
+        results = [([], COMM_RX_TIMEOUT, 0)] * len(requests)
+
+        if not self.pipelining:
+            for index, (scs_id, instruction, params) in enumerate(requests):
+                rxpacket, result, error = self.txRxPacket(self.codec.encode(scs_id, instruction, (), params))
+                data = list(rxpacket[PKT_PARAMETER0: len(rxpacket) - 1]) if rxpacket and result == COMM_SUCCESS else []
+                results[index] = (data, result, error)
+            return results
+
+        batch = bytearray()
+        pending = []  # indexes of the requests that get a status packet, in bus order
+        rx_length = 0
+        for index, (scs_id, instruction, params) in enumerate(requests):
+            txpacket = self.codec.encode(scs_id, instruction, (), params)
+            if txpacket is None:
+                results[index] = ([], COMM_TX_ERROR, 0)
+                continue
+            batch += txpacket
+            if scs_id == BROADCAST_ID:
+                results[index] = ([], COMM_SUCCESS, 0)
+            else:
+                pending.append(index)
+                rx_length += 6 + (params[1] if instruction == INST_READ else 0)
+
+        if self.portHandler.is_using:
+            return [([], COMM_PORT_BUSY, 0)] * len(requests)
+        self.portHandler.is_using = True
+
+        self.portHandler.clearPort()
+        if self.portHandler.writePort(batch) != len(batch):
+            self.portHandler.endTransaction(COMM_TX_FAIL)
+            return [([], COMM_TX_FAIL, 0)] * len(requests)
+
+        # one deadline for sending the batch and receiving every reply
+        self.portHandler.setPacketTimeout(len(batch) + rx_length)
+
+        position = 0
+        while position < len(pending):
+            rxpacket, result = self.rxPacket()
+            if result == COMM_RX_TIMEOUT:
+                break
+
+            # the first outstanding request from this ID; the ones before it
+            # were skipped by the bus and stay timed out
+            match = None
+            if len(rxpacket) > PKT_ID:
+                for candidate in range(position, len(pending)):
+                    if requests[pending[candidate]][0] == rxpacket[PKT_ID]:
+                        match = candidate
+                        break
+
+            if match is None:
+                if self.portHandler.isPacketTimeout():
+                    break
+                continue
+
+            if result == COMM_SUCCESS:
+                data = list(rxpacket[PKT_PARAMETER0: len(rxpacket) - 1])
+                results[pending[match]] = (data, result, rxpacket[PKT_ERROR])
+            else:
+                results[pending[match]] = ([], result, 0)
+            position = match + 1
+
+        self.portHandler.endTransaction(next((result for _, result, _ in results if result != COMM_SUCCESS), COMM_SUCCESS))
+
+        if pending and position == len(pending):
+            self.portHandler.recordPacketTime()
+        elif pending and position == 0:
+            self.portHandler.recordPacketTimeout()
+
+        return results
+
+    def ping(self, scs_id, read_model=True):
         model_number = 0
         error = 0
 
-        txpacket = [0] * 6
-
         if scs_id >= BROADCAST_ID:
             return model_number, COMM_NOT_AVAILABLE, error
 
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = 2
-        txpacket[PKT_INSTRUCTION] = INST_PING
+        txpacket = self.codec.encodeCached(scs_id, INST_PING)
 
         rxpacket, result, error = self.txRxPacket(txpacket)
 
-        if result == COMM_SUCCESS:
-            data_read, result, error = self.readTxRx(scs_id, 3, 2)  # Address 3 : Model Number
-            if result == COMM_SUCCESS:
-                model_number = self.scs_makeword(data_read[0], data_read[1])
+        if result == COMM_SUCCESS and read_model:
+            model_number, result, error = self.read2ByteTxRx(scs_id, 3)  # Address 3 : Model Number
 
         return model_number, result, error
 
     def action(self, scs_id):
-        txpacket = [0] * 6
-
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = 2
-        txpacket[PKT_INSTRUCTION] = INST_ACTION
+        txpacket = self.codec.encodeCached(scs_id, INST_ACTION)
 
         _, result, _ = self.txRxPacket(txpacket)
 
         return result
 
     def readTx(self, scs_id, address, length):
-
-        txpacket = [0] * 8
-
         if scs_id >= BROADCAST_ID:
             return COMM_NOT_AVAILABLE
 
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
-        txpacket[PKT_PARAMETER0 + 0] = address
-        txpacket[PKT_PARAMETER0 + 1] = length
+        txpacket = self.codec.encodeCached(scs_id, INST_READ, (address, length))
 
         result = self.txPacket(txpacket)
 
         # set packet timeout
         if result == COMM_SUCCESS:
-            self.portHandler.setPacketTimeout(length + 6)
+            self.portHandler.setPacketTimeout(length + 6, scs_id)
 
         return result
 
@@ -318,6 +511,12 @@ class protocol_packet_handler(object):
 
             if result != COMM_SUCCESS or rxpacket[PKT_ID] == scs_id:
                 break
+        self.portHandler.endTransaction(result)
+
+        if result == COMM_SUCCESS:
+            self.portHandler.recordPacketTime(scs_id)
+        elif result == COMM_RX_TIMEOUT:
+            self.portHandler.recordPacketTimeout(scs_id)
 
         if result == COMM_SUCCESS and rxpacket[PKT_ID] == scs_id:
             error = rxpacket[PKT_ERROR]
@@ -326,23 +525,25 @@ class protocol_packet_handler(object):
 
         return data, result, error
 
-    def readTxRx(self, scs_id, address, length):
-        txpacket = [0] * 8
-        data = []
-
+    def readTxRxPacket(self, scs_id, address, length):
+        # Like readTxRx, but returns the status packet itself so the caller can
+        # decode the data in place
         if scs_id >= BROADCAST_ID:
-            return data, COMM_NOT_AVAILABLE, 0
+            return None, COMM_NOT_AVAILABLE, 0
 
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
-        txpacket[PKT_PARAMETER0 + 0] = address
-        txpacket[PKT_PARAMETER0 + 1] = length
+        txpacket = self.codec.encodeCached(scs_id, INST_READ, (address, length))
 
         rxpacket, result, error = self.txRxPacket(txpacket)
         if result == COMM_SUCCESS:
             error = rxpacket[PKT_ERROR]
 
+        return rxpacket, result, error
+
+    def readTxRx(self, scs_id, address, length):
+        data = []
+
+        rxpacket, result, error = self.readTxRxPacket(scs_id, address, length)
+        if result == COMM_SUCCESS:
             data.extend(rxpacket[PKT_PARAMETER0 : PKT_PARAMETER0+length])
 
         return data, result, error
@@ -356,8 +557,8 @@ class protocol_packet_handler(object):
         return data_read, result, error
 
     def read1ByteTxRx(self, scs_id, address):
-        data, result, error = self.readTxRx(scs_id, address, 1)
-        data_read = data[0] if (result == COMM_SUCCESS) else 0
+        rxpacket, result, error = self.readTxRxPacket(scs_id, address, 1)
+        data_read = rxpacket[PKT_PARAMETER0] if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def read2ByteTx(self, scs_id, address):
@@ -369,8 +570,8 @@ class protocol_packet_handler(object):
         return data_read, result, error
 
     def read2ByteTxRx(self, scs_id, address):
-        data, result, error = self.readTxRx(scs_id, address, 2)
-        data_read = self.scs_makeword(data[0], data[1]) if (result == COMM_SUCCESS) else 0
+        rxpacket, result, error = self.readTxRxPacket(scs_id, address, 2)
+        data_read = self.codec.decodeWord(rxpacket) if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def read4ByteTx(self, scs_id, address):
@@ -383,35 +584,20 @@ class protocol_packet_handler(object):
         return data_read, result, error
 
     def read4ByteTxRx(self, scs_id, address):
-        data, result, error = self.readTxRx(scs_id, address, 4)
-        data_read = self.scs_makedword(self.scs_makeword(data[0], data[1]),
-                                  self.scs_makeword(data[2], data[3])) if (result == COMM_SUCCESS) else 0
+        rxpacket, result, error = self.readTxRxPacket(scs_id, address, 4)
+        data_read = self.codec.decodeDword(rxpacket) if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def writeTxOnly(self, scs_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
+        txpacket = self.codec.encode(scs_id, INST_WRITE, (address,), data, length)
 
         result = self.txPacket(txpacket)
-        self.portHandler.is_using = False
+        self.portHandler.endTransaction(result)
 
         return result
 
     def writeTxRx(self, scs_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
+        txpacket = self.codec.encode(scs_id, INST_WRITE, (address,), data, length)
         rxpacket, result, error = self.txRxPacket(txpacket)
 
         return result, error
@@ -425,67 +611,40 @@ class protocol_packet_handler(object):
         return self.writeTxRx(scs_id, address, 1, data_write)
 
     def write2ByteTxOnly(self, scs_id, address, data):
-        data_write = [self.scs_lobyte(data), self.scs_hibyte(data)]
+        data_write = self.codec.word.pack(data & 0xFFFF)
         return self.writeTxOnly(scs_id, address, 2, data_write)
 
     def write2ByteTxRx(self, scs_id, address, data):
-        data_write = [self.scs_lobyte(data), self.scs_hibyte(data)]
+        data_write = self.codec.word.pack(data & 0xFFFF)
         return self.writeTxRx(scs_id, address, 2, data_write)
 
     def write4ByteTxOnly(self, scs_id, address, data):
-        data_write = [self.scs_lobyte(self.scs_loword(data)),
-                      self.scs_hibyte(self.scs_loword(data)),
-                      self.scs_lobyte(self.scs_hiword(data)),
-                      self.scs_hibyte(self.scs_hiword(data))]
+        data_write = self.codec.words.pack(self.scs_loword(data), self.scs_hiword(data))
         return self.writeTxOnly(scs_id, address, 4, data_write)
 
     def write4ByteTxRx(self, scs_id, address, data):
-        data_write = [self.scs_lobyte(self.scs_loword(data)),
-                      self.scs_hibyte(self.scs_loword(data)),
-                      self.scs_lobyte(self.scs_hiword(data)),
-                      self.scs_hibyte(self.scs_hiword(data))]
+        data_write = self.codec.words.pack(self.scs_loword(data), self.scs_hiword(data))
         return self.writeTxRx(scs_id, address, 4, data_write)
 
     def regWriteTxOnly(self, scs_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_REG_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
+        txpacket = self.codec.encode(scs_id, INST_REG_WRITE, (address,), data, length)
 
         result = self.txPacket(txpacket)
-        self.portHandler.is_using = False
+        self.portHandler.endTransaction(result)
 
         return result
 
     def regWriteTxRx(self, scs_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = scs_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_REG_WRITE
-        txpacket[PKT_PARAMETER0] = address
-
-        txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
+        txpacket = self.codec.encode(scs_id, INST_REG_WRITE, (address,), data, length)
 
         _, result, error = self.txRxPacket(txpacket)
 
         return result, error
 
     def syncReadTx(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
-        # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN CHKSUM
-
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 7: INST START_ADDR DATA_LEN CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_READ
-        txpacket[PKT_PARAMETER0 + 0] = start_address
-        txpacket[PKT_PARAMETER0 + 1] = data_length
-
-        txpacket[PKT_PARAMETER0 + 2: PKT_PARAMETER0 + 2 + param_length] = param[0: param_length]
+        # the same group is usually read every frame, so the request is cached
+        txpacket = self.codec.encodeCached(BROADCAST_ID, INST_SYNC_READ, (start_address, data_length),
+                                           param[0: param_length])
 
         # print(txpacket)
         result = self.txPacket(txpacket)
@@ -494,10 +653,10 @@ class protocol_packet_handler(object):
     def syncReadRx(self, data_length, param_length):
         wait_length = (6 + data_length) * param_length
         self.portHandler.setPacketTimeout(wait_length)
-        rxpacket = []
+        rxpacket = bytearray()
         rx_length = 0
         while True:
-            rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
+            rxpacket.extend(self.portHandler.readPortWait(wait_length - rx_length))
             rx_length = len(rxpacket)
             if rx_length >= wait_length:
                 result = COMM_SUCCESS
@@ -510,20 +669,92 @@ class protocol_packet_handler(object):
                     else:
                         result = COMM_RX_CORRUPT
                     break
-        self.portHandler.is_using = False
+        self.portHandler.endTransaction(result)
         return result, rxpacket
 
-    def syncWriteTxOnly(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
-        # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN ... CHKSUM
+    def syncReadParse(self, rxpacket, rx_index, data_length, pending, rx_dict):
+        # Single pass over concatenated sync read status packets, starting at rx_index.
+        # Every complete packet from an ID in pending is checksummed, stored in
+        # rx_dict as ([error, byte0, byte1, ...], result) and removed from pending.
+        # A packet failing its checksum may be another servo's with a flipped
+        # ID byte, so its ID only gets a COMM_RX_CORRUPT entry and stays
+        # pending: a valid reply later in the stream still replaces it.
+        # Returns the index to resume from once more bytes have arrived.
+        packet_length = 6 + data_length  # HEADER0 HEADER1 ID LENGTH ERROR DATA... CHKSUM
+        while pending:
+            head = rxpacket.find(b'\xff\xff', rx_index)
+            if head < 0:
+                # keep a trailing 0xFF, it may be the first half of a header
+                return max(rx_index, len(rxpacket) - 1)
+            if len(rxpacket) - head < packet_length:
+                return head
+
+            scs_id = rxpacket[head + PKT_ID]
+            if (scs_id not in pending) or (rxpacket[head + PKT_LENGTH] != data_length + 2) or (
+                    rxpacket[head + PKT_ERROR] > 0x7F):
+                rx_index = head + 1
+                continue
+
+            checksum = ~sum(rxpacket[head + PKT_ID: head + packet_length - 1]) & 0xFF
+            if rxpacket[head + packet_length - 1] == checksum:
+                pending.discard(scs_id)
+                rx_dict[scs_id] = (list(rxpacket[head + PKT_ERROR: head + packet_length - 1]), COMM_SUCCESS)
+                rx_index = head + packet_length
+            else:
+                rx_dict[scs_id] = (None, COMM_RX_CORRUPT)
+                rx_index = head + 1
+        return rx_index
+
+    def syncReadResult(self, rx_dict, pending):
+        # Fills in the IDs that never answered (or only with a corrupt packet)
+        # and folds the per-ID results into one overall result
+        for scs_id in pending:
+            rx_dict.setdefault(scs_id, (None, COMM_RX_TIMEOUT))
+
+        if not rx_dict or all(rx_result == COMM_RX_TIMEOUT for _, rx_result in rx_dict.values()):
+            return COMM_RX_TIMEOUT
+        if all(rx_result == COMM_SUCCESS for _, rx_result in rx_dict.values()):
+            return COMM_SUCCESS
+        return COMM_RX_CORRUPT
+
+    def syncReadRxStream(self, data_length, scs_ids):
+        # Streaming variant of syncReadRx: every status packet is parsed as soon as
+        # it is complete, and reading stops once all expected IDs have answered
+        # or the packet timeout expires.
+        # Returns the overall result and a per-ID map of (data, result), where
+        # data is [error, byte0, byte1, ...] or None.
+        packet_length = 6 + data_length
+        pending = set(scs_ids)
+        rx_dict = {}
+
+        self.portHandler.setPacketTimeout(packet_length * len(pending))
+        rxpacket = bytearray()
+        rx_index = 0
+        # IDs with a corrupt packet are not waited for, but stay pending in
+        # case their reply follows (see syncReadParse)
+        waiting = pending
+        while waiting:
+            wait_length = packet_length * len(pending) - (len(rxpacket) - rx_index)
+            rxpacket.extend(self.portHandler.readPortWait(max(wait_length, 1)))
+            rx_index = self.syncReadParse(rxpacket, rx_index, data_length, pending, rx_dict)
+            waiting = [scs_id for scs_id in pending if scs_id not in rx_dict]
+
+            if waiting and self.portHandler.isPacketTimeout():
+                break
+
+        # only a complete group says something about the adapter latency
+        if not waiting:
+            self.portHandler.recordPacketTime()
+        elif len(waiting) == len(scs_ids):
+            self.portHandler.recordPacketTimeout()
 
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 4: INST START_ADDR DATA_LEN ... CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_WRITE
-        txpacket[PKT_PARAMETER0 + 0] = start_address
-        txpacket[PKT_PARAMETER0 + 1] = data_length
+        result = self.syncReadResult(rx_dict, pending)
+        self.portHandler.endTransaction(result)
+        return result, rx_dict
 
-        txpacket[PKT_PARAMETER0 + 2: PKT_PARAMETER0 + 2 + param_length] = param[0: param_length]
+    def syncWriteTxOnly(self, start_address, data_length, param, param_length):
+        txpacket = self.codec.encode(BROADCAST_ID, INST_SYNC_WRITE, (start_address, data_length), param,
+                                     param_length)
 
         _, result, _ = self.txRxPacket(txpacket)
 
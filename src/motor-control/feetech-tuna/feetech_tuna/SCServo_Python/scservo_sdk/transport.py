@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+# Byte transports under PortHandler.
+#
+# A transport moves raw bytes between the packet layer and the bus. All reads
+# are non-blocking; waitReadable() is the only call that sleeps. read() returns
+# bytes, readinto() fills a caller-owned bytearray/memoryview without an
+# intermediate copy, and write() accepts bytes, bytearray or memoryview.
+#
+# Port names select the transport by scheme:
+#   /dev/ttyUSB0, COM4          SerialTransport (pyserial)
+#   tcp://host:port             TcpTransport (raw serial-over-TCP, e.g. ser2net)
+#   pty:///dev/pts/3            PtyTransport (pseudo terminal without pyserial)
+#   loop://                     LoopbackTransport (in-memory, echoes writes)
+# Further schemes can be added with registerTransport (see virtual_bus.py).
+
+import os
+import platform
+import select
+import socket
+import threading
+import time
+
+import serial
+
+IS_WINDOWS = platform.system() == "Windows"
+
+
+def toBuffer(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    return bytes(data)
+
+
+class Transport(object):
+    def close(self):
+        pass
+
+    def read(self, length):
+        buffer = bytearray(max(length, 0))
+        count = self.readinto(buffer)
+        return bytes(buffer[:count])
+
+    def readinto(self, buffer):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def resetInput(self):
+        while self.readinto(bytearray(256)):
+            pass
+
+    def inWaiting(self):
+        return 0
+
+    def waitReadable(self, timeout):
+        # Sleeps until at least one byte can be read or timeout (seconds) passes
+        raise NotImplementedError
+
+    def setBaudRate(self, baudrate):
+        return True
+
+    def fileno(self):
+        return None
+
+
+class FdTransport(Transport):
+    # Shared POSIX implementation for transports backed by a non-blocking fd
+    def __init__(self, fd):
+        self.fd = fd
+
+    def read(self, length):
+        if length <= 0:
+            return b''
+        try:
+            return os.read(self.fd, length)
+        except (BlockingIOError, InterruptedError):
+            return b''
+
+    def readinto(self, buffer):
+        if len(buffer) == 0:
+            return 0
+        try:
+            return os.readv(self.fd, [buffer])
+        except (BlockingIOError, InterruptedError):
+            return 0
+
+    def write(self, data):
+        view = memoryview(toBuffer(data))
+        written = 0
+        while written < len(view):
+            try:
+                written += os.write(self.fd, view[written:])
+            except (BlockingIOError, InterruptedError):
+                select.select([], [self.fd], [], 1.0)
+        return written
+
+    def waitReadable(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        return bool(readable)
+
+    def fileno(self):
+        return self.fd
+
+
+class SerialTransport(FdTransport):
+    def __init__(self, port_name, baudrate):
+        self.ser = serial.Serial(
+            port=port_name,
+            baudrate=baudrate,
+            # parity = serial.PARITY_ODD,
+            # stopbits = serial.STOPBITS_TWO,
+            bytesize=serial.EIGHTBITS,
+            timeout=0
+        )
+        self.pushback = bytearray()
+        FdTransport.__init__(self, None if IS_WINDOWS else self.ser.fileno())
+
+    def close(self):
+        self.ser.close()
+
+    def read(self, length):
+        if self.fd is not None:
+            return FdTransport.read(self, length)
+        return Transport.read(self, length)
+
+    def readinto(self, buffer):
+        if self.fd is not None:
+            return FdTransport.readinto(self, buffer)
+        # no fd on Windows - go through pyserial, serving the byte that
+        # waitReadable may have pulled in first
+        count = 0
+        if self.pushback:
+            count = min(len(self.pushback), len(buffer))
+            buffer[:count] = self.pushback[:count]
+            del self.pushback[:count]
+        data = self.ser.read(len(buffer) - count)
+        buffer[count:count + len(data)] = data
+        return count + len(data)
+
+    def write(self, data):
+        if self.fd is not None:
+            return FdTransport.write(self, data)
+        return self.ser.write(toBuffer(data))
+
+    def flush(self):
+        self.ser.flush()
+
+    def resetInput(self):
+        self.pushback.clear()
+        self.ser.reset_input_buffer()
+
+    def inWaiting(self):
+        return len(self.pushback) + self.ser.in_waiting
+
+    def waitReadable(self, timeout):
+        if self.fd is not None:
+            return FdTransport.waitReadable(self, timeout)
+        if self.pushback:
+            return True
+        # Windows: block in the driver for the first byte
+        self.ser.timeout = max(timeout, 0)
+        try:
+            self.pushback += self.ser.read(1)
+        finally:
+            self.ser.timeout = 0
+        return bool(self.pushback)
+
+    def setBaudRate(self, baudrate):
+        self.ser.baudrate = baudrate
+        return True
+
+
+class TcpTransport(FdTransport):
+    # Raw serial-over-TCP, e.g. ser2net in raw mode. The baud rate is set on
+    # the remote end; setBaudRate only affects local timeout calculations.
+    def __init__(self, host, port, connect_timeout=3.0):
+        self.sock = socket.create_connection((host, port), timeout=connect_timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        FdTransport.__init__(self, self.sock.fileno())
+
+    def close(self):
+        self.sock.close()
+
+    def read(self, length):
+        return Transport.read(self, length)
+
+    def readinto(self, buffer):
+        if len(buffer) == 0:
+            return 0
+        try:
+            count = self.sock.recv_into(buffer)
+        except (BlockingIOError, InterruptedError):
+            return 0
+        if count == 0:
+            raise serial.SerialException("Connection closed by the remote end")
+        return count
+
+    def write(self, data):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(toBuffer(data))
+        finally:
+            self.sock.setblocking(False)
+        return len(data)
+
+    def inWaiting(self):
+        return 1 if self.waitReadable(0) else 0
+
+
+class PtyTransport(FdTransport):
+    # Opens a tty/pty device directly (raw mode, non-blocking) without pyserial
+    def __init__(self, path):
+        import tty
+        fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(fd)
+        FdTransport.__init__(self, fd)
+
+    def close(self):
+        os.close(self.fd)
+
+    def inWaiting(self):
+        return 1 if self.waitReadable(0) else 0
+
+
+class LoopbackTransport(Transport):
+    # In-memory byte pipe. A lone instance echoes its own writes; pair()
+    # returns two connected ends for an in-process peer (e.g. a bus driver
+    # running in another thread).
+    def __init__(self):
+        self.rx = bytearray()
+        self.cond = threading.Condition()
+        self.peer = self
+
+    @classmethod
+    def pair(cls):
+        a, b = cls(), cls()
+        a.peer, b.peer = b, a
+        return a, b
+
+    def readinto(self, buffer):
+        with self.cond:
+            count = min(len(buffer), len(self.rx))
+            buffer[:count] = self.rx[:count]
+            del self.rx[:count]
+            return count
+
+    def write(self, data):
+        data = toBuffer(data)
+        peer = self.peer
+        with peer.cond:
+            peer.rx += data
+            peer.cond.notify_all()
+        return len(data)
+
+    def resetInput(self):
+        with self.cond:
+            self.rx.clear()
+
+    def inWaiting(self):
+        return len(self.rx)
+
+    def waitReadable(self, timeout):
+        deadline = time.monotonic() + max(timeout, 0)
+        with self.cond:
+            while not self.rx:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            return True
+
+
+def openTcp(port_name, baudrate):
+    address = port_name.split("://", 1)[1]
+    host, port = address.rsplit(":", 1)
+    return TcpTransport(host, int(port))
+
+
+def openPty(port_name, baudrate):
+    return PtyTransport(port_name.split("://", 1)[1])
+
+
+def openLoopback(port_name, baudrate):
+    return LoopbackTransport()
+
+
+# Port name scheme -> factory(port_name, baudrate) returning a Transport
+TRANSPORTS = {
+    "tcp": openTcp,
+    "pty": openPty,
+    "loop": openLoopback,
+}
+
+
+def registerTransport(scheme, factory):
+    TRANSPORTS[scheme] = factory
+
+
+def openTransport(port_name, baudrate):
+    scheme = port_name.split("://", 1)[0] if "://" in port_name else None
+    if scheme in TRANSPORTS:
+        return TRANSPORTS[scheme](port_name, baudrate)
+    return SerialTransport(port_name, baudrate)
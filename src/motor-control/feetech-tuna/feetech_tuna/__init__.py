@@ -1,2 +1,11 @@
 from .feetech_tuna import FeetechTuna
+from .feetech_tuna import BusScheduler, PRIORITY_CONTROL, PRIORITY_COMMAND, PRIORITY_DIAGNOSTIC
+from .feetech_tuna import serveMetrics, DEFAULT_METRICS_PORT
 
+
+def __getattr__(name):
+    # The virtual bus is only loaded once it is asked for
+    if name in ("VirtualBus", "registerVirtualBus"):
+        import virtual_bus  # on sys.path once .feetech_tuna is imported
+        return getattr(virtual_bus, name)
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
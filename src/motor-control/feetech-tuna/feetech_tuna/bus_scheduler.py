@@ -0,0 +1,133 @@
+import functools
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from scservo_sdk import RoundTripStats
+
+# Transaction priorities, lowest value first. Control traffic (teleop reads
+# and goal writes) goes before commands (initialization, resets), which go
+# before diagnostics (scans, register dumps, provisioning).
+PRIORITY_CONTROL = 0
+PRIORITY_COMMAND = 1
+PRIORITY_DIAGNOSTIC = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_CONTROL: "control",
+    PRIORITY_COMMAND: "command",
+    PRIORITY_DIAGNOSTIC: "diagnostic",
+}
+
+
+class BusScheduler:
+    # Serializes bus transactions from several threads. A thread holds the
+    # bus for one transaction (a FeetechTuna call, with the calls it makes
+    # itself); the others wait in a priority queue and the bus is handed to
+    # the most urgent waiter, first come first served within a priority.
+    # Transactions run in the calling thread, so an idle bus costs one lock.
+    #
+    # The time each transaction spent queued is recorded per priority.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owner = None
+        self.depth = 0
+        self.waiting = []  # heap of (priority, sequence, thread id, event)
+        self.sequence = itertools.count()
+        self.local = threading.local()
+        self.waitStats = {priority: RoundTripStats(size=256, min_samples=1) for priority in PRIORITY_NAMES}
+        self.maxWait = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self.totalWait = dict.fromkeys(PRIORITY_NAMES, 0.0)
+
+    def acquire(self, priority=PRIORITY_CONTROL):
+        # Blocks until the calling thread holds the bus. Re-entrant: nested
+        # transactions of the owner run straight away.
+        thread = threading.get_ident()
+        override = getattr(self.local, "priority", None)
+        if override is not None:
+            priority = override
+
+        start = time.monotonic()
+        with self.lock:
+            if self.owner == thread:
+                self.depth += 1
+                return
+            if self.owner is None and not self.waiting:
+                self.owner = thread
+                self.depth = 1
+                self.recordWait(priority, 0.0)
+                return
+            event = threading.Event()
+            heapq.heappush(self.waiting, (priority, next(self.sequence), thread, event))
+
+        # release() makes this thread the owner before setting the event
+        event.wait()
+        with self.lock:
+            self.recordWait(priority, (time.monotonic() - start) * 1000.0)
+
+    def release(self):
+        with self.lock:
+            self.depth -= 1
+            if self.depth > 0:
+                return
+            if self.waiting:
+                _, _, thread, event = heapq.heappop(self.waiting)
+                self.owner = thread
+                self.depth = 1
+                event.set()
+            else:
+                self.owner = None
+
+    @contextmanager
+    def transaction(self, priority=PRIORITY_CONTROL):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def priority(self, priority):
+        # Runs every transaction the calling thread starts in the block at
+        # the given priority, e.g. a reset issued from a button callback
+        previous = getattr(self.local, "priority", None)
+        self.local.priority = priority
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def recordWait(self, priority, waitMs):
+        if priority not in self.waitStats:
+            priority = max(PRIORITY_NAMES)
+        self.waitStats[priority].add(waitMs)
+        self.totalWait[priority] += waitMs
+        self.maxWait[priority] = max(self.maxWait[priority], waitMs)
+
+    def stats(self):
+        # Queueing latency per priority name: transaction count, mean, p99
+        # (over the last 256) and max wait in ms
+        with self.lock:
+            result = {}
+            for priority, name in PRIORITY_NAMES.items():
+                stats = self.waitStats[priority]
+                result[name] = {
+                    "transactions": stats.count,
+                    "mean_wait_ms": self.totalWait[priority] / stats.count if stats.count else 0.0,
+                    "p99_wait_ms": stats.percentile(99) if stats.count else 0.0,
+                    "max_wait_ms": self.maxWait[priority],
+                }
+            result["queued"] = len(self.waiting)
+            return result
+
+
+def scheduled(priority):
+    # Runs a FeetechTuna method as one transaction of its bus scheduler
+    def decorate(method):
+        @functools.wraps(method)
+        def run(self, *args, **kwargs):
+            with self.scheduler.transaction(priority):
+                return method(self, *args, **kwargs)
+        return run
+    return decorate
@@ -0,0 +1,135 @@
+from scservo_sdk import *
+
+# Baud rates tried by sweepBaudrates, most likely first
+DISCOVERY_BAUDRATES = [1000000, 500000, 250000, 128000, 115200, 57600, 38400]
+
+# IDs per sync read probe; keeps the request under TXPACKET_MAX_LEN
+SCAN_CHUNK = 64
+
+# Reply budget (ms) for probes before the adapter latency has been learned
+PROBE_TIMEOUT = 10.0
+
+MODEL_REG = SMS_STS_MODEL_L
+
+
+class ServoDiscovery:
+    # Finds servos without paying a full packet timeout per absent ID.
+    #
+    # syncScan asks a whole range of IDs for their model number with one sync
+    # read per SCAN_CHUNK IDs: present servos answer in turn, absent ones just
+    # leave a gap, so a chunk costs one round trip however many are missing.
+    # pingScan is the fallback for servos without sync read (scscl) and for
+    # re-checking stragglers, with the reply budget capped at probeTimeout (or
+    # the learned adapter latency once there is one).
+    #
+    # Discovery talks to the packet handler directly, so absent IDs are not
+    # counted against the servo health tracker.
+    def __init__(self, tuna, probeTimeout=PROBE_TIMEOUT):
+        self.tuna = tuna
+        self.probeTimeout = probeTimeout
+
+    def supportsSyncRead(self):
+        return isinstance(self.tuna.packetHandler, sms_sts)
+
+    def shortTimeouts(self):
+        # Caps the reply budget for the duration of a scan; returns the
+        # previous settings for restoreTimeouts
+        port = self.tuna.porthandler
+        saved = (port.adaptive_timeout, port.timeout_floor, port.timeout_ceiling, port.timeout_percentile,
+                 port.adapter_stats.misses)
+        port.setAdaptiveTimeout(True, floor=min(port.timeout_floor, self.probeTimeout), ceiling=self.probeTimeout,
+                                percentile=port.timeout_percentile)
+        return saved
+
+    def restoreTimeouts(self, saved):
+        enable, floor, ceiling, percentile, misses = saved
+        port = self.tuna.porthandler
+        port.setAdaptiveTimeout(enable, floor=floor, ceiling=ceiling, percentile=percentile)
+        # probes that nobody answered say nothing about the adapter
+        port.adapter_stats.misses = misses
+
+    def syncScan(self, servoIds):
+        # Returns servo id -> model number for every ID that answered
+        packetHandler = self.tuna.packetHandler
+        found = {}
+        servoIds = [servoId for servoId in dict.fromkeys(servoIds) if 0 <= servoId < BROADCAST_ID]
+
+        saved = self.shortTimeouts()
+        try:
+            reader = GroupSyncRead(packetHandler, MODEL_REG, 2, streaming=True)
+            for start in range(0, len(servoIds), SCAN_CHUNK):
+                reader.clearParam()
+                for servoId in servoIds[start: start + SCAN_CHUNK]:
+                    reader.addParam(servoId)
+                reader.txRxPacket()
+
+                for servoId in servoIds[start: start + SCAN_CHUNK]:
+                    if reader.getResult(servoId) == COMM_SUCCESS:
+                        found[servoId] = reader.getData(servoId, MODEL_REG, 2)
+        finally:
+            self.restoreTimeouts(saved)
+        return found
+
+    def pingScan(self, servoIds, progress=False):
+        # Returns servo id -> model number; the model is only read for hits
+        packetHandler = self.tuna.packetHandler
+        found = {}
+
+        saved = self.shortTimeouts()
+        try:
+            for servoId in servoIds:
+                _, comm_result, error = packetHandler.ping(servoId, read_model=False)
+                if comm_result == COMM_SUCCESS:
+                    model, comm_result, error = packetHandler.read2ByteTxRx(servoId, MODEL_REG)
+                    found[servoId] = model if comm_result == COMM_SUCCESS else 0
+                if progress:
+                    print('+' if servoId in found else '.', end='', flush=True)
+        finally:
+            self.restoreTimeouts(saved)
+        if progress:
+            print()
+        return found
+
+    def scan(self, servoIds=range(1, BROADCAST_ID), progress=False):
+        # Full bus scan: sync read probes where supported, pings otherwise
+        servoIds = list(servoIds)
+        if self.supportsSyncRead():
+            found = self.syncScan(servoIds)
+            if found:
+                return found
+        # nothing answered a sync read: the servos may not support it
+        return self.pingScan(servoIds, progress=progress)
+
+    def checkTopology(self, expectedIds):
+        # Checks that every expected servo is there. One sync read covers the
+        # whole set; the IDs it missed get a single short ping each in case
+        # only their reply was lost. Returns (found id -> model, missing ids).
+        expectedIds = list(dict.fromkeys(expectedIds))
+        found = self.syncScan(expectedIds) if self.supportsSyncRead() else {}
+        missing = [servoId for servoId in expectedIds if servoId not in found]
+        if missing:
+            found.update(self.pingScan(missing))
+            missing = [servoId for servoId in expectedIds if servoId not in found]
+        return found, missing
+
+    def sweepBaudrates(self, servoIds=range(1, BROADCAST_ID), baudrates=DISCOVERY_BAUDRATES, stopAtFirst=True):
+        # Scans the bus at each baud rate. Returns baud rate -> {id: model}
+        # for the rates where something answered. The port is left at its
+        # original baud rate. Sync read families are probed with sync reads
+        # only, so a silent rate costs a few round trips instead of a ping per ID.
+        port = self.tuna.porthandler
+        probe = self.syncScan if self.supportsSyncRead() else self.pingScan
+        original = port.getBaudRate()
+        results = {}
+        try:
+            for baudrate in baudrates:
+                if not port.setBaudRate(baudrate):
+                    continue
+                found = probe(servoIds)
+                if found:
+                    results[baudrate] = found
+                    if stopAtFirst:
+                        break
+        finally:
+            port.setBaudRate(original)
+        return results
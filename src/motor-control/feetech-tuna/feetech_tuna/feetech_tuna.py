@@ -1,11 +1,22 @@
 import sys
 import os
+import threading
 
 cd = os.path.dirname(__file__)
 scservo_path = os.path.join(cd, 'SCServo_Python')
 sys.path.append(scservo_path)
+sys.path.append(cd)
 
 from scservo_sdk import *
+from servo_health import ServoHealth
+from servo_errors import ServoErrors
+from discovery import ServoDiscovery
+from register_map import RegisterMap
+from fleet_snapshot import FleetSnapshot, loadSnapshot
+from register_cache import RegisterCache, PROTECTION_ERRBITS
+from provisioning import TemplateProvisioner
+from bus_scheduler import BusScheduler, scheduled, PRIORITY_CONTROL, PRIORITY_COMMAND, PRIORITY_DIAGNOSTIC
+from metrics_server import serveMetrics, DEFAULT_METRICS_PORT
 
 
 servoRegs = [
@@ -41,11 +52,11 @@ servoRegs = [
     { "name": "Velocity closed loop I integral coefficient", "addr": 39, "size": 1, "type": "uint8" },
     { "name": "Torque Enable", "addr": SMS_STS_TORQUE_ENABLE, "size": 1, "type": "uint8" },
     { "name": "Acceleration", "addr": SMS_STS_ACC, "size": 1, "type": "uint8" },
-    { "name": "Goal Position", "addr": SMS_STS_GOAL_POSITION_L, "size": 2, "type": "uint16" },
+    { "name": "Goal Position", "addr": SMS_STS_GOAL_POSITION_L, "size": 2, "type": "int16" },
     { "name": "Goal Time", "addr": SMS_STS_GOAL_TIME_L, "size": 2, "type": "uint16" },
     { "name": "Goal Speed", "addr": SMS_STS_GOAL_SPEED_L, "size": 2, "type": "int16" },
     { "name": "Lock", "addr": SMS_STS_LOCK, "size": 1, "type": "uint8" },
-    { "name": "Present Position", "addr": SMS_STS_PRESENT_POSITION_L, "size": 2, "type": "uint16" },
+    { "name": "Present Position", "addr": SMS_STS_PRESENT_POSITION_L, "size": 2, "type": "int16" },
     { "name": "Present Speed", "addr": SMS_STS_PRESENT_SPEED_L, "size": 2, "type": "int16" },
     { "name": "Present Load", "addr": SMS_STS_PRESENT_LOAD_L, "size": 2, "type": "int16" },
     { "name": "Present Voltage", "addr": SMS_STS_PRESENT_VOLTAGE, "size": 1, "type": "uint8" },
@@ -55,16 +66,36 @@ servoRegs = [
     { "name": "Present Current", "addr": SMS_STS_PRESENT_CURRENT_L, "size": 2, "type": "uint16" }
 ]
 
+# Response Status Level 0: the servo only answers PING and READ, 1: every instruction
+RESPONSE_LEVEL_REG = 8
+
 
 
 class FeetechTuna:
     def __init__(self):
-        pass
+        # Every method that talks to the bus runs as one scheduler
+        # transaction, so the tuna can be shared between threads
+        self.scheduler = BusScheduler()
+        self.syncReaders = {}
+        self.syncWriters = {}
+        self.regMap = RegisterMap(servoRegs)
+        self.cache = RegisterCache()
+        self.health = ServoHealth()
+        self.errors = ServoErrors()
+        self.discovery = ServoDiscovery(self)
+        self.pipelining = False
+        self.responseLevels = {}  # servo id -> Response Status Level, once known
+        self.metrics = None  # BusMetrics while instrumentation is enabled
+        self.probeStop = None  # set to stop the prober thread of the open port
 
+    @scheduled(PRIORITY_COMMAND)
     def openSerialPort(self, port, baudrate, servoFamily="sms_sts") -> bool:
         print("Opening serial port: " + port)
+        if port.startswith("virtual://"):
+            import virtual_bus  # the simulator registers the virtual:// port scheme
 
         self.porthandler = PortHandler(port)
+        self.porthandler.setMetrics(self.metrics)
 
         if servoFamily == "sms_sts":
             self.packetHandler = sms_sts(self.porthandler)
@@ -88,88 +119,421 @@ class FeetechTuna:
 
         print("Serial port opened successfully")
 
+        self.syncReaders = {}
+        self.syncWriters = {}
+        self.regMap = RegisterMap(servoRegs, self.packetHandler.scs_end)
+        self.cache = RegisterCache()
+        self.responseLevels = {}
+        self.packetHandler.setPipelining(self.pipelining)
+        self.startProber()
+
         return True
 
+    def startProber(self):
+        # Quarantined servos are re-probed from a background thread rather
+        # than before control transactions, so a probe never adds its ping
+        # (and timeout) to a frame
+        if self.probeStop is not None:
+            self.probeStop.set()
+        self.probeStop = threading.Event()
+        threading.Thread(target=self.runProber, args=(self.probeStop,), daemon=True, name="servo-prober").start()
+
+    def runProber(self, stop):
+        # Checks for a due probe a few times per probe interval. The probe is
+        # a diagnostic transaction: it takes the bus only when no control or
+        # command transaction is waiting for it.
+        while not stop.wait(self.health.probeInterval / 4):
+            if not self.health.quarantined:
+                continue
+            with self.scheduler.transaction(PRIORITY_DIAGNOSTIC):
+                if not stop.is_set():
+                    self.probeQuarantined()
+
+    def setPipelining(self, enable):
+        # Batched requests (listRegs, writeRegs) go out in one write. Only
+        # enable this when the servos' Return Delay keeps them from answering
+        # while the rest of the batch is still being sent.
+        self.pipelining = enable
+        if hasattr(self, "packetHandler"):
+            self.packetHandler.setPipelining(enable)
+
+    def getErrors(self):
+        # Status packet error bits seen so far: servo id -> bit name
+        # ("voltage", "angle", "overheat", "overcurrent", "overload") ->
+        # count and first/last seen time
+        return self.errors.snapshot()
+
+    def resetErrors(self, servoId=None):
+        self.errors.reset(servoId)
+
+    def enableMetrics(self, enable=True):
+        # Per-transaction instrumentation: instruction, ID, bytes, wire and
+        # wait time, retries and result of every transaction, aggregated
+        # into per-servo latency histograms and the bus utilization. Off by
+        # default; disabled it costs a None check per port call.
+        if enable and self.metrics is None:
+            self.metrics = BusMetrics()
+        elif not enable:
+            self.metrics = None
+        if hasattr(self, "porthandler"):
+            self.porthandler.setMetrics(self.metrics)
+
+    def getMetrics(self):
+        # Snapshot of the transaction metrics (see BusMetrics.snapshot), or
+        # None while instrumentation is off
+        return self.metrics.snapshot() if self.metrics is not None else None
+
+    def resetMetrics(self):
+        if self.metrics is not None:
+            self.metrics.reset()
+
+    def serveMetrics(self, port=DEFAULT_METRICS_PORT, host="127.0.0.1"):
+        # Serves getMetrics() as JSON on http://host:port/metrics and
+        # enables the instrumentation; returns the server
+        self.enableMetrics()
+        return serveMetrics(self.getMetrics, port, host)
+
+    @scheduled(PRIORITY_COMMAND)
     def closeSerialPort(self) -> None:
+        if self.probeStop is not None:
+            self.probeStop.set()
+            self.probeStop = None
         if (self.porthandler):
             self.porthandler.closePort()
             print("Closed port")
 
+    @scheduled(PRIORITY_DIAGNOSTIC)
     def listServos(self):
-        result = []
         print("Scanning servo bus. Please wait...")
-        for servo in range(1, 254):
-            model_number, comm_result, error = self.packetHandler.ping(servo)
-            if comm_result == COMM_SUCCESS:
-                result.append({ "id" : servo, "model": model_number})
-                print('+', end='', flush=True)
-            else:
-                print('.', end='', flush=True)
+        found = self.discovery.scan(progress=True)
+        return [{ "id" : servo, "model": model_number} for servo, model_number in sorted(found.items())]
 
-        print()
-        return result
+    @scheduled(PRIORITY_DIAGNOSTIC)
+    def checkServos(self, expectedIds):
+        # Expected-topology check: returns (id -> model for the servos that
+        # answered, list of missing ids)
+        return self.discovery.checkTopology(expectedIds)
+
+    @scheduled(PRIORITY_DIAGNOSTIC)
+    def sweepBaudrates(self, servoIds=range(1, BROADCAST_ID)):
+        # Returns baud rate -> list of servos, for the first rate where any answered
+        return {
+            baudrate: [{ "id" : servo, "model": model_number} for servo, model_number in sorted(found.items())]
+            for baudrate, found in self.discovery.sweepBaudrates(servoIds).items()
+        }
 
+    @scheduled(PRIORITY_DIAGNOSTIC)
     def listRegs(self, servoId):
         result = []
-        for reg in servoRegs:
-            try:
-                value, comm_result, error = self.packetHandler.readTxRx(servoId, reg["addr"], reg["size"])
-                if comm_result == COMM_SUCCESS:
-                    if (reg["size"] == 2):
-                        value = self.packetHandler.scs_tohost(self.packetHandler.scs_makeword(value[0], value[1]), 15)
-                    else:
-                        value = value[0]
-                    result.append({ "name": reg["name"], "addr" : reg["addr"], "value": value })
-                else:
-                    print("Failed to read register " + reg["name"])
-                    print("Comm result: " + self.packetHandler.getTxRxResult(comm_result))
-            except:
-                print("Warning: Error occurred when reading register " + reg["name"] + " (addr: " + str(reg["addr"]) + ")")
+        values = self.readBlocks(servoId)
+        for reg in self.regMap.registers:
+            if reg.addr in values:
+                result.append({ "name": reg.name, "addr" : reg.addr, "value": values[reg.addr] })
         return result
 
-    def readReg(self, servoId, regAddr):
-        reg = None
-        for r in servoRegs:
-            if r["addr"] == regAddr:
-                reg = r
-                break
+    @scheduled(PRIORITY_DIAGNOSTIC)
+    def readBlocks(self, servoId):
+        # Reads every known register with the fewest contiguous block reads.
+        # Returns addr -> value; registers of a failed block are left out.
+        blocks = self.regMap.blocks()
+        replies = self.packetHandler.txRxBatch(
+            [(servoId, INST_READ, (startAddr, length)) for startAddr, length in blocks])
+        values = {}
+        for (startAddr, length), (data, comm_result, error) in zip(blocks, replies):
+            self.recordResult(servoId, comm_result, error)
+            if comm_result == COMM_SUCCESS and len(data) == length:
+                values.update(self.regMap.decodeSpan(startAddr, bytes(data)))
+                self.cache.storeValues(servoId, values)
+            else:
+                print("Failed to read registers " + str(startAddr) + "-" + str(startAddr + length - 1))
+                print("Comm result: " + self.packetHandler.getTxRxResult(comm_result))
+        return values
+
+    @scheduled(PRIORITY_DIAGNOSTIC)
+    def snapshot(self, servoIds):
+        # Captures the full register image of every servo: one sync read for
+        # the whole fleet where the family has it, a block read per servo
+        # otherwise. Servos that did not answer are left out.
+        regs = self.regMap.registers
+        startAddr = regs[0].addr
+        length = regs[-1].addr + regs[-1].size - startAddr
+        servoIds = list(dict.fromkeys(servoIds))
+
+        if isinstance(self.packetHandler, sms_sts):
+            images = self.syncRead(servoIds, startAddr, length)
+        else:
+            images = {}
+            replies = self.packetHandler.txRxBatch(
+                [(servoId, INST_READ, (startAddr, length)) for servoId in servoIds])
+            for servoId, (data, comm_result, error) in zip(servoIds, replies):
+                self.recordResult(servoId, comm_result, error)
+                images[servoId] = bytes(data) if comm_result == COMM_SUCCESS else None
+
+        images = {servoId: image for servoId, image in images.items() if image is not None and len(image) == length}
+        snapshot = FleetSnapshot(self.regMap, startAddr, length, images)
+        for servoId in images:
+            self.cache.storeValues(servoId, snapshot.values(servoId))
+        return snapshot
+
+    def loadSnapshot(self, path):
+        return loadSnapshot(path, self.regMap)
+
+    @scheduled(PRIORITY_DIAGNOSTIC)
+    def provision(self, assignments, newIds=None):
+        # Applies templates (servo id -> {addr: value}) with block reads, sync
+        # writes of the differing registers and a verifying read; see
+        # TemplateProvisioner. Returns servo id -> result entry.
+        return TemplateProvisioner(self).provision(assignments, newIds)
+
+    @scheduled(PRIORITY_CONTROL)
+    def readReg(self, servoId, regAddr, cached=True):
+        # EEPROM registers are answered from the register cache when it holds
+        # them; cached=False always asks the servo
+        reg = self.regMap.get(regAddr)
         if reg == None:
             print("Unknown register: " + str(regAddr))
             return
 
-        value, comm_result, error = self.packetHandler.readTxRx(servoId, regAddr, reg["size"])
+        if not self.health.isAvailable(servoId):
+            return None
+
+        if cached:
+            value = self.cache.read(servoId, regAddr)
+            if value is not None:
+                return value
+
+        rxpacket, comm_result, error = self.packetHandler.readTxRxPacket(servoId, regAddr, reg.size)
+        self.recordResult(servoId, comm_result, error)
         if comm_result == COMM_SUCCESS:
-            if (reg["size"] == 2):
-                value = self.packetHandler.scs_tohost(self.packetHandler.scs_makeword(value[0], value[1]), 15)
-            else:
-                value = value[0]
-            # print(reg["name"] + " = " + str(value))
+            value = reg.decode(rxpacket, PKT_PARAMETER0)
+            self.cache.store(servoId, regAddr, value)
+            # print(reg.name + " = " + str(value))
             return value
         else:
             # print("Failed to read register")
             return None
 
-    def writeReg(self, servoId, regAddr, value):
-        reg = None
-        for r in servoRegs:
-            if r["addr"] == regAddr:
-                reg = r
-                break
+    def recordResult(self, servoId, comm_result, error=0):
+        # error: the error byte of the servo's status packet, if it sent one
+        if error:
+            self.errors.record(servoId, error)
+            if error & PROTECTION_ERRBITS:
+                # the servo may have dropped torque and its targets
+                self.cache.invalidateRam(servoId)
+        if comm_result == COMM_SUCCESS:
+            self.health.recordSuccess(servoId)
+        elif comm_result in (COMM_RX_TIMEOUT, COMM_RX_CORRUPT, COMM_RX_FAIL):
+            self.health.recordFailure(servoId)
+            # a servo that stops answering may come back power cycled
+            self.cache.invalidate(servoId)
+
+    @scheduled(PRIORITY_DIAGNOSTIC)
+    def probeQuarantined(self):
+        # Re-probes at most one quarantined servo with a bare ping; the health
+        # tracker spaces the probes out. The prober thread calls it while the
+        # port is open (see startProber).
+        servoId = self.health.nextProbeId()
+        if servoId is None:
+            return None
+
+        _, comm_result, _ = self.packetHandler.ping(servoId, read_model=False)
+        if comm_result == COMM_SUCCESS:
+            self.health.recordSuccess(servoId)
+        return servoId
+
+    def decodeRegs(self, startAddr, data):
+        # Decodes raw bytes read from startAddr into addr -> value for every
+        # known register they cover
+        return self.regMap.decodeSpan(startAddr, data)
+
+    def getSyncReader(self, startAddr, length):
+        # GroupSyncRead instances are cached per register span so the ID
+        # parameter list is only rebuilt when the set of servos changes
+        key = (startAddr, length)
+        reader = self.syncReaders.get(key)
+        if reader is None:
+            reader = GroupSyncRead(self.packetHandler, startAddr, length, streaming=True)
+            self.syncReaders[key] = reader
+        return reader
+
+    @scheduled(PRIORITY_CONTROL)
+    def syncRead(self, servoIds, startAddr, length):
+        # Reads the same register span from every servo in a single sync read
+        # transaction. Returns servo id -> raw bytes, or None for each servo
+        # that did not answer (or answered with a corrupt packet).
+        # Quarantined servos are left out of the packet and reported as None.
+        servoIds = list(dict.fromkeys(servoIds))
+        activeIds = self.health.filterAvailable(servoIds)
+        result = dict.fromkeys(servoIds)
+
+        if activeIds:
+            reader = self.getSyncReader(startAddr, length)
+            if list(reader.data_dict.keys()) != activeIds:
+                reader.clearParam()
+                for servoId in activeIds:
+                    reader.addParam(servoId)
+
+            reader.txRxPacket()
+
+            for servoId in activeIds:
+                available, error = reader.isAvailable(servoId, startAddr, length)
+                self.recordResult(servoId, reader.getResult(servoId), error)
+                if available:
+                    result[servoId] = bytes(reader.data_dict[servoId][1:length + 1])
+
+        return result
+
+    @scheduled(PRIORITY_CONTROL)
+    def syncReadReg(self, servoIds, regAddr):
+        reg = self.regMap.get(regAddr)
         if reg == None:
             print("Unknown register: " + str(regAddr))
             return
 
-        if reg["size"] == 2:
-            value = [self.packetHandler.scs_lobyte(value), self.packetHandler.scs_hibyte(value)]
+        result = {}
+        for servoId, data in self.syncRead(servoIds, regAddr, reg.size).items():
+            result[servoId] = reg.decode(data) if data is not None else None
+        return result
+
+    def checkValue(self, reg, value):
+        # Prints why value cannot be written to reg, if it cannot
+        if reg.inRange(value):
+            return True
+        print("Value " + str(value) + " out of range for " + reg.name + " (" +
+              str(reg.minValue) + " to " + str(reg.maxValue) + ")")
+        return False
+
+    def getSyncWriter(self, startAddr, length):
+        key = (startAddr, length)
+        writer = self.syncWriters.get(key)
+        if writer is None:
+            writer = GroupSyncWrite(self.packetHandler, startAddr, length)
+            self.syncWriters[key] = writer
+        return writer
+
+    @scheduled(PRIORITY_CONTROL)
+    def syncWrite(self, data, startAddr, length):
+        # Writes a register span on several servos with one sync write packet.
+        # data maps servo id -> raw bytes. Sync writes are never acknowledged,
+        # so success only means the packet went out on the bus.
+        if not data:
+            return True
+
+        writer = self.getSyncWriter(startAddr, length)
+        if writer.data_dict.keys() == data.keys():
+            for servoId, values in data.items():
+                writer.changeParam(servoId, values)
         else:
-            value = [value]
+            writer.clearParam()
+            for servoId, values in data.items():
+                writer.addParam(servoId, values)
+
+        return writer.txPacket() == COMM_SUCCESS
+
+    @scheduled(PRIORITY_CONTROL)
+    def syncWriteReg(self, values, regAddr):
+        reg = self.regMap.get(regAddr)
+        if reg == None:
+            print("Unknown register: " + str(regAddr))
+            return False
+        if not all(self.checkValue(reg, value) for value in values.values()):
+            return False
+
+        # servos known to hold their value already are left out
+        values = {servoId: value for servoId, value in values.items()
+                  if not self.cache.holds(servoId, regAddr, value)}
+        data = {servoId: reg.encode(value) for servoId, value in values.items()}
+        if not self.syncWrite(data, regAddr, reg.size):
+            return False
+        for servoId, value in values.items():
+            # sync writes are not acknowledged
+            self.wroteReg(servoId, regAddr, value, confirmed=False)
+        return True
+
+    @scheduled(PRIORITY_CONTROL)
+    def groupWriteReg(self, values, regAddr, verify=False, broadcast=False):
+        # Writes regAddr on several servos (servo id -> value) with one packet:
+        # a sync write, or with broadcast=True and a single value for all, a
+        # broadcast WRITE. A broadcast reaches every servo on the bus, so only
+        # pass it when values covers them all. Neither is acknowledged;
+        # verify=True reads the register back with one sync read. Returns
+        # servo id -> success (whether the packet went out without verify).
+        reg = self.regMap.get(regAddr)
+        if reg == None:
+            print("Unknown register: " + str(regAddr))
+            return dict.fromkeys(values, False)
+        if not all(self.checkValue(reg, value) for value in values.values()):
+            return dict.fromkeys(values, False)
+
+        if broadcast and len(set(values.values())) == 1:
+            value = next(iter(values.values()))
+            sent = True
+            if not all(self.cache.holds(servoId, regAddr, value) for servoId in values):
+                sent = self.packetHandler.writeTxOnly(BROADCAST_ID, regAddr, reg.size, reg.encode(value)) == COMM_SUCCESS
+                if sent:
+                    for servoId in values:
+                        self.wroteReg(servoId, regAddr, value, confirmed=False)
+        else:
+            sent = self.syncWriteReg(values, regAddr)
+
+        if not verify or not sent:
+            return dict.fromkeys(values, sent)
+
+        result = {}
+        readBacks = self.syncReadReg(list(values), regAddr)
+        for servoId, value in values.items():
+            result[servoId] = readBacks.get(servoId) == value
+            if result[servoId]:
+                self.cache.store(servoId, regAddr, value, written=True)
+            else:
+                # whatever the servo holds, the next call has to write again
+                self.cache.forget(servoId, regAddr)
+        return result
+
+    @scheduled(PRIORITY_CONTROL)
+    def writeReg(self, servoId, regAddr, value, ack=True):
+        # ack=True: acknowledged write, retried up to 3 times. Servos at
+        # Response Status Level 1 confirm with a status packet; at level 0 the
+        # write is confirmed by reading the register back.
+        # ack=False: fire-and-forget for streaming targets, where the next
+        # frame supersedes a lost write. Only servos at level 0 skip the status
+        # packet (and with it half the bus time); others are written once
+        # without retries.
+        reg = self.regMap.get(regAddr)
+        if reg == None:
+            print("Unknown register: " + str(regAddr))
+            return
+        if not self.checkValue(reg, value):
+            return False
+
+        if self.cache.holds(servoId, regAddr, value):
+            return True
+
+        data = reg.encode(value)
+
+        if not ack:
+            return self.writeRegNoAck(servoId, reg, value, data)
 
         retries = 3
 
-        while retries > 0:
-            comm_result, error = self.packetHandler.writeTxRx(servoId, regAddr, reg["size"], value)
+        while retries > 0 and self.health.isAvailable(servoId):
+            if retries < 3 and self.metrics is not None:
+                self.metrics.retrying()
+            if self.responseLevels.get(servoId) == 0:
+                error = 0
+                comm_result = self.packetHandler.writeTxOnly(servoId, regAddr, reg.size, data)
+                if comm_result == COMM_SUCCESS:
+                    # a new ID answers under the new ID
+                    verifyId = value if regAddr == SMS_STS_ID else servoId
+                    rxpacket, comm_result, error = self.packetHandler.readTxRxPacket(verifyId, regAddr, reg.size)
+                    if comm_result == COMM_SUCCESS and rxpacket[PKT_PARAMETER0: PKT_PARAMETER0 + reg.size] != data:
+                        comm_result = COMM_RX_CORRUPT
+            else:
+                comm_result, error = self.packetHandler.writeTxRx(servoId, regAddr, reg.size, data)
+            self.recordResult(servoId, comm_result, error)
             if comm_result == COMM_SUCCESS:
                 # print(f"Register {regAddr} written")
+                self.wroteReg(servoId, regAddr, value)
                 return True
             else:
                 # print("Failed to write register - retrying...")
@@ -178,10 +542,120 @@ class FeetechTuna:
         # print("Failed to write register - giving up")
         return False
 
+    def writeRegNoAck(self, servoId, reg, value, data):
+        if not self.health.isAvailable(servoId):
+            return False
+
+        confirmed = self.getResponseLevel(servoId) != 0
+        if not confirmed:
+            comm_result = self.packetHandler.writeTxOnly(servoId, reg.addr, reg.size, data)
+            # nothing comes back, so this says nothing about the servo's health
+        else:
+            comm_result, error = self.packetHandler.writeTxRx(servoId, reg.addr, reg.size, data)
+            self.recordResult(servoId, comm_result, error)
+
+        if comm_result == COMM_SUCCESS:
+            self.wroteReg(servoId, reg.addr, value, confirmed)
+            return True
+        return False
+
+    def wroteReg(self, servoId, regAddr, value, confirmed=True):
+        # keeps the register cache and the cached response levels in step
+        # with register writes
+        self.cache.wrote(servoId, regAddr, value, confirmed)
+        if not confirmed:
+            if regAddr == RESPONSE_LEVEL_REG:
+                self.responseLevels.pop(servoId, None)
+            return
+        if regAddr == RESPONSE_LEVEL_REG:
+            self.responseLevels[servoId] = value
+        elif regAddr == SMS_STS_ID and value != servoId:
+            level = self.responseLevels.pop(servoId, None)
+            if level is not None:
+                self.responseLevels[value] = level
+
+    @scheduled(PRIORITY_CONTROL)
+    def getResponseLevel(self, servoId):
+        # READ is answered at every level, so the register can always be read
+        level = self.responseLevels.get(servoId)
+        if level is None:
+            level = self.readReg(servoId, RESPONSE_LEVEL_REG)
+            if level is not None:
+                self.responseLevels[servoId] = level
+        return level
+
+    @scheduled(PRIORITY_COMMAND)
+    def setResponseLevel(self, servoId, level):
+        # The servo may or may not confirm the change itself depending on the
+        # level before and after it, so a missing status packet is fine here;
+        # the new level is checked by reading it back. Like any EEPROM
+        # register it only survives a power cycle with the EEPROM unlocked.
+        if not self.health.isAvailable(servoId):
+            return False
+
+        self.responseLevels.pop(servoId, None)
+        self.cache.forget(servoId, RESPONSE_LEVEL_REG)
+        comm_result, error = self.packetHandler.write1ByteTxRx(servoId, RESPONSE_LEVEL_REG, level)
+        if comm_result not in (COMM_SUCCESS, COMM_RX_TIMEOUT):
+            return False
+        return self.getResponseLevel(servoId) == level
+
+    @scheduled(PRIORITY_CONTROL)
+    def writeRegs(self, writes):
+        # Writes a list of (servoId, regAddr, value) in order as one batch of
+        # acknowledged writes. Failed writes are retried (up to 3 attempts, like
+        # writeReg) in a follow-up batch. Returns one success flag per write.
+        requests = []
+        for servoId, regAddr, value in writes:
+            reg = self.regMap.get(regAddr)
+            if reg == None:
+                print("Unknown register: " + str(regAddr))
+                return [False] * len(writes)
+            if not self.checkValue(reg, value):
+                return [False] * len(writes)
+            requests.append((servoId, INST_WRITE, bytes((regAddr,)) + reg.encode(value)))
+
+        success = [False] * len(writes)
+        remaining = []
+        touched = set()  # registers an earlier write of this batch changes
+        for index, (servoId, regAddr, value) in enumerate(writes):
+            if (servoId, regAddr) not in touched and self.cache.holds(servoId, regAddr, value):
+                success[index] = True  # the servo holds this value already
+                continue
+            touched.add((servoId, regAddr))
+            if self.responseLevels.get(servoId) == 0:
+                # no status packet to batch on; written and read back one by one
+                success[index] = self.writeReg(servoId, regAddr, value)
+            else:
+                remaining.append(index)
+        retries = 3
+
+        while retries > 0 and remaining:
+            remaining = [index for index in remaining if self.health.isAvailable(writes[index][0])]
+            if not remaining:
+                break  # every servo left is quarantined
+            if retries < 3 and self.metrics is not None:
+                self.metrics.retrying()
+            replies = self.packetHandler.txRxBatch([requests[index] for index in remaining])
+            failed = []
+            for index, (_, comm_result, error) in zip(remaining, replies):
+                self.recordResult(writes[index][0], comm_result, error)
+                if comm_result == COMM_SUCCESS:
+                    self.wroteReg(*writes[index])
+                    success[index] = True
+                else:
+                    failed.append(index)
+            remaining = failed
+            retries -= 1
+
+        return success
+
+    @scheduled(PRIORITY_COMMAND)
     def unlockEEPROM(self, servoId):
         self.packetHandler.unLockEprom(servoId)
         print("EEPROM unlocked")
 
+    @scheduled(PRIORITY_COMMAND)
     def lockEEPROM(self, servoId):
         self.packetHandler.LockEprom(servoId)
         print("EEPROM locked")
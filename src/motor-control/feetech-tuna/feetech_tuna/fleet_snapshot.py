@@ -0,0 +1,82 @@
+import json
+import time
+
+from scservo_sdk import *
+
+SNAPSHOT_VERSION = 1
+
+# Registers from Torque Enable on live in RAM and change while the servos
+# run (goals, present state); diffs leave them out unless asked to
+RUNTIME_START = SMS_STS_TORQUE_ENABLE
+
+
+class FleetSnapshot:
+    # Raw register images of a set of servos, all covering the same span
+    # (startAddr, length). Images are kept as bytes and only decoded through
+    # the register map when compared, so a snapshot saves as one hex string
+    # per servo.
+    def __init__(self, regMap, startAddr, length, images=None, taken=None):
+        self.regMap = regMap
+        self.startAddr = startAddr
+        self.length = length
+        self.images = images if images is not None else {}  # servo id -> bytes
+        self.taken = taken if taken is not None else time.time()
+
+    def servoIds(self):
+        return sorted(self.images)
+
+    def values(self, servoId):
+        # addr -> value for every known register in the servo's image
+        return self.regMap.decodeSpan(self.startAddr, self.images[servoId], length=self.length)
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "start": self.startAddr,
+                "length": self.length,
+                "taken": self.taken,
+                "servos": {str(servoId): image.hex() for servoId, image in sorted(self.images.items())}
+            }, file, indent=1)
+
+    def diffValues(self, servoId, before, after, runtime):
+        changes = []
+        for reg in self.regMap.registers:
+            if reg.addr not in before or reg.addr not in after:
+                continue
+            if not runtime and reg.addr >= RUNTIME_START:
+                continue
+            if before[reg.addr] != after[reg.addr]:
+                changes.append({ "id": servoId, "addr": reg.addr, "name": reg.name,
+                                 "before": before[reg.addr], "after": after[reg.addr] })
+        return changes
+
+    def diff(self, other, runtime=False):
+        # Changes from this snapshot (the baseline) to other, one entry per
+        # differing register. A servo missing from either side is reported
+        # once with addr None and the side it is missing from set to None.
+        changes = []
+        for servoId in sorted(set(self.images) | set(other.images)):
+            if servoId not in other.images or servoId not in self.images:
+                changes.append({ "id": servoId, "addr": None, "name": "servo",
+                                 "before": "present" if servoId in self.images else None,
+                                 "after": "present" if servoId in other.images else None })
+                continue
+            if self.images[servoId] == other.images[servoId]:
+                continue
+            changes.extend(self.diffValues(servoId, self.values(servoId), other.values(servoId), runtime))
+        return changes
+
+    def compareServos(self, servoId, otherId, runtime=False):
+        # Registers that differ between two servos of this snapshot, ID aside
+        changes = self.diffValues(otherId, self.values(servoId), self.values(otherId), runtime)
+        return [change for change in changes if change["addr"] != SMS_STS_ID]
+
+
+def loadSnapshot(path, regMap):
+    with open(path) as file:
+        data = json.load(file)
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise ValueError("Unsupported snapshot version: " + str(data.get("version")))
+    images = {int(servoId): bytes.fromhex(image) for servoId, image in data["servos"].items()}
+    return FleetSnapshot(regMap, data["start"], data["length"], images, data["taken"])
@@ -0,0 +1,29 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_METRICS_PORT = 9464
+
+
+def serveMetrics(getSnapshot, port=DEFAULT_METRICS_PORT, host="127.0.0.1"):
+    # Serves getSnapshot() as JSON on http://host:port/metrics from a daemon
+    # thread. Local only by default. Returns the server; shutdown() stops it.
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = json.dumps(getSnapshot(), indent=1).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # no line per scrape on the console
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-" + str(port)).start()
+    return server
@@ -0,0 +1,106 @@
+from scservo_sdk import *
+
+
+class TemplateProvisioner:
+    # Applies register templates (addr -> value, see servotemplates.py) to
+    # a set of servos with a handful of packets whatever their number:
+    #
+    # 1. one sync read (snapshot) of every servo's register image
+    # 2. only the registers that differ from the template are written, one
+    #    sync write per register address across all servos (EEPROM unlocked
+    #    and relocked with one sync write each)
+    # 3. IDs are changed with a single sync write
+    # 4. one more snapshot at the final IDs verifies the result
+    #
+    # Registers that already hold the template value are never rewritten,
+    # which also spares the EEPROM.
+    def __init__(self, tuna):
+        self.tuna = tuna
+
+    def lockReg(self):
+        return SCSCL_LOCK if isinstance(self.tuna.packetHandler, scscl) else SMS_STS_LOCK
+
+    def plan(self, assignments, snapshot):
+        # Returns servo id -> {addr: value} of the template registers that
+        # differ, for every servo found in snapshot
+        changes = {}
+        for servoId, template in assignments.items():
+            if servoId not in snapshot.images:
+                continue
+            values = snapshot.values(servoId)
+            changes[servoId] = {addr: value for addr, value in template.items() if values.get(addr) != value}
+        return changes
+
+    def provision(self, assignments, newIds=None):
+        # assignments: servo id -> template, newIds: servo id -> ID to give it
+        # once provisioned (optional). Returns servo id -> result entry with
+        # the final "id", the "written" register addresses, "ok" and, on
+        # failure, an "error".
+        tuna = self.tuna
+        newIds = newIds or {}
+        results = {servoId: { "id": servoId, "written": [], "ok": False } for servoId in assignments}
+
+        targets = [newIds.get(servoId, servoId) for servoId in assignments]
+        if len(set(targets)) != len(targets):
+            for result in results.values():
+                result["error"] = "duplicate target IDs"
+            return results
+
+        # a new ID must not already belong to a servo that keeps it
+        freeIds = [newId for servoId, newId in newIds.items() if newId != servoId and newId not in assignments]
+        discovery = tuna.discovery
+        occupied = discovery.syncScan(freeIds) if discovery.supportsSyncRead() else discovery.pingScan(freeIds)
+        if occupied:
+            for servoId, result in results.items():
+                if newIds.get(servoId) in occupied:
+                    result["error"] = "ID " + str(newIds[servoId]) + " is taken"
+            assignments = {servoId: template for servoId, template in assignments.items()
+                           if "error" not in results[servoId]}
+
+        before = tuna.snapshot(list(assignments))
+        changes = self.plan(assignments, before)
+        for servoId in assignments:
+            if servoId not in changes:
+                results[servoId]["error"] = "no reply"
+        renamed = {servoId: newId for servoId, newId in newIds.items() if servoId in changes and newId != servoId}
+        touched = [servoId for servoId in changes if changes[servoId] or servoId in renamed]
+
+        if touched:
+            lockReg = self.lockReg()
+            tuna.syncWrite({servoId: [0] for servoId in touched}, lockReg, 1)
+
+            for addr in sorted({addr for values in changes.values() for addr in values}):
+                tuna.syncWriteReg({servoId: values[addr] for servoId, values in changes.items() if addr in values}, addr)
+
+            if renamed:
+                tuna.syncWriteReg(renamed, SMS_STS_ID)
+                for servoId in renamed:
+                    # the servo now answers under its new ID
+                    tuna.cache.invalidate(servoId)
+                    tuna.responseLevels.pop(servoId, None)
+
+            tuna.syncWrite({renamed.get(servoId, servoId): [1] for servoId in touched}, lockReg, 1)
+
+        for servoId in changes:
+            results[servoId]["id"] = renamed.get(servoId, servoId)
+            results[servoId]["written"] = sorted(changes[servoId])
+        return self.verify(assignments, results)
+
+    def verify(self, assignments, results):
+        # One snapshot at the final IDs; every template register (and the ID)
+        # must read back as expected
+        finalIds = {servoId: result["id"] for servoId, result in results.items() if "error" not in result}
+        after = self.tuna.snapshot(list(finalIds.values()))
+        for servoId, finalId in finalIds.items():
+            if finalId not in after.images:
+                results[servoId]["error"] = "no reply after provisioning"
+                continue
+            values = after.values(finalId)
+            expected = dict(assignments[servoId])
+            expected[SMS_STS_ID] = finalId
+            wrong = sorted(addr for addr, value in expected.items() if values.get(addr) != value)
+            if wrong:
+                results[servoId]["error"] = "registers not written: " + ", ".join(str(addr) for addr in wrong)
+            else:
+                results[servoId]["ok"] = True
+        return results
@@ -0,0 +1,123 @@
+from scservo_sdk import *
+
+# EEPROM registers (everything before Torque Enable) only change when written,
+# so reads of them can be served from the shadow
+EEPROM_END = SMS_STS_TORQUE_ENABLE
+
+# SRAM registers whose last written value is kept so that rewriting the same
+# value can be skipped. Present state (position, load, ...) is never cached,
+# nor is Torque Enable: the servo clears it by itself when a protection trips.
+TRACKED_RAM_REGS = {
+    SMS_STS_ACC,
+    SMS_STS_GOAL_POSITION_L,
+    SMS_STS_GOAL_TIME_L,
+    SMS_STS_GOAL_SPEED_L,
+}
+
+# Status packet error bits of the protections that switch the servo's torque
+# off; after one of them its SRAM registers are no longer trusted
+PROTECTION_ERRBITS = ERRBIT_OVERHEAT | ERRBIT_OVERELE | ERRBIT_OVERLOAD
+
+
+class RegisterCache:
+    # Write-through shadow of the servos' register images.
+    #
+    # EEPROM values enter the shadow from successful reads and confirmed
+    # writes, SRAM values only from writes the servo acknowledged or that
+    # were read back. EEPROM values then answer reads without a transaction,
+    # and a write of the value a servo is known to hold is elided. Writes
+    # that were not confirmed drop the value instead, as do communication
+    # failures, which drop the whole servo: it may have been power cycled.
+    # A tripped protection or a Torque Enable write drops the servo's SRAM
+    # values (invalidateRam).
+    def __init__(self):
+        self.servos = {}  # servo id -> {addr: value}
+        self.readHits = 0
+        self.readMisses = 0
+        self.writesElided = 0
+        self.writesSent = 0
+
+    def isCacheable(self, addr, written=False):
+        # written: the value comes from a confirmed write rather than a read
+        return addr < EEPROM_END or (written and addr in TRACKED_RAM_REGS)
+
+    def read(self, servoId, addr):
+        # Cached value of an EEPROM register, or None. Only EEPROM reads count
+        # as hits or misses; other registers are always read from the servo.
+        if addr >= EEPROM_END:
+            return None
+        value = self.servos.get(servoId, {}).get(addr)
+        if value is None:
+            self.readMisses += 1
+        else:
+            self.readHits += 1
+        return value
+
+    def holds(self, servoId, addr, value):
+        # True (and counted as an elided write) when the servo is known to
+        # hold value already
+        if self.servos.get(servoId, {}).get(addr) == value:
+            self.writesElided += 1
+            return True
+        return False
+
+    def store(self, servoId, addr, value, written=False):
+        # written=True for a write that was acknowledged or read back
+        if self.isCacheable(addr, written):
+            self.servos.setdefault(servoId, {})[addr] = value
+
+    def storeValues(self, servoId, values):
+        # Stores the result of a read (addr -> value); only EEPROM registers are kept
+        entry = self.servos.setdefault(servoId, {})
+        for addr, value in values.items():
+            if self.isCacheable(addr):
+                entry[addr] = value
+
+    def wrote(self, servoId, addr, value, confirmed=True):
+        self.writesSent += 1
+        if confirmed:
+            self.store(servoId, addr, value, written=True)
+        else:
+            self.forget(servoId, addr)
+        if addr == SMS_STS_TORQUE_ENABLE:
+            # switching torque re-latches the goal on some firmware, and with
+            # torque off the horn may have been moved by hand
+            self.invalidateRam(servoId)
+        elif addr == SMS_STS_ID and confirmed and value != servoId:
+            # the image now belongs to the new ID
+            entry = self.servos.pop(servoId, None)
+            if entry is not None:
+                self.servos[value] = entry
+
+    def forget(self, servoId, addr):
+        self.servos.get(servoId, {}).pop(addr, None)
+
+    def invalidateRam(self, servoId):
+        entry = self.servos.get(servoId)
+        if entry:
+            for addr in [addr for addr in entry if addr >= EEPROM_END]:
+                del entry[addr]
+
+    def invalidate(self, servoId=None):
+        if servoId is None:
+            self.servos.clear()
+        else:
+            self.servos.pop(servoId, None)
+
+    def stats(self):
+        reads = self.readHits + self.readMisses
+        writes = self.writesElided + self.writesSent
+        return {
+            "read_hits": self.readHits,
+            "read_misses": self.readMisses,
+            "read_hit_rate": self.readHits / reads if reads else 0.0,
+            "writes_elided": self.writesElided,
+            "writes_sent": self.writesSent,
+            "write_elision_rate": self.writesElided / writes if writes else 0.0,
+        }
+
+    def resetStats(self):
+        self.readHits = 0
+        self.readMisses = 0
+        self.writesElided = 0
+        self.writesSent = 0
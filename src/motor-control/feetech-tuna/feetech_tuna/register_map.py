@@ -0,0 +1,110 @@
+import struct
+
+# struct code and sign bit per declared register type. Signed Feetech
+# registers are sign-magnitude: the top bit gives the direction and the other
+# bits the magnitude (what scs_tohost/scs_toscs convert).
+REG_TYPES = {
+    "uint8": ("B", None),
+    "uint16": ("H", None),
+    "int16": ("H", 15),
+}
+
+
+# Longest register block read in one READ; the status packet must stay
+# under RXPACKET_MAX_LEN
+BLOCK_MAX_LEN = 128
+
+
+class Register:
+    # One register of the schema with its codec precompiled for the byte
+    # order of the servo family
+    __slots__ = ("name", "addr", "size", "type", "signBit", "codec", "minValue", "maxValue")
+
+    def __init__(self, reg, order):
+        code, signBit = REG_TYPES[reg["type"]]
+        self.name = reg["name"]
+        self.addr = reg["addr"]
+        self.size = reg["size"]
+        self.type = reg["type"]
+        self.signBit = signBit
+        self.codec = struct.Struct(order + code)
+        if signBit is None:
+            self.minValue, self.maxValue = 0, (1 << (8 * self.codec.size)) - 1
+        else:
+            self.minValue, self.maxValue = -((1 << signBit) - 1), (1 << signBit) - 1
+
+    def decode(self, data, offset=0):
+        value = self.codec.unpack_from(data, offset)[0]
+        if self.signBit is not None and value & (1 << self.signBit):
+            value = -(value & ~(1 << self.signBit))
+        return value
+
+    def inRange(self, value):
+        return self.minValue <= value <= self.maxValue
+
+    def encode(self, value):
+        # Returns the register bytes in bus order; value must be inRange()
+        if self.signBit is not None and value < 0:
+            value = -value | (1 << self.signBit)
+        return self.codec.pack(value)
+
+
+class RegisterMap:
+    # servoRegs compiled for one servo family: registers are looked up by
+    # address in a dict, and a span of consecutive registers decodes with a
+    # single struct.unpack_from. Spans are compiled on first use and cached.
+    def __init__(self, regs, protocol_end=0):
+        self.order = '<' if protocol_end == 0 else '>'
+        self.registers = [Register(reg, self.order) for reg in sorted(regs, key=lambda reg: reg["addr"])]
+        self.byAddr = {reg.addr: reg for reg in self.registers}
+        self.spans = {}
+
+    def get(self, addr):
+        return self.byAddr.get(addr)
+
+    def blocks(self, maxLength=BLOCK_MAX_LEN):
+        # Groups the registers into the fewest contiguous (startAddr, length)
+        # reads of at most maxLength bytes. Unlisted addresses between
+        # registers are read along and ignored.
+        blocks = []
+        for reg in self.registers:
+            if blocks and reg.addr + reg.size - blocks[-1][0] <= maxLength:
+                blocks[-1][1] = reg.addr + reg.size - blocks[-1][0]
+            else:
+                blocks.append([reg.addr, reg.size])
+        return [tuple(block) for block in blocks]
+
+    def span(self, startAddr, length):
+        # Returns (struct covering the registers fully inside the span, their
+        # addresses in order, (index, sign bit) of the signed ones)
+        key = (startAddr, length)
+        span = self.spans.get(key)
+        if span is None:
+            fmt = self.order
+            addrs = []
+            signed = []
+            addr = startAddr
+            for reg in self.registers:
+                if reg.addr < startAddr or reg.addr + reg.size > startAddr + length:
+                    continue
+                fmt += 'x' * (reg.addr - addr) + REG_TYPES[reg.type][0]
+                addr = reg.addr + reg.size
+                if reg.signBit is not None:
+                    signed.append((len(addrs), reg.signBit))
+                addrs.append(reg.addr)
+            span = self.spans[key] = (struct.Struct(fmt), tuple(addrs), tuple(signed))
+        return span
+
+    def decodeSpan(self, startAddr, data, offset=0, length=None):
+        # Decodes every register in data (read from startAddr) into
+        # addr -> value
+        if length is None:
+            length = len(data) - offset
+        codec, addrs, signed = self.span(startAddr, length)
+        values = codec.unpack_from(data, offset)
+        if signed:
+            values = list(values)
+            for index, signBit in signed:
+                if values[index] & (1 << signBit):
+                    values[index] = -(values[index] & ~(1 << signBit))
+        return dict(zip(addrs, values))
@@ -0,0 +1,49 @@
+import time
+
+from scservo_sdk import *
+
+# Names of the status packet error bits; other bits are reported as "bit<n>"
+ERROR_BITS = {
+    ERRBIT_VOLTAGE: "voltage",
+    ERRBIT_ANGLE: "angle",
+    ERRBIT_OVERHEAT: "overheat",
+    ERRBIT_OVERELE: "overcurrent",
+    ERRBIT_OVERLOAD: "overload",
+}
+
+
+class ServoErrors:
+    # Per-servo, per-bit counters of the error byte servos return in every
+    # status packet. The tuna only calls record() for a non-zero error byte,
+    # so healthy traffic costs one truth test per status packet.
+    #
+    # Each entry counts the status packets that had the bit set, with the
+    # wall clock time (time.time()) it was first and last seen.
+    def __init__(self):
+        self.servos = {}  # servo id -> {bit name: entry}
+
+    def record(self, servoId, error):
+        now = time.time()
+        bits = self.servos.setdefault(servoId, {})
+        bit = 1
+        while bit <= error:
+            if error & bit:
+                name = ERROR_BITS.get(bit) or "bit" + str(bit.bit_length() - 1)
+                entry = bits.get(name)
+                if entry is None:
+                    entry = bits[name] = { "count": 0, "first_seen": now, "last_seen": now }
+                entry["count"] += 1
+                entry["last_seen"] = now
+            bit <<= 1
+
+    def snapshot(self):
+        # servo id -> bit name -> copy of its entry, for the servos that ever
+        # reported an error
+        return {servoId: {name: dict(entry) for name, entry in bits.items()}
+                for servoId, bits in self.servos.items()}
+
+    def reset(self, servoId=None):
+        if servoId is None:
+            self.servos.clear()
+        else:
+            self.servos.pop(servoId, None)
@@ -0,0 +1,98 @@
+import time
+
+# Breaker states
+SERVO_HEALTHY = "healthy"
+SERVO_QUARANTINED = "quarantined"
+
+
+class ServoHealth:
+    # Per-ID circuit breaker. After failureThreshold consecutive failed
+    # transactions a servo is quarantined: callers skip it instead of burning
+    # a timeout (and retries) on it every frame. Quarantined servos are
+    # re-probed with a single ping at most once per probeInterval seconds and
+    # return to the hot path as soon as one probe succeeds.
+    def __init__(self, failureThreshold=3, probeInterval=1.0):
+        self.failureThreshold = failureThreshold
+        self.probeInterval = probeInterval
+        self.servos = {}
+        self.quarantined = set()
+        self.nextProbe = 0
+
+    def getEntry(self, servoId):
+        entry = self.servos.get(servoId)
+        if entry is None:
+            entry = {
+                "state": SERVO_HEALTHY,
+                "consecutive_failures": 0,
+                "total_failures": 0,
+                "total_successes": 0,
+                "quarantined_since": None,
+                "last_probe": None,
+                "probes": 0
+            }
+            self.servos[servoId] = entry
+        return entry
+
+    def isAvailable(self, servoId):
+        entry = self.servos.get(servoId)
+        return entry is None or entry["state"] == SERVO_HEALTHY
+
+    def filterAvailable(self, servoIds):
+        return [servoId for servoId in servoIds if self.isAvailable(servoId)]
+
+    def recordSuccess(self, servoId):
+        entry = self.getEntry(servoId)
+        entry["consecutive_failures"] = 0
+        entry["total_successes"] += 1
+        if entry["state"] != SERVO_HEALTHY:
+            entry["state"] = SERVO_HEALTHY
+            entry["quarantined_since"] = None
+            self.quarantined.discard(servoId)
+
+    def recordFailure(self, servoId):
+        entry = self.getEntry(servoId)
+        entry["consecutive_failures"] += 1
+        entry["total_failures"] += 1
+        if entry["state"] == SERVO_HEALTHY and entry["consecutive_failures"] >= self.failureThreshold:
+            entry["state"] = SERVO_QUARANTINED
+            entry["quarantined_since"] = time.monotonic()
+            entry["last_probe"] = entry["quarantined_since"]
+            self.quarantined.add(servoId)
+
+    def quarantinedIds(self):
+        return sorted(self.quarantined)
+
+    def nextProbeId(self):
+        # Returns the quarantined servo that has waited longest for a probe, if
+        # its probe interval has elapsed. At most one probe per probeInterval is
+        # handed out across all servos to keep the duty cycle low.
+        if not self.quarantined:
+            return None
+        now = time.monotonic()
+        if now < self.nextProbe:
+            return None
+
+        candidate = None
+        for servoId in self.quarantined:
+            entry = self.servos[servoId]
+            if now - entry["last_probe"] < self.probeInterval:
+                continue
+            if candidate is None or entry["last_probe"] < self.servos[candidate]["last_probe"]:
+                candidate = servoId
+
+        if candidate is not None:
+            self.servos[candidate]["last_probe"] = now
+            self.servos[candidate]["probes"] += 1
+            self.nextProbe = now + self.probeInterval / max(len(self.quarantined), 1)
+        return candidate
+
+    def reset(self, servoId=None):
+        if servoId is None:
+            self.servos.clear()
+            self.quarantined.clear()
+        else:
+            self.servos.pop(servoId, None)
+            self.quarantined.discard(servoId)
+
+    def snapshot(self):
+        return {servoId: dict(entry) for servoId, entry in self.servos.items()}
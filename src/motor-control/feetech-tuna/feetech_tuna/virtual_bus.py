@@ -0,0 +1,441 @@
+# Hardware-free Feetech bus.
+#
+# VirtualBus simulates a set of SCS/STS servos that answer PING, READ, WRITE,
+# REG_WRITE, ACTION, SYNC_READ and SYNC_WRITE from a per-servo register image
+# laid out like servoRegs. It can be reached in two ways:
+#
+# - in-memory: open the port "virtual://<name>" with FeetechTuna/PortHandler.
+#   The bus registered under <name> is used, or one is created from the URL
+#   query, e.g. "virtual://robot?ids=1-7,10-17,20-27,30-37,40&baud=1000000".
+# - pty: VirtualBus.servePty() (or running this file) exposes the bus on a
+#   pseudo terminal whose path can be handed to tuna.py, receiver.py, ...
+#
+# Reply timing follows the configured baud rate (10 bits per byte), the servo
+# return delay and an optional adapter latency. setFaults() injects line
+# noise, corrupted, truncated and dropped status packets.
+#
+# Servos are kept in a list, so like on a real bus two of them can end up
+# with the same ID (e.g. half way through swapping two IDs); both then act
+# on every packet sent to that ID.
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+cd = os.path.dirname(__file__)
+sys.path.append(os.path.join(cd, 'SCServo_Python'))
+
+from scservo_sdk import *
+
+REGISTER_COUNT = 128
+DEFAULT_MODEL = 777
+
+EEPROM_DEFAULTS = {
+    # addr: (value, size)
+    SMS_STS_MODEL_L: (DEFAULT_MODEL, 2),
+    SMS_STS_BAUD_RATE: (SMS_STS_1M, 1),
+    7: (0, 1),  # Return Delay
+    8: (1, 1),  # Response Status Level
+    SMS_STS_MIN_ANGLE_LIMIT_L: (0, 2),
+    SMS_STS_MAX_ANGLE_LIMIT_L: (4095, 2),
+    13: (70, 1),  # Max Temperature Limit
+    14: (140, 1),  # Max Voltage Limit
+    15: (40, 1),  # Min Voltage Limit
+    16: (1000, 2),  # Max Torque Limit
+    18: (12, 1),  # Phase
+    21: (32, 1),  # P Coefficient
+    22: (32, 1),  # D Coefficient
+    36: (80, 1),  # Overload Torque
+}
+
+
+class VirtualServo:
+    def __init__(self, servoId, endian=0, model=DEFAULT_MODEL, position=2048):
+        self.endian = endian
+        self.regs = bytearray(REGISTER_COUNT)
+        for addr, (value, size) in EEPROM_DEFAULTS.items():
+            self.setValue(addr, value, size)
+        self.setValue(SMS_STS_MODEL_L, model, 2)
+        self.regs[SMS_STS_ID] = servoId
+        self.regs[SMS_STS_PRESENT_VOLTAGE] = 120
+        self.regs[SMS_STS_PRESENT_TEMPERATURE] = 30
+        self.setPosition(position)
+        self.setValue(SMS_STS_GOAL_POSITION_L, position, 2)
+
+        self.error = 0  # error byte returned in every status packet
+        self.pending = None  # REG_WRITE buffer, applied on ACTION
+
+    @property
+    def id(self):
+        return self.regs[SMS_STS_ID]
+
+    def getValue(self, addr, size=2):
+        if size == 1:
+            return self.regs[addr]
+        if self.endian == 0:
+            return self.regs[addr] | (self.regs[addr + 1] << 8)
+        return (self.regs[addr] << 8) | self.regs[addr + 1]
+
+    def setValue(self, addr, value, size=2):
+        if size == 1:
+            self.regs[addr] = value & 0xFF
+        elif self.endian == 0:
+            self.regs[addr] = value & 0xFF
+            self.regs[addr + 1] = (value >> 8) & 0xFF
+        else:
+            self.regs[addr] = (value >> 8) & 0xFF
+            self.regs[addr + 1] = value & 0xFF
+
+    def setPosition(self, position):
+        # Moves the (simulated) horn, e.g. a leader arm being moved by hand
+        self.setValue(SMS_STS_PRESENT_POSITION_L, position, 2)
+
+    def read(self, addr, length):
+        return bytes(self.regs[addr: addr + length])
+
+    def write(self, addr, data):
+        # like read, clipped to the register table: bytes past its end are
+        # dropped instead of growing it
+        data = data[:max(REGISTER_COUNT - addr, 0)]
+        self.regs[addr: addr + len(data)] = data
+        # an enabled servo reaches its goal instantly
+        goal = SMS_STS_GOAL_POSITION_L
+        if self.regs[SMS_STS_TORQUE_ENABLE] and addr <= goal + 1 and addr + len(data) > goal:
+            self.regs[SMS_STS_PRESENT_POSITION_L: SMS_STS_PRESENT_POSITION_L + 2] = self.regs[goal: goal + 2]
+
+    def respondsTo(self, instruction):
+        # Response Status Level 0: only PING and READ get a status packet
+        return instruction in (INST_PING, INST_READ) or self.regs[8] != 0
+
+
+class VirtualBus:
+    def __init__(self, servoIds=(), baudrate=1000000, returnDelay=0.0, latency=0.0, endian=0):
+        # returnDelay and latency are in seconds; returnDelay is added before
+        # every status packet, latency once per transaction (USB adapter)
+        self.servos = []  # in bus order; add and remove them with addServo/removeServo
+        self.byId = None  # servo id -> [servo], rebuilt after an ID change
+        self.baudrate = baudrate
+        self.returnDelay = returnDelay
+        self.latency = latency
+        self.endian = endian
+        self.lock = threading.Lock()
+        self.setFaults()
+        for servoId in servoIds:
+            self.addServo(servoId)
+
+    def setFaults(self, noise=0.0, noiseLength=16, noiseByte=None, corrupt=0.0, truncate=0.0, drop=0.0,
+                  seed=None):
+        # Per status packet probabilities of: up to noiseLength bytes of noise
+        # sent ahead of it (random, or noiseByte repeated, e.g. 0xFF from an
+        # idle line), a flipped data/checksum bit, losing its tail, or not
+        # sending it at all
+        self.faults = {"noise": noise, "corrupt": corrupt, "truncate": truncate, "drop": drop}
+        self.noiseLength = noiseLength
+        self.noiseByte = noiseByte
+        self.random = random.Random(seed)
+        self.faultCounts = dict.fromkeys(self.faults, 0)
+
+    def injectFaults(self, reply):
+        chance = self.random.random
+        if self.faults["drop"] and chance() < self.faults["drop"]:
+            self.faultCounts["drop"] += 1
+            return b''
+        if self.faults["corrupt"] and chance() < self.faults["corrupt"]:
+            self.faultCounts["corrupt"] += 1
+            reply = bytearray(reply)
+            reply[self.random.randrange(PKT_ERROR, len(reply))] ^= 1 << self.random.randrange(8)
+        if self.faults["truncate"] and chance() < self.faults["truncate"]:
+            self.faultCounts["truncate"] += 1
+            reply = reply[:self.random.randrange(1, len(reply))]
+        if self.faults["noise"] and chance() < self.faults["noise"]:
+            self.faultCounts["noise"] += 1
+            length = self.random.randint(1, self.noiseLength)
+            if self.noiseByte is None:
+                noise = bytes(self.random.randrange(256) for _ in range(length))
+            else:
+                noise = bytes([self.noiseByte]) * length
+            reply = noise + bytes(reply)
+        return bytes(reply)
+
+    def addServo(self, servoId, **kwargs):
+        servo = VirtualServo(servoId, endian=self.endian, **kwargs)
+        self.servos.append(servo)
+        self.byId = None
+        return servo
+
+    def removeServo(self, servoId):
+        # Removes (and returns) the first servo with that ID, if any
+        servo = self.getServo(servoId)
+        if servo is not None:
+            self.servos.remove(servo)
+            self.byId = None
+        return servo
+
+    def findServos(self, servoId):
+        # Every servo currently answering to servoId
+        if self.byId is None:
+            byId = {}
+            for servo in self.servos:
+                byId.setdefault(servo.id, []).append(servo)
+            self.byId = byId
+        return self.byId.get(servoId, ())
+
+    def getServo(self, servoId):
+        servos = self.findServos(servoId)
+        return servos[0] if servos else None
+
+    def servoIds(self):
+        return sorted(set(servo.id for servo in self.servos))
+
+    def byteTime(self):
+        return 10.0 / self.baudrate if self.baudrate else 0.0
+
+    def statusPacket(self, servo, data=b''):
+        packet = bytearray([0xFF, 0xFF, servo.id, len(data) + 2, servo.error])
+        packet += data
+        packet.append(~sum(packet[2:]) & 0xFF)
+        return bytes(packet)
+
+    def parse(self, buffer):
+        # Pops complete, checksum-valid instruction packets off the front of buffer
+        packets = []
+        while True:
+            head = buffer.find(b'\xff\xff')
+            if head < 0:
+                del buffer[:max(len(buffer) - 1, 0)]
+                return packets
+            del buffer[:head]
+            if len(buffer) < 4:
+                return packets
+            length = buffer[PKT_LENGTH] + 4
+            if buffer[PKT_LENGTH] < 2:
+                del buffer[:1]
+                continue
+            if len(buffer) < length:
+                return packets
+            packet = bytes(buffer[:length])
+            if packet[-1] == (~sum(packet[2:-1]) & 0xFF):
+                del buffer[:length]
+                packets.append(packet)
+            else:
+                del buffer[:1]
+
+    def execute(self, packet):
+        # Runs one instruction packet and returns the status packets it produces
+        scs_id = packet[PKT_ID]
+        instruction = packet[PKT_INSTRUCTION]
+        params = packet[PKT_PARAMETER0:-1]
+        replies = []
+
+        with self.lock:
+            targets = list(self.servos) if scs_id == BROADCAST_ID else list(self.findServos(scs_id))
+
+            if instruction == INST_PING:
+                replies = [self.statusPacket(servo) for servo in targets if scs_id != BROADCAST_ID]
+            elif instruction == INST_READ and len(params) >= 2:
+                replies = [self.statusPacket(servo, servo.read(params[0], params[1])) for servo in targets]
+            elif instruction in (INST_WRITE, INST_REG_WRITE) and len(params) >= 1:
+                for servo in targets:
+                    if instruction == INST_WRITE:
+                        self.writeServo(servo, params[0], params[1:])
+                    else:
+                        servo.pending = (params[0], params[1:])
+                    if scs_id != BROADCAST_ID and servo.respondsTo(instruction):
+                        replies.append(self.statusPacket(servo))
+            elif instruction == INST_ACTION:
+                for servo in targets:
+                    if servo.pending is not None:
+                        self.writeServo(servo, *servo.pending)
+                        servo.pending = None
+                    if scs_id != BROADCAST_ID and servo.respondsTo(instruction):
+                        replies.append(self.statusPacket(servo))
+            elif instruction == INST_SYNC_READ and len(params) >= 2:
+                address, length = params[0], params[1]
+                for servoId in params[2:]:
+                    for servo in self.findServos(servoId):
+                        replies.append(self.statusPacket(servo, servo.read(address, length)))
+            elif instruction == INST_SYNC_WRITE and len(params) >= 2:
+                address, length = params[0], params[1]
+                data = params[2:]
+                # every servo picks its entry out of the same packet, so the
+                # targets are resolved before an ID write takes effect
+                writes = [(servo, data[index + 1: index + 1 + length])
+                          for index in range(0, len(data) - length, length + 1)
+                          for servo in self.findServos(data[index])]
+                for servo, values in writes:
+                    self.writeServo(servo, address, values)
+
+        return replies
+
+    def writeServo(self, servo, address, data):
+        oldId = servo.id
+        servo.write(address, data)
+        if servo.id != oldId:
+            self.byId = None
+
+    def transact(self, data, start):
+        # Executes every packet in data (sent at time start) and returns the
+        # replies as a list of (ready_time, bytes)
+        buffer = bytearray(data)
+        byteTime = self.byteTime()
+        clock = start + len(data) * byteTime + self.latency
+        scheduled = []
+        for packet in self.parse(buffer):
+            for reply in self.execute(packet):
+                reply = self.injectFaults(reply)
+                if reply:
+                    clock += self.returnDelay + len(reply) * byteTime
+                    scheduled.append((clock, reply))
+        return scheduled
+
+    def servePty(self):
+        # Serves the bus on a new pseudo terminal and returns the slave path
+        import tty
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        thread = threading.Thread(target=self.runPty, args=(master,), daemon=True)
+        thread.start()
+        self.ptySlave = slave
+        return os.ttyname(slave)
+
+    def runPty(self, master):
+        buffer = bytearray()
+        while True:
+            try:
+                chunk = os.read(master, 4096)
+            except OSError:
+                return
+            now = time.monotonic()
+            buffer += chunk
+            for packet in self.parse(buffer):
+                for ready, reply in self.transact(packet, now):
+                    delay = ready - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    os.write(master, reply)
+                    now = ready
+
+
+class VirtualTransport(Transport):
+    # In-memory transport connected to a VirtualBus. Replies become readable
+    # once their simulated wire time has passed.
+    def __init__(self, bus):
+        self.bus = bus
+        self.rx = []  # (ready_time, bytes), in order
+        self.rxBuffer = bytearray()
+        self.baudrate = None  # host side rate once changed with setBaudRate
+
+    def collect(self):
+        now = time.monotonic()
+        while self.rx and self.rx[0][0] <= now:
+            self.rxBuffer += self.rx.pop(0)[1]
+
+    def readinto(self, buffer):
+        self.collect()
+        count = min(len(buffer), len(self.rxBuffer))
+        buffer[:count] = self.rxBuffer[:count]
+        del self.rxBuffer[:count]
+        return count
+
+    def write(self, data):
+        data = bytes(data)
+        if self.baudrate is not None and self.baudrate != self.bus.baudrate:
+            return len(data)  # the servos only see framing errors
+        self.rx.extend(self.bus.transact(data, time.monotonic()))
+        return len(data)
+
+    def setBaudRate(self, baudrate):
+        self.baudrate = baudrate
+        return True
+
+    def resetInput(self):
+        self.rx = []
+        self.rxBuffer.clear()
+
+    def inWaiting(self):
+        self.collect()
+        return len(self.rxBuffer)
+
+    def waitReadable(self, timeout):
+        self.collect()
+        if self.rxBuffer:
+            return True
+        if self.rx:
+            wait = self.rx[0][0] - time.monotonic()
+            if wait <= timeout:
+                if wait > 0:
+                    time.sleep(wait)
+                self.collect()
+                return True
+        time.sleep(max(timeout, 0))
+        return False
+
+
+VIRTUAL_BUSES = {}
+
+
+def registerVirtualBus(name, bus):
+    VIRTUAL_BUSES[name] = bus
+    return "virtual://" + name
+
+
+def parseIds(text):
+    # "1-7,10,20-27" -> [1, 2, ..., 7, 10, 20, ..., 27]
+    ids = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            ids.extend(range(int(first), int(last) + 1))
+        else:
+            ids.append(int(part))
+    return ids
+
+
+def openVirtualPort(port_name, baudrate):
+    url = urlsplit(port_name)
+    name = url.netloc or url.path
+    bus = VIRTUAL_BUSES.get(name)
+    if bus is None:
+        query = parse_qs(url.query)
+        bus = VirtualBus(
+            parseIds(query.get("ids", [""])[0]),
+            baudrate=int(query.get("baud", [baudrate])[0]),
+            returnDelay=float(query.get("delay_us", [0])[0]) / 1000000.0,
+            latency=float(query.get("latency_us", [0])[0]) / 1000000.0
+        )
+        VIRTUAL_BUSES[name] = bus
+    return VirtualTransport(bus)
+
+
+registerTransport("virtual", openVirtualPort)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve a simulated Feetech servo bus on a pseudo terminal')
+    parser.add_argument('--ids', type=str, default="1-7,10-17,20-27,30-37,40",
+                        help='Servo IDs, e.g. 1-7,10-17 (default: the teleop robot layout)')
+    parser.add_argument('--baudrate', type=int, default=1000000, help='Baud rate used for reply timing')
+    parser.add_argument('--delay-us', type=float, default=0, help='Servo return delay in microseconds')
+    parser.add_argument('--latency-us', type=float, default=0, help='Adapter latency in microseconds')
+    parser.add_argument('--noise', type=float, default=0, help='Probability of line noise before a reply')
+    parser.add_argument('--corrupt', type=float, default=0, help='Probability of a corrupted reply')
+    parser.add_argument('--drop', type=float, default=0, help='Probability of a lost reply')
+    args = parser.parse_args()
+
+    bus = VirtualBus(parseIds(args.ids), baudrate=args.baudrate,
+                     returnDelay=args.delay_us / 1000000.0, latency=args.latency_us / 1000000.0)
+    bus.setFaults(noise=args.noise, corrupt=args.corrupt, drop=args.drop)
+    print("Virtual bus with servos " + ", ".join(str(servoId) for servoId in bus.servoIds()))
+    print("Serving on " + bus.servePty())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,5 @@
 import argparse
+import time
 from prompt_toolkit import prompt
 from prompt_toolkit.history import InMemoryHistory
 from feetech_tuna import FeetechTuna
@@ -11,6 +12,8 @@ parser = argparse.ArgumentParser(description='Feetech Tuna - A tuning tool for F
 parser.add_argument('port', type=str, help='The serial port to connect to')
 parser.add_argument('--baudrate', type=int, default=1000000, help='The baudrate to use')
 parser.add_argument('--servofamily', type=str, default="sms_sts", help='Servo family (sms_sts or scscl)')
+parser.add_argument('--pipeline', action='store_true', help='Send batched requests (listregs) in a single write')
+parser.add_argument('--metrics-port', type=int, default=None, help='Serve transaction metrics as JSON on this local port')
 
 args = parser.parse_args()
 
@@ -19,6 +22,7 @@ history = InMemoryHistory()
 
 # Create a new FeetechTuna instance
 tuna = FeetechTuna()
+tuna.setPipelining(args.pipeline)
 
 # Welcome message
 print("Welcome to Feetech Tuna!")
@@ -33,6 +37,10 @@ else:
     print("Exiting...")
     quit()
 
+if args.metrics_port is not None:
+    tuna.serveMetrics(args.metrics_port)
+    print("Serving metrics on http://127.0.0.1:" + str(args.metrics_port) + "/metrics")
+
 
 # Main command loop - reads commands from the user and sends them to the servo
 selectedServo = None
@@ -51,6 +59,97 @@ while True:
         print("Found " + str(len(list)) + " servos")
         for servo in list:
             print("Servo " + str(servo["id"]) + " - Model: " + str(servo["model"]))
+    elif command == "sweep":
+        print("Scanning every baud rate. Please wait...")
+        found = tuna.sweepBaudrates()
+        if not found:
+            print("No servos found at any baud rate")
+        for baudrate in found:
+            print("Found " + str(len(found[baudrate])) + " servos at " + str(baudrate) + " baud")
+            for servo in found[baudrate]:
+                print("Servo " + str(servo["id"]) + " - Model: " + str(servo["model"]))
+    elif command.startswith("snapshot"):
+        parts = command.split(" ")
+        if len(parts) == 2:
+            servoIds = [servo["id"] for servo in tuna.listServos()]
+            snapshot = tuna.snapshot(servoIds)
+            snapshot.save(parts[1])
+            print("Saved " + str(len(snapshot.images)) + " servos to " + parts[1])
+        else:
+            print("Usage: snapshot <file>")
+    elif command.startswith("diff"):
+        parts = command.split(" ")
+        if len(parts) == 2 or (len(parts) == 3 and parts[1] == "all"):
+            # diff [all] <file>: compare the live servos against a saved snapshot
+            baseline = tuna.loadSnapshot(parts[-1])
+            current = tuna.snapshot(baseline.servoIds())
+            changes = baseline.diff(current, runtime=len(parts) == 3)
+            for change in changes:
+                print("Servo " + str(change["id"]) + " " + change["name"] + ": " + str(change["before"]) + " -> " + str(change["after"]))
+            print(str(len(changes)) + " differences")
+        elif len(parts) == 3 and parts[1] == "servo" and selectedServo != None:
+            # diff servo <id>: compare the selected servo with another one
+            otherServo = int(parts[2])
+            current = tuna.snapshot([selectedServo, otherServo])
+            if selectedServo in current.images and otherServo in current.images:
+                changes = current.compareServos(selectedServo, otherServo)
+                for change in changes:
+                    print(change["name"] + ": " + str(change["before"]) + " -> " + str(change["after"]))
+                print(str(len(changes)) + " differences")
+            else:
+                print("Failed to read both servos")
+        else:
+            print("Usage: diff [all] <file> | diff servo <servo_id> (with a servo selected)")
+    elif command.startswith("provision"):
+        # provision <servo_id>:<template_id> ...: load templates on several
+        # servos at once; each servo takes its template ID as its new ID
+        parts = command.split(" ")[1:]
+        try:
+            pairs = [tuple(int(value) for value in part.split(":")) for part in parts]
+        except ValueError:
+            pairs = []
+        if pairs and all(len(pair) == 2 and pair[1] in servoTemplates for pair in pairs):
+            results = tuna.provision({servoId: servoTemplates[templateId] for servoId, templateId in pairs},
+                                     {servoId: templateId for servoId, templateId in pairs})
+            for servoId, result in results.items():
+                if result["ok"]:
+                    print("Servo " + str(servoId) + " -> " + str(result["id"]) + ": " + str(len(result["written"])) + " registers written")
+                else:
+                    print("Servo " + str(servoId) + ": failed - " + result["error"])
+        else:
+            print("Usage: provision <servo_id>:<template_id> ...")
+    elif command.startswith("errors"):
+        parts = command.split(" ")
+        if len(parts) == 2 and parts[1] == "reset":
+            tuna.resetErrors()
+        else:
+            errors = tuna.getErrors()
+            if not errors:
+                print("No servo errors reported")
+            for servoId, bits in sorted(errors.items()):
+                for name, entry in bits.items():
+                    print("Servo " + str(servoId) + " - " + name + ": " + str(entry["count"]) + " times, first "
+                          + time.strftime("%H:%M:%S", time.localtime(entry["first_seen"])) + ", last "
+                          + time.strftime("%H:%M:%S", time.localtime(entry["last_seen"])))
+    elif command.startswith("metrics"):
+        parts = command.split(" ")
+        if len(parts) == 2 and parts[1] == "off":
+            tuna.enableMetrics(False)
+            print("Metrics disabled")
+        elif len(parts) == 2 and parts[1] == "reset":
+            tuna.resetMetrics()
+        elif tuna.metrics is None:
+            tuna.enableMetrics()
+            print("Metrics enabled - run 'metrics' again to see them")
+        else:
+            metrics = tuna.getMetrics()
+            print("Transactions: " + str(metrics["transactions"]) + " (" + str(metrics["retries"]) + " retries)")
+            print("Bus utilization: %.1f%% (wire %.1f ms, wait %.1f ms)" % (
+                metrics["utilization_pct"], metrics["wire_ms"], metrics["wait_ms"]))
+            print("Results: " + ", ".join(name + " " + str(count) for name, count in metrics["results"].items()))
+            for servo, stats in metrics["servos"].items():
+                print("Servo " + str(servo) + ": %d transactions, mean %.2f ms, max %.2f ms, %d failures, %d retries" % (
+                    stats["transactions"], stats["mean_ms"], stats["max_ms"], stats["failures"], stats["retries"]))
     elif command.startswith("select"):
         parts = command.split(" ")
         if len(parts) == 2:
@@ -122,30 +221,17 @@ while True:
             if len(parts) == 2:
                 templateId = int(parts[1])
                 if templateId in servoTemplates:
-                    
-                    # Unlock the EEPROM
-                    tuna.unlockEEPROM(selectedServo)
-
-                    # Load the template values
-                    success = True
-                    template = servoTemplates[templateId]
-                    for addr in template:
-                        value = template[addr]
-                        if (tuna.writeReg(selectedServo, addr, value) == False):
-                            print("Failed to write register " + str(addr) + " - aborting template load")
-                            success = False
-                            break
-
-                    # Set the servo ID last
-                    if success:
-                        tuna.writeReg(selectedServo, 5, templateId) # ID
-                        print("Template loaded successfully")
 
-                    # Switch to the new servo ID
-                    selectedServo = templateId
+                    # Write the registers that differ, set the servo ID and verify
+                    result = tuna.provision({selectedServo: servoTemplates[templateId]},
+                                            {selectedServo: templateId})[selectedServo]
+                    if result["ok"]:
+                        print("Template loaded successfully (" + str(len(result["written"])) + " registers written)")
+                    else:
+                        print("Failed to load template - " + result["error"])
 
-                    # Lock the EEPROM
-                    tuna.lockEEPROM(selectedServo)
+                    # Switch to the new servo ID
+                    selectedServo = result["id"]
 
                     # Read min position
                     minPos = tuna.readReg(selectedServo, 9)
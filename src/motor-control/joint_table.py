@@ -0,0 +1,156 @@
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+
+class JointTable:
+    """
+    Array-backed leader/follower joint configuration.
+
+    Every per-joint setting (IDs, baselines, multipliers, direction signs and
+    goal limits) is stored as an aligned NumPy array in SERVO_MAP order, so the
+    teleoperation mapping runs as a handful of vectorized operations over all
+    joints at once. All intermediate results are written into buffers that are
+    allocated once, which keeps compute() allocation-free.
+    """
+
+    RANGE_MAX = 4096
+    HALF_RANGE = RANGE_MAX // 2
+
+    def __init__(
+        self,
+        servo_map: Mapping[int, int],
+        reversed_motors: Set[int],
+        multiplier_map: Mapping[int, float],
+        default_multiplier: float = 1.0,
+        limits: Optional[Mapping[int, Tuple[int, int]]] = None,
+        min_position: int = 0,
+        max_position: int = 4095
+    ):
+        """
+        Build the table from the dict-based configuration.
+
+        Args:
+            servo_map: Leader ID to follower ID mapping, defines the joint order
+            reversed_motors: Follower IDs whose direction is inverted
+            multiplier_map: Follower ID to delta multiplier
+            default_multiplier: Multiplier of followers not in multiplier_map
+            limits: Optional follower ID to (min, max) goal position
+            min_position: Lower goal limit of followers not in limits
+            max_position: Upper goal limit of followers not in limits
+        """
+        limits = limits or {}
+
+        self.leader_ids = np.array(list(servo_map.keys()), dtype=np.int32)
+        self.follower_ids = np.array(list(servo_map.values()), dtype=np.int32)
+        self.size = len(self.leader_ids)
+
+        self.leader_index: Dict[int, int] = {int(i): n for n, i in enumerate(self.leader_ids)}
+        self.follower_index: Dict[int, int] = {int(i): n for n, i in enumerate(self.follower_ids)}
+
+        self.multipliers = np.array(
+            [multiplier_map.get(int(f), default_multiplier) for f in self.follower_ids], dtype=np.float64
+        )
+        self.directions = np.array(
+            [-1.0 if int(f) in reversed_motors else 1.0 for f in self.follower_ids], dtype=np.float64
+        )
+        self.scales = self.directions * self.multipliers
+        self.min_limits = np.array(
+            [limits.get(int(f), (min_position, max_position))[0] for f in self.follower_ids], dtype=np.float64
+        )
+        self.max_limits = np.array(
+            [limits.get(int(f), (min_position, max_position))[1] for f in self.follower_ids], dtype=np.float64
+        )
+
+        # Unknown baselines are NaN, which propagates through compute() and
+        # marks the joint as invalid
+        self.leader_baselines = np.full(self.size, np.nan)
+        self.follower_baselines = np.full(self.size, np.nan)
+
+        # Preallocated work buffers
+        self.leader_positions = np.full(self.size, np.nan)
+        self.leader_deltas = np.empty(self.size)
+        self.scaled_deltas = np.empty(self.size)
+        self.targets = np.empty(self.size)
+        self.valid = np.zeros(self.size, dtype=bool)
+        self._mask = np.empty(self.size, dtype=bool)
+
+    def load(self, values: Mapping[int, Optional[float]], index: Mapping[int, int], out: np.ndarray) -> np.ndarray:
+        """Fill out (in joint order) from an ID-keyed dict. Missing or None entries become NaN."""
+        out.fill(np.nan)
+        for servo_id, value in values.items():
+            n = index.get(servo_id)
+            if n is not None and value is not None:
+                out[n] = value
+        return out
+
+    def set_leader_baselines(self, baselines: Mapping[int, Optional[int]]) -> None:
+        """Set leader baselines from a leader ID keyed dict."""
+        self.load(baselines, self.leader_index, self.leader_baselines)
+
+    def set_follower_baselines(self, baselines: Mapping[int, Optional[int]]) -> None:
+        """Set follower baselines from a follower ID keyed dict."""
+        self.load(baselines, self.follower_index, self.follower_baselines)
+
+    def load_leader_positions(self, positions: Mapping[int, Optional[int]]) -> np.ndarray:
+        """Copy a leader ID keyed dict of positions into the leader position buffer."""
+        return self.load(positions, self.leader_index, self.leader_positions)
+
+    def compute(self, leader_positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compute every follower goal position from the leader positions.
+
+        Args:
+            leader_positions: Leader positions in joint order. Defaults to the
+                buffer filled by load_leader_positions().
+
+        Returns:
+            The targets buffer (floored goal positions in joint order). Joints
+            with a missing position or baseline are NaN and False in valid.
+        """
+        if leader_positions is None:
+            leader_positions = self.leader_positions
+
+        delta = self.leader_deltas
+        mask = self._mask
+
+        # Leader delta with wraparound handling
+        np.subtract(leader_positions, self.leader_baselines, out=delta)
+        np.greater(delta, self.HALF_RANGE, out=mask)
+        np.subtract(delta, self.RANGE_MAX, out=delta, where=mask)
+        np.less(delta, -self.HALF_RANGE, out=mask)
+        np.add(delta, self.RANGE_MAX, out=delta, where=mask)
+
+        # Apply direction and scaling, then clamp to the goal limits
+        np.multiply(delta, self.scales, out=self.scaled_deltas)
+        np.add(self.follower_baselines, self.scaled_deltas, out=self.targets)
+        np.clip(self.targets, self.min_limits, self.max_limits, out=self.targets)
+        np.floor(self.targets, out=self.targets)
+
+        np.isnan(self.targets, out=self.valid)
+        np.logical_not(self.valid, out=self.valid)
+        return self.targets
+
+    def follower_targets(self) -> Dict[int, int]:
+        """Follower ID to goal position for every valid joint of the last compute()."""
+        return {
+            int(follower_id): int(target)
+            for follower_id, target, valid in zip(self.follower_ids, self.targets, self.valid)
+            if valid
+        }
+
+    def details(self) -> List[Dict]:
+        """Per-joint diagnostics of the last compute(), for valid joints only."""
+        result = []
+        for n in np.flatnonzero(self.valid):
+            # update_follower_position reports the leader delta with the direction sign applied
+            result.append({
+                'follower_id': int(self.follower_ids[n]),
+                'leader_id': int(self.leader_ids[n]),
+                'follower_baseline': int(self.follower_baselines[n]),
+                'leader_baseline': int(self.leader_baselines[n]),
+                'new_position': int(self.targets[n]),
+                'leader_delta': int(self.leader_deltas[n] * self.directions[n]),
+                'scaled_delta': float(self.scaled_deltas[n])
+            })
+        return result
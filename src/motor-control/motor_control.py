@@ -11,7 +11,9 @@ feetech_tuna_root = os.path.abspath(os.path.join(current_dir, "./feetech-tuna/fe
 sys.path.append(feetech_tuna_root)
 
 # Now import your module
-from feetech_tuna import FeetechTuna
+from feetech_tuna import FeetechTuna, PRIORITY_COMMAND, serveMetrics, DEFAULT_METRICS_PORT
+from bus_manager import BusManager
+from joint_table import JointTable
 
 class MotorController:
 
@@ -47,15 +49,25 @@ class MotorController:
     }
     DEFAULT_MULTIPLIER: float = 1.0
 
+    # Follower ID: (min, max) goal position. Followers not listed use 0-4095.
+    POSITION_LIMITS: Dict[int, Tuple[int, int]] = {}
+
     # Register addresses
     TORQUE_ENABLE_REG = 40
     MODE_REG = 33
     POSITION_REG = 56
     GOAL_POSITION_REG = 42
+    SPEED_REG = 58
+    LOAD_REG = 60
 
     # Class constants
     STEP_SIZE = 50  # Adjust this value to control movement sensitivity
 
+    # Send batched requests (e.g. tuna.writeRegs) in a single write. Only
+    # safe when the servos' Return Delay covers the rest of the batch, since
+    # the bus is half-duplex.
+    PIPELINE_REQUESTS = False
+
     # Keyboard mapping for follower motors
     # Format: follower_id: {'up_key': key, 'down_key': key}
     KEYBOARD_MAPPING = {
@@ -89,38 +101,70 @@ class MotorController:
 
     # Initialization Functions
     def __init__(self):
-        self.tuna = FeetechTuna()
+        self.tuna = FeetechTuna()  # the (first) bus; see buses for the routing
+        self.buses = BusManager()
         self._connected = False
+        self.joints = JointTable(
+            self.SERVO_MAP,
+            self.REVERSED_MOTORS,
+            self.MULTIPLIER_MAP,
+            self.DEFAULT_MULTIPLIER,
+            self.POSITION_LIMITS
+        )
 
     def connect(self, port: str, baudrate: int = 1000000) -> bool:
         """Connect to the serial port."""
-        self._connected = self.tuna.openSerialPort(port=port, baudrate=baudrate)
+        self._connected = self.buses.add_bus(port, self.get_ids(), baudrate, self.PIPELINE_REQUESTS, tuna=self.tuna)
         return self._connected
 
+    def connect_buses(self, bus_ports: Dict[str, List[int]], baudrate: int = 1000000) -> bool:
+        """
+        Connect to several serial ports, each driving its own set of servos.
+
+        Reads and writes that span several buses run on all of them
+        concurrently, so frame time stays flat as buses are added.
+
+        Args:
+            bus_ports: Dict of port to the IDs of the servos on it, e.g. the
+                left arm's leaders and followers on one adapter and the right
+                arm's on another
+            baudrate: Baud rate of every bus
+
+        Returns:
+            True if every port was opened
+        """
+        for index, (port, servo_ids) in enumerate(bus_ports.items()):
+            tuna = self.tuna if index == 0 else None
+            if not self.buses.add_bus(port, servo_ids, baudrate, self.PIPELINE_REQUESTS, tuna=tuna):
+                self.buses.close()
+                return False
+        self._connected = True
+        return True
+
     def disconnect(self) -> None:
-        """Disconnect from the serial port."""
+        """Disconnect from the serial ports."""
         if self._connected:
-            self.tuna.closeSerialPort()
+            self.buses.close()
             self._connected = False
 
     def initialize_servos(self) -> None:
         """Initialize all leader and follower servos in multi-turn mode."""
         print("Initializing servos in multi-turn mode...")
-        for leader_id, follower_id in self.SERVO_MAP.items():
-            try:
-                # Disable torque
-                self.tuna.writeReg(follower_id, self.TORQUE_ENABLE_REG, 0)
-                self.tuna.writeReg(leader_id, self.TORQUE_ENABLE_REG, 0)
-
-                # Set multi-turn mode
-                self.tuna.writeReg(follower_id, self.MODE_REG, 0)
-                self.tuna.writeReg(leader_id, self.MODE_REG, 0)
-
-                # Enable torque for followers only
-                self.tuna.writeReg(follower_id, self.TORQUE_ENABLE_REG, 1)
-
-            except Exception as e:
-                print(f"Error initializing servos {leader_id}-{follower_id}: {e}")
+        try:
+            # Disable torque, set multi-turn mode, then enable torque for
+            # followers only: one group write (and read back) per step
+            servo_ids = self.get_ids()
+            with self.buses.priority(PRIORITY_COMMAND):
+                results = [
+                    self.set_torque(servo_ids, False, verify=True),
+                    self.set_mode(servo_ids, 0, verify=True),
+                    self.set_torque(self.get_follower_ids(), True, verify=True),
+                ]
+            failed_ids = sorted({servo_id for result in results for servo_id, ok in result.items() if not ok})
+            if failed_ids:
+                print(f"Error initializing servos {failed_ids}")
+        except Exception as e:
+            print(f"Error initializing servos: {e}")
         print("Servo initialization complete")
 
     # ID Functions
@@ -144,36 +188,324 @@ class MotorController:
         """Get the follower ID for a given leader ID."""
         return self.SERVO_MAP.get(leader_id)
 
+    def check_servos(self, servo_ids: Optional[List[int]] = None) -> Tuple[Dict[int, int], List[int]]:
+        """
+        Check that the expected servos are on the bus.
+
+        One sync read of the model register covers every expected ID; the IDs
+        that did not answer are pinged once more with a short timeout.
+
+        Args:
+            servo_ids: IDs to look for (defaults to every leader and follower)
+
+        Returns:
+            Tuple of (dict of servo ID to model number for the servos found,
+            list of missing servo IDs)
+        """
+        if servo_ids is None:
+            servo_ids = self.get_ids()
+        found: Dict[int, int] = {}
+        missing = [servo_id for servo_id in servo_ids if self.buses.tuna_for(servo_id) is None]
+        for bus_found, bus_missing in self.buses.run(self.buses.split(servo_ids),
+                                                     lambda tuna, ids: tuna.checkServos(ids)).values():
+            found.update(bus_found)
+            missing.extend(bus_missing)
+        return found, sorted(missing)
+
     # Position Functions
-    def get_servo_positions(self, servo_ids: List[int]) -> Dict[int, int]:
-        """Get current positions for the specified servo IDs."""
-        return {
-            servo_id: self.tuna.readReg(servo_id, self.POSITION_REG) or self.FOLLOWER_STARTING_POSITIONS.get(servo_id, 2048)
-            for servo_id in servo_ids
-        }
+    def get_servo_positions(self, servo_ids: List[int]) -> Dict[int, Optional[int]]:
+        """
+        Get current positions for the specified servo IDs in a single sync read.
 
-    def set_servo_positions(self, positions: Dict[int, int]) -> None:
-        """Set the position for a list of servos."""
-        for servo_id, position in positions.items():
-            self.tuna.writeReg(servo_id, self.GOAL_POSITION_REG, position)
+        Args:
+            servo_ids: IDs of the servos to read
+
+        Returns:
+            Dict of servo ID to position. Servos that did not answer map to None.
+        """
+        positions: Dict[int, Optional[int]] = dict.fromkeys(servo_ids)
+        positions.update(self.buses.merge(self.buses.split(servo_ids),
+                                          lambda tuna, ids: tuna.syncReadReg(ids, self.POSITION_REG)))
+        return positions
+
+    def get_servo_states(self, servo_ids: List[int]) -> Dict[int, Optional[Dict[str, int]]]:
+        """
+        Get position, speed and load for the specified servo IDs in a single sync read.
+
+        Args:
+            servo_ids: IDs of the servos to read
+
+        Returns:
+            Dict of servo ID to {'position', 'speed', 'load'}. Servos that did not
+            answer map to None.
+        """
+        length = self.LOAD_REG + 2 - self.POSITION_REG
+
+        def read_states(tuna: FeetechTuna, ids: List[int]) -> Dict[int, Optional[Dict[str, int]]]:
+            states = {}
+            for servo_id, data in tuna.syncRead(ids, self.POSITION_REG, length).items():
+                if data is None:
+                    states[servo_id] = None
+                    continue
+                values = tuna.decodeRegs(self.POSITION_REG, data)
+                states[servo_id] = {
+                    name: values[reg]
+                    for name, reg in (('position', self.POSITION_REG), ('speed', self.SPEED_REG), ('load', self.LOAD_REG))
+                }
+            return states
+
+        states: Dict[int, Optional[Dict[str, int]]] = dict.fromkeys(servo_ids)
+        states.update(self.buses.merge(self.buses.split(servo_ids), read_states))
+        return states
+
+    def set_servo_positions(self, positions: Dict[int, int], ack: bool = True) -> None:
+        """
+        Set the position for a list of servos.
+
+        Args:
+            positions: Dict of servo ID to goal position
+            ack: Wait for every servo to acknowledge its write (retrying failed
+                writes). Pass False for streaming targets: all goals then go out
+                in one unacknowledged sync write, as the next update supersedes
+                a lost one anyway.
+        """
+        groups = self.buses.split_values(positions)
+        if not ack:
+            self.buses.run(groups, lambda tuna, values: tuna.syncWriteReg(values, self.GOAL_POSITION_REG))
+            return
+
+        def write_goals(tuna: FeetechTuna, values: Dict[int, int]) -> None:
+            for servo_id, position in values.items():
+                tuna.writeReg(servo_id, self.GOAL_POSITION_REG, position)
+
+        self.buses.run(groups, write_goals)
+
+    # Group Functions
+    def _group_write(self, values: Dict[int, int], reg: int, verify: bool,
+                     broadcast: bool = False) -> Dict[int, bool]:
+        # One sync write per bus. A broadcast reaches every servo on the wire,
+        # configured or not, so it is only used when the caller asks for it
+        # and the values cover every configured servo of the bus
+        def write(tuna: FeetechTuna, bus_values: Dict[int, int]) -> Dict[int, bool]:
+            bus_broadcast = broadcast and set(bus_values) == set(self.buses.bus_ids(tuna))
+            return tuna.groupWriteReg(bus_values, reg, verify=verify, broadcast=bus_broadcast)
+
+        result = dict.fromkeys(values, False)
+        result.update(self.buses.merge(self.buses.split_values(values), write))
+        return result
+
+    def set_torque(self, servo_ids: List[int], enabled: bool, verify: bool = False,
+                   broadcast: bool = False) -> Dict[int, bool]:
+        """
+        Enable or disable torque on several servos with one packet.
+
+        Args:
+            servo_ids: IDs of the servos to switch
+            enabled: True to enable torque, False to disable it
+            verify: Read the register back with one sync read
+            broadcast: Send a broadcast WRITE instead of a sync write where
+                servo_ids covers every servo of a bus. Only safe when nothing
+                else is connected to that bus (see check_servos()).
+
+        Returns:
+            Dict of servo ID to success (the readback matched when verify is set)
+        """
+        return self._group_write(dict.fromkeys(servo_ids, 1 if enabled else 0), self.TORQUE_ENABLE_REG, verify,
+                                 broadcast)
+
+    def set_mode(self, servo_ids: List[int], mode: int, verify: bool = False,
+                 broadcast: bool = False) -> Dict[int, bool]:
+        """
+        Set the operating mode of several servos with one packet.
+
+        Args:
+            servo_ids: IDs of the servos to configure
+            mode: Operating mode (0 is position/multi-turn mode)
+            verify: Read the register back with one sync read
+            broadcast: As for set_torque()
+
+        Returns:
+            Dict of servo ID to success (the readback matched when verify is set)
+        """
+        return self._group_write(dict.fromkeys(servo_ids, mode), self.MODE_REG, verify, broadcast)
+
+    def set_goals(self, positions: Dict[int, int], verify: bool = False) -> Dict[int, bool]:
+        """
+        Set goal positions of several servos with one sync write.
+
+        Args:
+            positions: Dict of servo ID to goal position
+            verify: Read the goals back with one sync read
+
+        Returns:
+            Dict of servo ID to success (the readback matched when verify is set)
+        """
+        return self._group_write(positions, self.GOAL_POSITION_REG, verify)
+
+    def set_response_level(self, servo_ids: List[int], level: int) -> Dict[int, bool]:
+        """
+        Set the Response Status Level of servos.
+
+        At level 0 a servo only answers PING and READ, so fire-and-forget
+        writes to it take half the bus time; acknowledged writes are then
+        confirmed by reading the register back.
+
+        Args:
+            servo_ids: IDs of the servos to configure
+            level: 0 (reads only) or 1 (every instruction)
+
+        Returns:
+            Dict of servo ID to whether the new level was confirmed
+        """
+        result = dict.fromkeys(servo_ids, False)
+        result.update(self.buses.merge(
+            self.buses.split(servo_ids),
+            lambda tuna, ids: {servo_id: tuna.setResponseLevel(servo_id, level) for servo_id in ids}
+        ))
+        return result
 
     def set_follower_servo_positions_to_starting_positions(self) -> None:
         """Set the position for a list of servos."""
-        for servo_id, position in self.FOLLOWER_STARTING_POSITIONS.items():
-            self.tuna.writeReg(servo_id, self.GOAL_POSITION_REG, position)
+        with self.buses.priority(PRIORITY_COMMAND):
+            self.set_goals(self.FOLLOWER_STARTING_POSITIONS, verify=True)
 
     def set_leader_servo_positions_to_starting_positions(self) -> None:
         """Set the position for a list of servos."""
-        for leader_id, follower_id in self.SERVO_MAP.items():
-            self.tuna.writeReg(leader_id, self.TORQUE_ENABLE_REG, 1) # Enable Torque
+        # Resets may come from another thread (e.g. a button callback); they
+        # queue behind the control loop's transactions, the 3 s wait holds
+        # nothing
+        leader_ids = self.get_leader_ids()
+        with self.buses.priority(PRIORITY_COMMAND):
+            self.set_torque(leader_ids, True, verify=True) # Enable Torque
 
-        for servo_id, position in self.LEADER_STARTING_POSITIONS.items():
-            self.tuna.writeReg(servo_id, self.GOAL_POSITION_REG, position)
+            self.set_goals(self.LEADER_STARTING_POSITIONS, verify=True)
 
         time.sleep(3) # Wait 5 seconds for the motors to move
 
-        for leader_id, follower_id in self.SERVO_MAP.items():
-            self.tuna.writeReg(leader_id, self.TORQUE_ENABLE_REG, 0) # Disable Torque
+        with self.buses.priority(PRIORITY_COMMAND):
+            self.set_torque(leader_ids, False, verify=True) # Disable Torque
+
+    # Health Functions
+    def get_servo_health(self) -> Dict[int, Dict]:
+        """
+        Get the circuit breaker state of every servo that has been talked to.
+
+        Returns:
+            Dict of servo ID to its health entry (state, failure counts, probes)
+        """
+        health = {}
+        for tuna in self.buses.buses.values():
+            health.update(tuna.health.snapshot())
+        return health
+
+    def get_cache_stats(self) -> Dict[str, float]:
+        """
+        Get the register cache counters.
+
+        Returns:
+            Dict with read hits/misses of EEPROM registers served from the
+            cache, writes elided because the servo already held the value,
+            writes sent, and the resulting hit and elision rates (over all buses)
+        """
+        totals = {'read_hits': 0, 'read_misses': 0, 'writes_elided': 0, 'writes_sent': 0}
+        for tuna in self.buses.buses.values():
+            stats = tuna.cache.stats()
+            for key in totals:
+                totals[key] += stats[key]
+        reads = totals['read_hits'] + totals['read_misses']
+        writes = totals['writes_elided'] + totals['writes_sent']
+        totals['read_hit_rate'] = totals['read_hits'] / reads if reads else 0.0
+        totals['write_elision_rate'] = totals['writes_elided'] / writes if writes else 0.0
+        return totals
+
+    def get_bus_stats(self) -> Dict[str, Dict]:
+        """
+        Get bus contention statistics.
+
+        Returns:
+            Dict of port to its scheduler statistics: priority name ('control',
+            'command', 'diagnostic') to transaction count and mean/p99/max time
+            spent waiting for the bus in ms, plus 'queued': the number of
+            transactions waiting now
+        """
+        return {port: tuna.scheduler.stats() for port, tuna in self.buses.buses.items()}
+
+    def enable_metrics(self, enable: bool = True) -> None:
+        """
+        Turn per-transaction instrumentation on or off on every connected bus.
+
+        Args:
+            enable: True to record every transaction, False to stop
+        """
+        for tuna in self.buses.buses.values():
+            tuna.enableMetrics(enable)
+
+    def get_bus_metrics(self) -> Dict[str, Optional[Dict]]:
+        """
+        Get the transaction metrics of every bus.
+
+        Returns:
+            Dict of port to its metrics snapshot (None while instrumentation is
+            off): transaction, retry and byte counts, wire and wait time in ms,
+            bus utilization in percent, counts per result and instruction,
+            per-servo latency histograms and the most recent transactions
+        """
+        return {port: tuna.getMetrics() for port, tuna in self.buses.buses.items()}
+
+    def reset_bus_metrics(self) -> None:
+        """Start the transaction metrics of every bus over."""
+        for tuna in self.buses.buses.values():
+            tuna.resetMetrics()
+
+    def serve_metrics(self, port: int = DEFAULT_METRICS_PORT, host: str = "127.0.0.1"):
+        """
+        Enable instrumentation and serve get_bus_metrics() as JSON over HTTP.
+
+        Args:
+            port: TCP port of the endpoint (http://host:port/metrics)
+            host: Interface to listen on, local only by default
+
+        Returns:
+            The HTTP server; call shutdown() on it to stop serving
+        """
+        self.enable_metrics()
+        return serveMetrics(self.get_bus_metrics, port, host)
+
+    def get_servo_errors(self) -> Dict[int, Dict[str, Dict]]:
+        """
+        Get the error bits servos have reported in their status packets.
+
+        Overload and overheat bits show a servo protecting itself (and
+        possibly dropping torque) before the joint visibly stops tracking.
+
+        Returns:
+            Dict of servo ID to bit name ('voltage', 'angle', 'overheat',
+            'overcurrent', 'overload') to the number of status packets that
+            had it set and the time.time() it was first and last seen. Servos
+            that never reported an error are left out.
+        """
+        errors = {}
+        for tuna in self.buses.buses.values():
+            errors.update(tuna.getErrors())
+        return errors
+
+    def reset_servo_errors(self, servo_ids: Optional[List[int]] = None) -> None:
+        """
+        Clear the error bit counters.
+
+        Args:
+            servo_ids: Servos to clear (default all)
+        """
+        for tuna in self.buses.buses.values():
+            if servo_ids is None:
+                tuna.resetErrors()
+            else:
+                for servo_id in servo_ids:
+                    tuna.resetErrors(servo_id)
+
+    def get_quarantined_ids(self) -> List[int]:
+        """Get the IDs currently taken out of the hot path after repeated failures."""
+        return [servo_id for tuna in self.buses.buses.values() for servo_id in tuna.health.quarantinedIds()]
 
     def get_step_size(self, servo_id: Optional[int] = None) -> int:
         """
@@ -191,15 +523,15 @@ class MotorController:
         return int(self.STEP_SIZE * multiplier)
 
     # Teleoperation Functions
-    def update_follower_position(
+    def compute_follower_target(
         self,
         follower_id: int,
         follower_baseline: int,
         leader_position: int,
         leader_baseline: int
-    ) -> Tuple[bool, Dict]:
+    ) -> Tuple[int, int, float]:
         """
-        Update a single follower based on leader movement.
+        Compute the goal position of a follower from its leader's movement.
 
         Args:
             follower_id: ID of the follower servo
@@ -208,12 +540,8 @@ class MotorController:
             leader_baseline: Baseline position of the leader
 
         Returns:
-            Tuple of (success, details_dict)
+            Tuple of (new_position, leader_delta, scaled_delta)
         """
-        leader_id = self.get_leader_id(follower_id)
-        if leader_id is None:
-            return False, {"error": f"No leader servo mapped to Follower {follower_id}"}
-
         # Calculate leader's delta with wraparound handling
         range_max = 4096
         half_range = range_max // 2
@@ -233,16 +561,52 @@ class MotorController:
         scaled_delta = leader_delta * multiplier
 
         # Calculate and clamp new follower position
-        new_position = max(0, min(4095, follower_baseline + scaled_delta))
+        new_position = int(max(0, min(4095, follower_baseline + scaled_delta)))
+
+        return new_position, leader_delta, scaled_delta
+
+    def update_follower_position(
+        self,
+        follower_id: int,
+        follower_baseline: int,
+        leader_position: int,
+        leader_baseline: int
+    ) -> Tuple[bool, Dict]:
+        """
+        Update a single follower based on leader movement.
+
+        Prefer update_followers() for a full frame, which needs one bus
+        transaction instead of two per joint.
+
+        Args:
+            follower_id: ID of the follower servo
+            follower_baseline: Baseline position of the follower
+            leader_position: Current position of the leader
+            leader_baseline: Baseline position of the leader
+
+        Returns:
+            Tuple of (success, details_dict)
+        """
+        leader_id = self.get_leader_id(follower_id)
+        if leader_id is None:
+            return False, {"error": f"No leader servo mapped to Follower {follower_id}"}
+
+        new_position, leader_delta, scaled_delta = self.compute_follower_target(
+            follower_id, follower_baseline, leader_position, leader_baseline
+        )
+
+        tuna = self.buses.tuna_for(follower_id)
+        if tuna is None:
+            return False, {"error": f"Follower {follower_id} is not on any bus"}
 
         # Record the current position as the new baseline
-        previous_position = self.tuna.readReg(follower_id, self.POSITION_REG)
+        previous_position = tuna.readReg(follower_id, self.POSITION_REG)
         position_delta = 0
         if (previous_position != None and new_position != None):
             position_delta = new_position - previous_position
 
         # Move the follower servo
-        success = self.tuna.writeReg(follower_id, self.GOAL_POSITION_REG, int(new_position))
+        success = tuna.writeReg(follower_id, self.GOAL_POSITION_REG, new_position)
 
         return success, {
             'follower_id': follower_id,
@@ -256,6 +620,80 @@ class MotorController:
             'scaled_delta': scaled_delta
         }
 
+    def set_teleop_baselines(
+        self,
+        leader_baselines: Optional[Dict[int, Optional[int]]] = None,
+        follower_baselines: Optional[Dict[int, Optional[int]]] = None
+    ) -> None:
+        """
+        Load the baselines used by update_followers into the joint table.
+
+        Args:
+            leader_baselines: Baseline of each leader, keyed by leader ID
+            follower_baselines: Baseline of each follower, keyed by follower ID
+        """
+        if leader_baselines is not None:
+            self.joints.set_leader_baselines(leader_baselines)
+        if follower_baselines is not None:
+            self.joints.set_follower_baselines(follower_baselines)
+
+    def update_followers(
+        self,
+        leader_positions,
+        leader_baselines: Optional[Dict[int, Optional[int]]] = None,
+        follower_baselines: Optional[Dict[int, Optional[int]]] = None,
+        read_previous: bool = False,
+        diagnostics: bool = False
+    ) -> Tuple[bool, Dict[int, Dict]]:
+        """
+        Update every follower from one frame of leader positions.
+
+        All follower targets are computed at once by the joint table and sent
+        as a single sync write packet. Joints whose leader position or either
+        baseline is missing (None) are left untouched.
+
+        Args:
+            leader_positions: Current leader positions, either keyed by leader
+                ID or as an array in joint table order
+            leader_baselines: Baselines keyed by leader ID. Only needed when they
+                changed since the last call (see set_teleop_baselines).
+            follower_baselines: Baselines keyed by follower ID. Only needed when
+                they changed since the last call.
+            read_previous: Also read the followers' present positions (one sync
+                read) to report the position delta of each joint
+            diagnostics: Build the per-joint details dict
+
+        Returns:
+            Tuple of (success, details keyed by follower ID). Details are empty
+            unless diagnostics or read_previous is set.
+        """
+        self.set_teleop_baselines(leader_baselines, follower_baselines)
+
+        if isinstance(leader_positions, dict):
+            self.joints.load_leader_positions(leader_positions)
+            self.joints.compute()
+        else:
+            self.joints.compute(leader_positions)
+
+        targets = self.joints.follower_targets()
+
+        details = {}
+        if diagnostics or read_previous:
+            details = {joint['follower_id']: joint for joint in self.joints.details()}
+
+        if read_previous and targets:
+            previous_positions = self.get_servo_positions(list(targets))
+            for follower_id, previous_position in previous_positions.items():
+                details[follower_id]['previous_position'] = previous_position
+                details[follower_id]['position_delta'] = (
+                    0 if previous_position is None else targets[follower_id] - previous_position
+                )
+
+        groups = self.buses.split_values(targets)
+        results = self.buses.run(groups, lambda tuna, values: tuna.syncWriteReg(values, self.GOAL_POSITION_REG))
+        success = len(groups) > 0 and all(results.values()) and sum(map(len, groups.values())) == len(targets)
+        return success, details
+
     # Keyboard Functions
     def get_follower_for_key(self, key: str) -> Optional[int]:
         """
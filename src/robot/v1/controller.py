@@ -3,6 +3,7 @@ import time
 import sys
 import os
 import socket
+import threading
 from pynput import keyboard
 from gpiozero import Button
 
@@ -12,6 +13,7 @@ sys.path.append(path)
 
 # Import MotorController after adding to path
 from motor_control import MotorController
+from wire_protocol import FrameEncoder, CONTROL_RESET
 
 # Network configuration
 RECEIVER_IP = "192.168.1.171"
@@ -128,12 +130,14 @@ def handle_keyboard(controller):
             if key_char in key_mappings:
                 servo_id, change = key_mappings[key_char]
                 current_pos = controller.get_servo_positions([servo_id])[servo_id]
+                if current_pos is None:
+                    continue
                 new_pos = current_pos + change
                 position_updates[servo_id] = new_pos
 
         # Update all affected servos at once
         if position_updates:
-            controller.set_servo_positions(position_updates)
+            controller.set_servo_positions(position_updates, ack=False)
 
         # Check if it's time to update follower positions (every 3 seconds)
         current_time = time.time()
@@ -164,13 +168,18 @@ def handle_teleoperation(controller, client_socket):
     # Add last_reset variable to track reset timing
     last_reset = 0
 
+    # Frames go out from this loop and from the button callback thread
+    encoder = FrameEncoder(controller.get_leader_ids())
+    send_lock = threading.Lock()
+
     def on_button_press():
         nonlocal last_reset
 
         print("Reset command pressed")
         last_reset = time.time()  # Store the time of reset
         controller.set_leader_servo_positions_to_starting_positions()
-        client_socket.sendall("{'all': 'RESET'}\n".encode('utf-8'))
+        with send_lock:
+            client_socket.sendall(encoder.encode_control(CONTROL_RESET))
 
     reset_button.when_pressed = on_button_press
 
@@ -183,8 +192,8 @@ def handle_teleoperation(controller, client_socket):
 
             # Get current positions
             positions = controller.get_servo_positions(controller.get_leader_ids())
-            message = str(positions) + '\n'
-            client_socket.sendall(message.encode('utf-8'))
+            with send_lock:
+                client_socket.sendall(encoder.encode_positions(positions))
             time.sleep(0.1)
 
         except socket.error as e:
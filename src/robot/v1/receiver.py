@@ -1,20 +1,24 @@
+import argparse
 import socket
 import serial.tools.list_ports
 import sys
 import os
 import time
-from ast import literal_eval
 
 # Add the motor-control directory to the path
 path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'motor-control'))
 sys.path.append(path)
 
 from motor_control import MotorController
+from wire_protocol import FrameDecoder, MSG_POSITIONS, WireProtocolError
 
 # Network configuration
 HOST = '192.168.1.171'
 PORT = 12345
 
+# Serial port used when --port is not given, e.g. virtual:// or pty:///dev/pts/3
+SERIAL_PORT_ENV = 'ROBOT_SERIAL_PORT'
+
 def list_serial_ports():
     """List all available serial ports."""
     ports = serial.tools.list_ports.comports()
@@ -41,22 +45,10 @@ def select_serial_port():
         except ValueError:
             print("Please enter a number.")
 
-def process_messages(buffer):
-    """Process complete messages from the buffer and return remaining buffer content."""
-    messages = []
-    while '\n' in buffer:
-        message, buffer = buffer.split('\n', 1)
-        try:
-            command = literal_eval(message)
-            messages.append(command)
-        except Exception as e:
-            print(f"Error parsing message: {e}, buffer: {buffer}")
-    return messages, buffer
-
-def process_command(controller, command, leader_baselines, follower_baselines):
-    """Process a single command message and update servo positions."""
+def process_command(controller, decoder, frame, leader_baselines, follower_baselines):
+    """Process a single frame and update servo positions."""
     # Handle RESET command
-    isCommandReset = command == "RESET" or (isinstance(command, dict) and command.get("all") == "RESET")
+    isCommandReset = frame.is_reset()
     if isCommandReset:
         print("RESET command received")
         # Set all servos to starting positions
@@ -67,32 +59,32 @@ def process_command(controller, command, leader_baselines, follower_baselines):
         leader_baselines = None # Reset leader baselines
         return (leader_baselines, follower_baselines)
 
+    if frame.msg_type != MSG_POSITIONS:
+        print(f"Ignoring unknown control message {list(frame.values)}")
+        return (leader_baselines, follower_baselines)
+
     # Initialize leader baselines on the first command received
-    if leader_baselines is None and not isCommandReset:
+    if leader_baselines is None:
         leader_baselines = {
             leader_id: position
-            for leader_id, position in command.items()
+            for leader_id, position in decoder.positions_dict(frame).items()
+            if position is not None
         }
+        controller.set_teleop_baselines(leader_baselines, follower_baselines)
         return (leader_baselines, follower_baselines)
 
-    # Update follower servos based on deltas
-    if leader_baselines is not None and not isCommandReset:
-        for leader_id, leader_new_position in command.items():
-            if leader_id is None:
-                continue
-
-            follower_id = controller.get_follower_id(leader_id)
-            success, details = controller.update_follower_position(
-                follower_id=follower_id,
-                follower_baseline=follower_baselines[follower_id],
-                leader_position=leader_new_position,
-                leader_baseline=leader_baselines[leader_id]
-            )
+    # Update all follower servos from the leader deltas in one sync write
+    controller.update_followers(decoder.positions(frame))
 
     return (leader_baselines, follower_baselines)
 
 def main():
-    selected_port = select_serial_port()
+    parser = argparse.ArgumentParser(description='Receive leader arm positions and drive the follower servos')
+    parser.add_argument('--port', default=os.environ.get(SERIAL_PORT_ENV),
+                        help=f'Servo bus port, any port MotorController.connect() accepts (default: ${SERIAL_PORT_ENV}, else ask)')
+    args = parser.parse_args()
+
+    selected_port = args.port or select_serial_port()
     if not selected_port:
         return
 
@@ -113,9 +105,12 @@ def main():
         # Get current positions of follower servos as their baseline
         follower_baselines = controller.get_servo_positions(controller.get_follower_ids())
         leader_baselines = None
-        buffer = ""
+        decoder = FrameDecoder(controller.get_leader_ids())
 
         print (f"Follower baselines: {follower_baselines}")
+        missing = [servo_id for servo_id, position in follower_baselines.items() if position is None]
+        if missing:
+            print(f"Warning: no response from followers {missing} - they will not be driven")
         print(f"Receiver listening on {HOST}:{PORT}")
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
             server_socket.bind((HOST, PORT))
@@ -125,49 +120,56 @@ def main():
             print(f"Connection established with {addr}")
 
             while True:
-                data = conn.recv(1024).decode('utf-8')
-                if not data:
+                if not decoder.recv_into(conn):
                     break
 
-                try:
-                    # Add received data to buffer and process messages
-                    buffer += data
-                    messages, buffer = process_messages(buffer)
-
-                    # Process each complete message
-                    for command in messages:
-                        if time.time() % 3 < 0.1:
-                            current_time = time.strftime("%H:%M:%S")
-
-                            print()
-                            print(f"[{current_time}] Received command: {command}")
-
-                            # Print the current positions of the servos
-                            print(f"Current positions: {controller.get_servo_positions(controller.get_follower_ids())}")
-                            print()
-
-                        leader_baselines, follower_baselines = process_command(
-                            controller,
-                            command,
-                            leader_baselines,
-                            follower_baselines
-                        )
-
-                except Exception as e:
-                    import traceback
-                    print(f"Error in main loop: {e}")
-
-                    # Get the stack trace
-                    tb = traceback.extract_tb(sys.exc_info()[2])
-
-                    # Print only frames from our code (excluding library code)
-                    print("\nStack trace:")
-                    for frame in tb:
-                        if "receiver.py" in frame.filename:
-                            print(f"  File '{frame.filename}', line {frame.lineno}, in {frame.name}")
-                            print(f"    {frame.line}")
-
-                    buffer = ""  # Clear buffer on error
+                # Process each complete frame. A bad frame or a failing command
+                # only costs that frame: the decoder has moved past it, so
+                # parsing carries on with the next one.
+                while True:
+                    try:
+                        for frame in decoder.frames():
+                            if time.time() % 3 < 0.1:
+                                current_time = time.strftime("%H:%M:%S")
+
+                                print()
+                                if frame.msg_type == MSG_POSITIONS:
+                                    print(f"[{current_time}] Received frame {frame.sequence}: {decoder.positions_dict(frame)}")
+                                else:
+                                    print(f"[{current_time}] Received control frame {frame.sequence}")
+
+                                # Print the current positions of the servos
+                                print(f"Current positions: {controller.get_servo_positions(controller.get_follower_ids())}")
+                                quarantined = controller.get_quarantined_ids()
+                                if quarantined:
+                                    print(f"Quarantined servos: {quarantined}")
+                                print()
+
+                            leader_baselines, follower_baselines = process_command(
+                                controller,
+                                decoder,
+                                frame,
+                                leader_baselines,
+                                follower_baselines
+                            )
+                        break
+
+                    except WireProtocolError as e:
+                        print(f"Error parsing frame: {e}")
+
+                    except Exception as e:
+                        import traceback
+                        print(f"Error in main loop: {e}")
+
+                        # Get the stack trace
+                        tb = traceback.extract_tb(sys.exc_info()[2])
+
+                        # Print only frames from our code (excluding library code)
+                        print("\nStack trace:")
+                        for frame in tb:
+                            if "receiver.py" in frame.filename:
+                                print(f"  File '{frame.filename}', line {frame.lineno}, in {frame.name}")
+                                print(f"    {frame.line}")
 
     except KeyboardInterrupt:
         print("\nStopping receiver...")
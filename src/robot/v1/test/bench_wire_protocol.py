@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+from ast import literal_eval
+
+# Add the v1 and motor-control directories to the path
+v1_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+motor_control_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'motor-control'))
+sys.path.append(v1_path)
+sys.path.append(motor_control_path)
+
+from motor_control import MotorController
+from wire_protocol import FrameDecoder, FrameEncoder
+
+FRAMES = 20000
+
+
+def text_frame(positions):
+    """Encode a frame the way controller.py did before the binary protocol."""
+    return (str(positions) + '\n').encode('utf-8')
+
+
+def parse_text(stream):
+    """Parse a stream of text frames the way receiver.py did (split + literal_eval)."""
+    buffer = stream.decode('utf-8')
+    count = 0
+    while '\n' in buffer:
+        message, buffer = buffer.split('\n', 1)
+        positions = literal_eval(message)
+        count += 1
+    return count
+
+
+def parse_binary(decoder, stream):
+    """Parse a stream of binary frames into joint-order position arrays."""
+    decoder.feed(stream)
+    count = 0
+    for frame in decoder.frames():
+        decoder.positions(frame)
+        count += 1
+    return count
+
+
+def main():
+    leader_ids = MotorController().get_leader_ids()
+    positions = {leader_id: 2048 + 37 * n for n, leader_id in enumerate(leader_ids)}
+    encoder = FrameEncoder(leader_ids)
+    decoder = FrameDecoder(leader_ids, capacity=1 << 16)
+
+    text = text_frame(positions)
+    binary = bytes(encoder.encode_positions(positions))
+    print(f"{len(leader_ids)} leaders")
+    print(f"Bytes per frame: text {len(text)}, binary {len(binary)}")
+
+    # Parse in batches of 64 frames, as they would arrive in one recv()
+    batch = 64
+    text_stream = text * batch
+    binary_stream = binary * batch
+
+    start = time.perf_counter()
+    for _ in range(FRAMES // batch):
+        parse_text(text_stream)
+    text_time = (time.perf_counter() - start) / (FRAMES // batch * batch)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES // batch):
+        parse_binary(decoder, binary_stream)
+    binary_time = (time.perf_counter() - start) / (FRAMES // batch * batch)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        encoder.encode_positions(positions)
+    encode_time = (time.perf_counter() - start) / FRAMES
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        text_frame(positions)
+    text_encode_time = (time.perf_counter() - start) / FRAMES
+
+    print(f"Parse per frame: literal_eval {text_time * 1e6:.1f} us, binary {binary_time * 1e6:.1f} us "
+          f"({text_time / binary_time:.0f}x)")
+    print(f"Encode per frame: str() {text_encode_time * 1e6:.1f} us, binary {encode_time * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,11 @@
+import os
+import sys
 import serial.tools.list_ports
+
+# Add the motor-control directory to the path
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'motor-control'))
+sys.path.append(path)
+
 from motor_control import MotorController
 
 def list_serial_ports():
@@ -20,17 +27,14 @@ def detect_servos(port, baudrate=1000000):
 
     print(f"Scanning for servos on {port}...")
     try:
-        # Get all possible servo IDs from the motor controller
-        servo_ids = controller.get_ids()
-
-        # Get positions for all servos at once
-        positions = controller.get_positions(servo_ids)
+        # Look for every servo the motor controller expects
+        found, missing = controller.check_servos()
 
-        # Check which servos returned valid positions
-        for servo_id, position in zip(servo_ids, positions):
-            if position is not None:
-                detected_servos.append(servo_id)
-                print(f"Detected servo ID: {servo_id}, Position: {position}")
+        for servo_id, model in sorted(found.items()):
+            detected_servos.append(servo_id)
+            print(f"Detected servo ID: {servo_id}, Model: {model}")
+        if missing:
+            print(f"Missing servo IDs: {missing}")
     except Exception as e:
         print(f"Error scanning port {port}: {e}")
     finally:
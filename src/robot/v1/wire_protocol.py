@@ -0,0 +1,229 @@
+import itertools
+import struct
+import time
+from typing import Dict, Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Frame layout, little-endian:
+#   magic      2 bytes  b'MC'
+#   version    uint8    PROTOCOL_VERSION
+#   type       uint8    MSG_POSITIONS or MSG_CONTROL
+#   sequence   uint32   per-sender message counter (wraps)
+#   timestamp  uint64   sender time.time_ns()
+#   count      uint16   number of int16 values that follow
+#   values     int16 * count
+MAGIC = b'MC'
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct('<2sBBIQH')
+
+MSG_POSITIONS = 1  # leader positions in joint table order
+MSG_CONTROL = 2  # one command code
+
+CONTROL_RESET = 1
+
+# Position of a leader that did not answer. Present positions are decoded
+# as int16, so the most negative value is free.
+MISSING_POSITION = -32768
+
+VALUE_DTYPE = np.dtype('<i2')
+
+
+class WireProtocolError(ValueError):
+    """A frame that is not valid for this protocol version."""
+
+
+class Frame:
+    """
+    One decoded frame.
+
+    values is a view into the decoder's receive buffer; it is only valid until
+    the decoder receives more data.
+    """
+
+    __slots__ = ('msg_type', 'sequence', 'timestamp_ns', 'values')
+
+    def __init__(self, msg_type: int, sequence: int, timestamp_ns: int, values: np.ndarray):
+        self.msg_type = msg_type
+        self.sequence = sequence
+        self.timestamp_ns = timestamp_ns
+        self.values = values
+
+    def is_reset(self) -> bool:
+        """Whether this is a RESET control message."""
+        return self.msg_type == MSG_CONTROL and len(self.values) > 0 and self.values[0] == CONTROL_RESET
+
+
+class FrameEncoder:
+    """
+    Builds frames for a fixed list of leader IDs into preallocated buffers.
+
+    The returned memoryviews point into those buffers and stay valid until the
+    next frame of the same type is encoded. Sequence numbers are shared by all
+    message types.
+    """
+
+    def __init__(self, leader_ids: Sequence[int]):
+        """
+        Args:
+            leader_ids: Leader IDs in joint table order (MotorController.get_leader_ids())
+        """
+        self.leader_ids = list(leader_ids)
+        self._sequence = itertools.count()
+
+        count = len(self.leader_ids)
+        self._positions_buffer = bytearray(HEADER.size + count * VALUE_DTYPE.itemsize)
+        self._positions = np.frombuffer(self._positions_buffer, dtype=VALUE_DTYPE, count=count, offset=HEADER.size)
+        self._control_buffer = bytearray(HEADER.size + VALUE_DTYPE.itemsize)
+
+    def _header(self, buffer: bytearray, msg_type: int, count: int) -> memoryview:
+        HEADER.pack_into(buffer, 0, MAGIC, PROTOCOL_VERSION, msg_type,
+                         next(self._sequence) & 0xFFFFFFFF, time.time_ns(), count)
+        return memoryview(buffer)
+
+    def encode_positions(self, positions: Mapping[int, Optional[int]]) -> memoryview:
+        """
+        Encode one frame of leader positions.
+
+        Args:
+            positions: Leader ID to position; missing IDs and None are sent as
+                MISSING_POSITION
+
+        Returns:
+            The frame, ready for sendall()
+        """
+        out = self._positions
+        for n, leader_id in enumerate(self.leader_ids):
+            position = positions.get(leader_id)
+            out[n] = MISSING_POSITION if position is None else position
+        return self._header(self._positions_buffer, MSG_POSITIONS, len(out))
+
+    def encode_control(self, command: int) -> memoryview:
+        """Encode a control message carrying one command code (e.g. CONTROL_RESET)."""
+        struct.pack_into('<h', self._control_buffer, HEADER.size, command)
+        return self._header(self._control_buffer, MSG_CONTROL, 1)
+
+
+class FrameDecoder:
+    """
+    Splits a byte stream into frames without copying their payload.
+
+    Data is received straight into one preallocated buffer (recv_into() or
+    feed()); frames() then yields every complete frame, its values being an
+    int16 view into that buffer.
+    """
+
+    def __init__(self, leader_ids: Sequence[int], capacity: int = 4096):
+        """
+        Args:
+            leader_ids: Leader IDs in joint table order, as used by the sender
+            capacity: Receive buffer size in bytes
+        """
+        self.leader_ids = list(leader_ids)
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+        # Preallocated for positions()
+        self._positions = np.empty(len(self.leader_ids))
+        self._missing = np.empty(len(self.leader_ids), dtype=bool)
+
+    def clear(self) -> None:
+        """Drop everything buffered, e.g. when a new connection starts."""
+        self._start = self._end = 0
+
+    def _resync(self) -> None:
+        # Skips to the next magic after the current frame start. A trailing
+        # first magic byte is kept, as the rest of it may not have arrived.
+        found = self._buffer.find(MAGIC, self._start + 1, self._end)
+        if found < 0:
+            found = self._end - 1 if self._buffer[self._end - 1] == MAGIC[0] else self._end
+        self._start = found
+
+    def _compact(self) -> None:
+        # Moves the unparsed bytes to the front of the buffer (same-size
+        # slice assignment, so views handed out earlier stay alive)
+        pending = self._end - self._start
+        if self._start:
+            self._buffer[:pending] = self._buffer[self._start: self._end]
+            self._start, self._end = 0, pending
+        if pending == len(self._buffer):
+            raise WireProtocolError("Frame larger than the receive buffer")
+
+    def recv_into(self, sock) -> int:
+        """
+        Receive from a socket into the buffer.
+
+        Returns:
+            Number of bytes received, 0 once the peer closed the connection
+        """
+        self._compact()
+        received = sock.recv_into(self._view[self._end:])
+        self._end += received
+        return received
+
+    def feed(self, data: bytes) -> None:
+        """Append received bytes to the buffer."""
+        offset = 0
+        while offset < len(data):
+            self._compact()
+            length = min(len(data) - offset, len(self._buffer) - self._end)
+            self._buffer[self._end: self._end + length] = data[offset: offset + length]
+            self._end += length
+            offset += length
+
+    def frames(self) -> Iterator[Frame]:
+        """
+        Yield every complete frame in the buffer.
+
+        Raises:
+            WireProtocolError: On a bad magic, an unknown version, a frame
+                larger than the receive buffer or a position frame for a
+                different number of joints. The decoder has skipped ahead to
+                the next magic by then, so calling frames() again carries on
+                with the frames after the bad data.
+        """
+        while self._end - self._start >= HEADER.size:
+            magic, version, msg_type, sequence, timestamp_ns, count = HEADER.unpack_from(self._buffer, self._start)
+            error = None
+            if magic != MAGIC:
+                error = "Not a frame (bad magic)"
+            elif version != PROTOCOL_VERSION:
+                error = f"Unsupported protocol version {version}"
+            elif HEADER.size + count * VALUE_DTYPE.itemsize > len(self._buffer):
+                error = f"Frame of {count} values is larger than the receive buffer"
+            elif msg_type == MSG_POSITIONS and count != len(self.leader_ids):
+                error = f"Position frame for {count} joints, expected {len(self.leader_ids)}"
+            if error is not None:
+                self._resync()
+                raise WireProtocolError(error)
+
+            offset = self._start + HEADER.size
+            end = offset + count * VALUE_DTYPE.itemsize
+            if end > self._end:
+                return
+            values = np.frombuffer(self._buffer, dtype=VALUE_DTYPE, count=count, offset=offset)
+            self._start = end
+            yield Frame(msg_type, sequence, timestamp_ns, values)
+
+    def positions(self, frame: Frame) -> np.ndarray:
+        """
+        Convert a position frame into leader positions in joint table order.
+
+        Returns:
+            Preallocated float array with NaN for missing leaders, as taken by
+            MotorController.update_followers(); overwritten by the next call
+        """
+        out = self._positions
+        np.copyto(out, frame.values)
+        np.equal(frame.values, MISSING_POSITION, out=self._missing)
+        np.copyto(out, np.nan, where=self._missing)
+        return out
+
+    def positions_dict(self, frame: Frame) -> Dict[int, Optional[int]]:
+        """Convert a position frame into a leader ID keyed dict (None for missing leaders)."""
+        return {
+            leader_id: None if value == MISSING_POSITION else int(value)
+            for leader_id, value in zip(self.leader_ids, frame.values)
+        }